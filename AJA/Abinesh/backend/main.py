@@ -1,6 +1,7 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import pandas as pd
@@ -12,6 +13,9 @@ import shutil
 from processors.pjpa37 import process_pjpa37
 from processors.pjpa38 import process_pjpa38
 from processors.pjpa39 import process_pjpa39
+from response_formats import (
+    ARROW_MIME, COLUMNAR_MIME, JSON_MIME, arrow_ipc, columnar, compress, dataframe_to_arrow, negotiate
+)
 
 app = FastAPI(title="AJALabs Analytics API", version="1.0.0")
 
@@ -59,6 +63,7 @@ class TableRequest(BaseModel):
     sort_column: Optional[str] = None
     sort_direction: Optional[str] = "asc"
     filters: Optional[FilterRequest] = None
+    format: Optional[str] = None  # records, columnar or arrow; defaults to the Accept header
 
 # Helper functions
 def detect_file_type(filename: str) -> str:
@@ -301,11 +306,16 @@ async def get_dashboard_data(filters: Optional[FilterRequest] = None):
         raise HTTPException(status_code=500, detail=f"Error calculating dashboard: {str(e)}")
 
 @app.post("/table-data")
-async def get_table_data(request: TableRequest):
-    """Get paginated table data"""
+async def get_table_data(request: TableRequest, http_request: Request):
+    """Get paginated table data as records, columnar JSON or Arrow IPC"""
     try:
         if current_data["df"] is None:
             raise HTTPException(status_code=400, detail="No file loaded")
+
+        try:
+            response_format = negotiate(http_request.headers.get("accept"), request.format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         df = current_data["df"].copy()
         
@@ -331,20 +341,34 @@ async def get_table_data(request: TableRequest):
         end_idx = start_idx + request.page_size
         paginated_df = df.iloc[start_idx:end_idx]
         
-        # Convert to records
-        records = paginated_df.fillna("").to_dict(orient="records")
-        
         # Clean column names for display
         columns = [{"field": col, "header": col} for col in df.columns]
         
-        return {
-            "data": records,
+        info = {
             "columns": columns,
             "total_rows": total_rows,
             "page": request.page,
             "page_size": request.page_size,
             "total_pages": (total_rows + request.page_size - 1) // request.page_size
         }
+
+        if response_format == "arrow":
+            body, media_type = arrow_ipc(dataframe_to_arrow(paginated_df), info), ARROW_MIME
+        elif response_format == "columnar":
+            payload = {**info, **columnar(dataframe_to_arrow(paginated_df))}
+            body, media_type = json.dumps(payload, default=str).encode("utf-8"), COLUMNAR_MIME
+        else:
+            # Convert to records
+            records = paginated_df.fillna("").to_dict(orient="records")
+            body, media_type = json.dumps(jsonable_encoder({"data": records, **info})).encode("utf-8"), JSON_MIME
+
+        body, encoding = compress(body, http_request.headers.get("accept-encoding"))
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting table data: {str(e)}")
 
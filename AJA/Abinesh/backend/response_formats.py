@@ -0,0 +1,94 @@
+import gzip
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    import brotli
+except ImportError:  # optional; without it responses fall back to gzip
+    brotli = None
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+COLUMNAR_MIME = "application/vnd.jk.columnar+json"
+JSON_MIME = "application/json"
+
+FORMATS = {"records": JSON_MIME, "columnar": COLUMNAR_MIME, "arrow": ARROW_MIME}
+
+MIN_COMPRESS_BYTES = 1024
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def negotiate(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """Pick the response format from the request body field or the Accept header"""
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown format '{requested}'. Use one of: {', '.join(FORMATS)}")
+        return requested
+    accept = (accept or "").lower()
+    if ARROW_MIME in accept:
+        return "arrow"
+    if COLUMNAR_MIME in accept:
+        return "columnar"
+    return "records"
+
+
+def dataframe_to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Convert a page of uploaded data to Arrow, storing mixed-type columns as strings"""
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _column_values(column: pa.ChunkedArray) -> Any:
+    if pa.types.is_timestamp(column.type):
+        return pc.strftime(column.cast(pa.timestamp("s"), safe=False), format="%Y-%m-%dT%H:%M:%S").to_pylist()
+    if pa.types.is_date(column.type):
+        return pc.strftime(column, format="%Y-%m-%d").to_pylist()
+    if pa.types.is_floating(column.type):
+        return pc.if_else(pc.is_nan(column), None, column).to_pylist()
+    if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+        return column.to_pylist()
+
+    encoded = pc.dictionary_encode(column.combine_chunks())
+    if len(encoded.dictionary) > DICTIONARY_MAX_RATIO * max(len(column), 1):
+        return column.to_pylist()
+    return {"dictionary": encoded.dictionary.to_pylist(), "indices": encoded.indices.to_pylist()}
+
+
+def columnar(table: pa.Table) -> Dict[str, Any]:
+    """Column-oriented JSON with repetitive string columns dictionary-encoded"""
+    return {
+        "format": "columnar",
+        "num_rows": table.num_rows,
+        "data": {name: _column_values(table[name]) for name in table.column_names},
+    }
+
+
+def arrow_ipc(table: pa.Table, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """Serialize a table as an Arrow IPC stream with JSON-encoded schema metadata"""
+    if metadata:
+        table = table.replace_schema_metadata({k: json.dumps(v, default=str) for k, v in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress with brotli or gzip according to Accept-Encoding"""
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=5), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
@@ -1,35 +1,66 @@
 import pandas as pd
 import numpy as np
 
-def generate_notice_period_insight_updated(concur_data_path, left_employees_path, output_excel_path):
+from .dataset import load_table
+from .interval_join import interval_join
+from .joins import attach
+from .risk_rules import DEFAULT_RULES, evaluate_rules
+from .store import EMPLOYEE_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": [
+        'Employee ID', 'Report Name', 'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 'Approval Status',
+        'Report Start Date', 'Report End Date', 'Currency', 'Report Total', 'Payment Status', 'Amount Due Employee',
+        'Report Date', 'Policy', 'Amount Approved'
+    ],
+    "left_employees": ['Designation Name', 'Job Level', 'DOJ', 'Separation Reason', 'Date of Resignation',
+                       'Employee Last Working Date'],
+}
+INPUT_FILTERS = {
+    "concur": [('Submit Date', 'not null', None)],
+    "left_employees": [('Date of Resignation', 'not null', None)],
+}
+
+
+def generate_notice_period_insight_updated(concur_data_path, left_employees_path, output_excel_path, risk_rules=None):
+    """
+    Flags claims submitted by employees after they resigned, i.e. during their notice period.
+    risk_rules: the Risk Category tiers (see risk_rules.py); the engagement's configured rules
+    when run by the orchestrator, DEFAULT_RULES["PJPA27"] otherwise.
+    """
+    prof = stage_profile()
+
     # 1. Load the master data (low_memory=False for large files)
-    concur_df = pd.read_excel(concur_data_path)
-    left_emp_df = pd.read_excel(left_employees_path)
+    prof.stage("load")
+    concur_df = load_table(concur_data_path, "concur")
+    left_emp_df = load_table(left_employees_path, "left_employees")
+    prof.rows(len(concur_df) + len(left_emp_df))
     
     # Clean up column names 
+    prof.stage("normalize")
     concur_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     left_emp_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
-    # Ensure join keys are strictly strings
-    left_emp_df['Emp_CODE'] = left_emp_df['Emp_CODE'].astype(str).str.strip()
-    concur_df['Employee ID'] = concur_df['Employee ID'].astype(str).str.strip()
-    
     # 2. Merge Concur claims with Left Employees
-    merged_df = pd.merge(
-        left_emp_df, 
-        concur_df, 
-        left_on='Emp_CODE', 
-        right_on='Employee ID', 
-        how='inner'
-    )
-    
-    # 3. Process Dates
-    merged_df['Date of Resignation'] = pd.to_datetime(merged_df['Date of Resignation'], errors='coerce')
-    merged_df['Employee Last Working Date'] = pd.to_datetime(merged_df['Employee Last Working Date'], errors='coerce')
-    merged_df['Submit Date_Parsed'] = pd.to_datetime(merged_df['Submit Date'], errors='coerce')
+    # (Emp_CODE and Employee ID share one integer key, encoded once at ingest)
+    prof.stage("join")
+    # Only employees who resigned can spend in their notice period, and only their claims are joined
+    left_emp_df = left_emp_df[left_emp_df['Date of Resignation'].notna()]
+    concur_df = concur_df[concur_df[EMPLOYEE_KEY].isin(left_emp_df[EMPLOYEE_KEY])]
     
+    # 3. Process Dates (already datetime64, parsed once at ingest)
     # --- NEW LOGIC FIX: Filter out expenses submitted BEFORE resignation ---
-    merged_df = merged_df[merged_df['Submit Date_Parsed'] >= merged_df['Date of Resignation']].copy()
+    # An interval join on the employment timeline: each resignation is paired only with the claims
+    # submitted on or after it, and the full rows are only attached for those pairs
+    pairs = interval_join(left_emp_df, concur_df, EMPLOYEE_KEY, date='Submit Date', start='Date of Resignation')
+    merged_df = attach(left_emp_df, concur_df, pairs, on=EMPLOYEE_KEY)
+    
+    prof.rows(len(merged_df))
+
+    prof.stage("aggregate")
+    merged_df['Submit Date_Parsed'] = merged_df['Submit Date']
     
     # 4. Derive specific insight columns
     merged_df['Employee Separation Date'] = merged_df['Employee Last Working Date'].dt.strftime('%Y-%m-%d')
@@ -37,20 +68,8 @@ def generate_notice_period_insight_updated(concur_data_path, left_employees_path
     merged_df['Notice Period Days'] = (merged_df['Employee Last Working Date'] - merged_df['Date of Resignation']).dt.days
     merged_df['Amount Approved'] = pd.to_numeric(merged_df['Amount Approved'], errors='coerce').fillna(0)
     
-    # 5. Define Risk Category Logic
-    def calculate_risk(row):
-        if pd.isna(row['Notice Period Days']):
-            return 'UNKNOWN'
-        elif row['Notice Period Days'] <= 0:
-            return 'Critical'
-        elif row['Amount Approved'] >= 7000:
-            return 'HIGH'
-        elif row['Amount Approved'] >= 3750:
-            return 'MEDIUM'
-        else:
-            return 'LOW'
-            
-    merged_df['Risk Category'] = merged_df.apply(calculate_risk, axis=1)
+    # 5. Define Risk Category Logic (unknown notice period, then Critical / HIGH / MEDIUM / LOW tiers)
+    merged_df['Risk Category'] = evaluate_rules(merged_df, risk_rules or DEFAULT_RULES["PJPA27"])
     
     # Revert date types back to string format for standardizing the output
     merged_df['Date of Resignation'] = merged_df['Date of Resignation'].dt.strftime('%Y-%m-%d')
@@ -76,7 +95,10 @@ def generate_notice_period_insight_updated(concur_data_path, left_employees_path
             
     final_df = merged_df[expected_columns]
     
+    prof.rows(len(final_df))
+
     # 7. Construct Insight Meta-Headers
+    prof.stage("write")
     header_rows = [
         ['Insight ID ', 'PJPA27'] + [''] * (len(expected_columns) - 2),
         ['Exception No', '1'] + [''] * (len(expected_columns) - 2),
@@ -93,6 +115,8 @@ def generate_notice_period_insight_updated(concur_data_path, left_employees_path
         header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=6, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"Insight execution complete. Generated {len(final_df)} valid exception rows after fixing logic.")
     return output_excel_path
 
@@ -1,81 +1,85 @@
 import pandas as pd
 import numpy as np
 
-def generate_benfords_law_insight(concur_data_path, output_excel_path):
+from .benford import (FIRST_DIGIT_CONFORMITY, FIRST_DIGIT_PROBS, FIRST_TWO_CONFORMITY, FIRST_TWO_PROBS,
+                      LAST_TWO_PROBS, SECOND_DIGIT_PROBS, conformity, digit_test, last_two_digits, leading_digits,
+                      segment_tests, summation_test)
+from .dataset import load_table
+from .store import SUBMIT_MONTH
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": [
+        'Employee ID', 'Report Name', 'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 'Approval Status',
+        'Report Start Date', 'Report End Date', 'Currency', 'Report Total', 'Payment Status', 'Amount Due Employee',
+        'Report Date', 'Policy', 'Amount Approved'
+    ],
+}
+INPUT_FILTERS = {
+    "concur": [('Amount Approved', '>', 0)],
+}
+
+# Populations tested on their own in the segmented analysis: segment type -> column
+SEGMENTS = {'Employee ID': 'Employee ID', 'Policy': 'Policy', 'Month': SUBMIT_MONTH}
+
+# Fewest amounts a segment needs to be tested and ranked
+MIN_SEGMENT_SIZE = 100
+
+
+def generate_benfords_law_insight(concur_data_path, output_excel_path, min_segment_size=MIN_SEGMENT_SIZE):
+    """
+    Tests Approved Amounts against Benford's Law, for the whole population and
+    for every employee, policy and submit month on its own.
+    min_segment_size: segments with fewer amounts are left out of the segmented analysis.
+    """
     print("Running Benford's Law Analysis...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    df = df = pd.read_excel(concur_data_path)
+    prof.stage("load")
+    df = load_table(concur_data_path, "concur")
+    prof.rows(len(df))
     
     # 2. Process and Filter Valid Amounts
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
     df['Amount Approved Numeric'] = pd.to_numeric(df['Amount Approved'], errors='coerce')
     valid_df = df[df['Amount Approved Numeric'].notna() & (df['Amount Approved Numeric'] > 0)].copy()
     
     # 3. Vectorized Digit Extraction (Highly optimized for 760k+ rows)
-    # Convert float to string, remove decimal, and strip leading zeros safely
-    amounts_str = valid_df['Amount Approved Numeric'].apply(lambda x: f"{abs(x):.10f}").str.replace('.', '', regex=False).str.lstrip('0')
-    
-    valid_mask = amounts_str.str.len() > 0
-    valid_df = valid_df[valid_mask].copy()
-    amounts_str = amounts_str[valid_mask]
-    
-    valid_df['d1'] = amounts_str.str[0].astype(int)
-    
-    # Handle single digit cases for d2 and d12
-    d2_raw = amounts_str.str[1].fillna('0')
-    valid_df['d2'] = np.where(d2_raw == '', '0', d2_raw).astype(int)
-    valid_df['d12'] = np.where(amounts_str.str.len() > 1, amounts_str.str[:2], amounts_str.str[0] + '0').astype(int)
+    # Digits are computed on the float array itself; amounts that round to zero have none
+    amounts = valid_df['Amount Approved Numeric'].to_numpy(dtype=np.float64)
+    d12 = leading_digits(amounts)
+    has_digits = d12 > 0
+    valid_df = valid_df[has_digits].copy()
+    amounts = amounts[has_digits]
+    d12 = d12[has_digits]
+    valid_df['d12'] = d12
+    last2 = last_two_digits(amounts)
     
     N = len(valid_df)
+    prof.rows(N)
     
-    # 4. Statistical Helper Function
-    def compute_stats(actual_counts, expected_probs):
-        stats = []
-        for digit, prob in expected_probs.items():
-            actual_count = actual_counts.get(digit, 0)
-            expected_count = prob * N
-            actual_pct = (actual_count / N) * 100
-            expected_pct = prob * 100
-            diff_pct = actual_pct - expected_pct
-            abs_diff_pct = abs(diff_pct)
-            
-            # Z-Score Calculation
-            p = actual_count / N
-            P = prob
-            variance = (P * (1 - P)) / N
-            z_score = (p - P) / np.sqrt(variance) if variance > 0 else 0
-            
-            stats.append({
-                'Digit': digit,
-                'Actual Count': actual_count,
-                'Expected Count': expected_count,
-                'Actual %': actual_pct,
-                'Expected %': expected_pct,
-                'Diff %': diff_pct,
-                'Abs Diff %': abs_diff_pct,
-                'Z-Score': z_score
-            })
-        return pd.DataFrame(stats)
+    # 4. Digit counts and pair sums, one bincount each over the digit arrays
+    prof.stage("aggregate")
+    d12_counts = np.bincount(d12, minlength=100)
+    d1_counts = np.bincount(d12 // 10, minlength=10)
+    d2_counts = np.bincount(d12 % 10, minlength=10)
+    last2_counts = np.bincount(last2[last2 >= 0], minlength=100)
+    d12_sums = np.bincount(d12, weights=amounts, minlength=100)
 
-    # 5. Calculate Expected Probabilities & Generate Stats DataFrames
-    
-    # First Digit (1-9)
-    d1_probs = {d: np.log10(1 + 1/d) for d in range(1, 10)}
-    df_d1 = compute_stats(valid_df['d1'].value_counts().to_dict(), d1_probs)
-    
-    # Second Digit (0-9)
-    d2_probs = {d: sum(np.log10(1 + 1/(10*k + d)) for k in range(1, 10)) for d in range(0, 10)}
-    df_d2 = compute_stats(valid_df['d2'].value_counts().to_dict(), d2_probs)
-    
-    # First-2 Digits (10-99)
-    d12_probs = {d: np.log10(1 + 1/d) for d in range(10, 100)}
-    df_d12 = compute_stats(valid_df['d12'].value_counts().to_dict(), d12_probs)
+    # 5. Compare with the expected Benford proportions (Z-scores, MAD, chi-square and KS p-values)
+    df_d1, stats_d1 = digit_test(d1_counts, FIRST_DIGIT_PROBS, np.arange(1, 10))
+    df_d2, stats_d2 = digit_test(d2_counts, SECOND_DIGIT_PROBS, np.arange(0, 10))
+    df_d12, stats_d12 = digit_test(d12_counts, FIRST_TWO_PROBS, np.arange(10, 100))
     
-    # 6. Compute MAD (Mean Absolute Deviation of proportions)
-    mad_d1 = (df_d1['Abs Diff %'] / 100).mean()
-    mad_d2 = (df_d2['Abs Diff %'] / 100).mean()
-    mad_d12 = (df_d12['Abs Diff %'] / 100).mean()
+    # 6. Additional tests
+    # Last two digits of the whole amounts of 10 or more (uniform); favoured endings such as 00 point at invented amounts
+    df_last2, stats_last2 = digit_test(last2_counts, LAST_TWO_PROBS, np.arange(0, 100))
+    # Summation: every first-two-digit pair should carry about the same share of the total amount
+    df_sum, stats_sum = summation_test(d12_sums)
     
     # 7. Identify Critical Findings
     max_d1_idx = df_d1['Z-Score'].idxmax()
@@ -87,15 +91,48 @@ def generate_benfords_law_insight(concur_data_path, output_excel_path):
     max_d12_idx = df_d12['Z-Score'].idxmax()
     crit_d12 = f"Z-Score Max: {df_d12.loc[max_d12_idx, 'Z-Score']:.2f} (Pair {int(df_d12.loc[max_d12_idx, 'Digit'])})"
     
+    max_last2_idx = df_last2['Z-Score'].idxmax()
+    crit_last2 = f"Z-Score Max: {df_last2.loc[max_last2_idx, 'Z-Score']:.2f} (Ending {int(df_last2.loc[max_last2_idx, 'Digit']):02d})"
+    
+    max_sum_idx = df_sum['Diff %'].idxmax()
+    crit_sum = f"Largest Excess Share: {df_sum.loc[max_sum_idx, 'Diff %']:.2f}% (Pair {int(df_sum.loc[max_sum_idx, 'Digit'])})"
+    
+    # P-Value is the chi-square test's; the summation test compares amounts, not counts, so it has none
+    tests = [stats_d1, stats_d2, stats_d12, stats_last2, stats_sum]
     df_summary = pd.DataFrame({
-        'Analysis Type': ['First Digit (1-9)', 'Second Digit (0-9)', 'First 2 Digits (10-99)'],
-        'Sample Size': [N, N, N],
-        'MAD': [mad_d1, mad_d2, mad_d12],
-        'P-Value': [0, 0, 0],
-        'Critical Finding': [crit_d1, crit_d2, crit_d12]
+        'Analysis Type': ['First Digit (1-9)', 'Second Digit (0-9)', 'First 2 Digits (10-99)',
+                          'Last 2 Digits (00-99)', 'Summation (10-99)'],
+        'Sample Size': [N, N, N, int(last2_counts.sum()), N],
+        'MAD': [test['MAD'] for test in tests],
+        'P-Value': [test.get('P-Value', np.nan) for test in tests],
+        'Critical Finding': [crit_d1, crit_d2, crit_d12, crit_last2, crit_sum],
+        'Chi-Square': [test.get('Chi-Square', np.nan) for test in tests],
+        'KS Statistic': [test.get('KS Statistic', np.nan) for test in tests],
+        'KS P-Value': [test.get('KS P-Value', np.nan) for test in tests],
     })
     
-    # 8. Dynamically Extract Top Anomalies
+    # 8. Segmented analysis: every employee, policy and month tested on its own, ranked by MAD
+    segment_frames = []
+    for segment_type, col in SEGMENTS.items():
+        if col not in valid_df.columns:
+            continue
+        codes, labels = pd.factorize(valid_df[col], sort=True)
+        tested = segment_tests(codes, d12, min_segment_size)
+        if col == SUBMIT_MONTH:
+            labels = labels.strftime('%Y-%m')
+        tested.insert(0, 'Segment', np.asarray(labels.astype(str))[tested['Segment Code'].to_numpy()])
+        tested.insert(0, 'Segment Type', segment_type)
+        tested.sort_values(by='First Digit MAD', ascending=False, inplace=True, kind='stable')
+        tested.insert(2, 'Rank', np.arange(1, len(tested) + 1))
+        segment_frames.append(tested.drop(columns=['Segment Code']))
+    segment_columns = ['Segment Type', 'Segment', 'Rank', 'Sample Size', 'First Digit MAD', 'First Digit Conformity',
+                       'First 2 Digits MAD', 'First 2 Digits Conformity', 'Max Z-Score', 'Max Z Digit']
+    df_segments = pd.concat(segment_frames, ignore_index=True) if segment_frames else pd.DataFrame(columns=segment_columns)
+    for mad_col, bands in (('First Digit MAD', FIRST_DIGIT_CONFORMITY), ('First 2 Digits MAD', FIRST_TWO_CONFORMITY)):
+        df_segments[mad_col.replace('MAD', 'Conformity')] = conformity(df_segments[mad_col].to_numpy(dtype=float), bands)
+    df_segments = df_segments[segment_columns]
+    
+    # 9. Dynamically Extract Top Anomalies
     # We select the top 3 highest positive Z-score pairs automatically
     top_pairs_df = df_d12.sort_values(by='Z-Score', ascending=False).head(3)
     top_pairs = sorted(top_pairs_df['Digit'].tolist())
@@ -115,11 +152,12 @@ def generate_benfords_law_insight(concur_data_path, output_excel_path):
     
     # Sort anomalies descending by Submit Date to maintain a clean layout
     if 'Submit Date' in anomalies_df.columns:
-        anomalies_df['Submit Date_Parsed'] = pd.to_datetime(anomalies_df['Submit Date'], errors='coerce')
-        anomalies_df.sort_values(by='Submit Date_Parsed', ascending=False, inplace=True)
-        anomalies_df.drop(columns=['Submit Date_Parsed'], inplace=True)
+        anomalies_df.sort_values(by='Submit Date', ascending=False, inplace=True)
     
-    # 9. Write Multi-Sheet Excel Output securely
+    prof.rows(len(anomalies_df))
+
+    # 10. Write Multi-Sheet Excel Output securely
+    prof.stage("write")
     sheet_name_anomalies = f"Anomalies ({top_pairs[0]}-{top_pairs[-1]})"
     
     with pd.ExcelWriter(output_excel_path, engine='xlsxwriter') as writer:
@@ -138,9 +176,9 @@ def generate_benfords_law_insight(concur_data_path, output_excel_path):
         
         # Sheet 2: Summary Stats
         meta_summary = [
-            ['Presents a high-level overview of the analysis results, including sample sizes, Mean Absolute Deviation (MAD), and critical findings for each test type.'] + [''] * 4,
-            [''] * 5,
-            [''] * 5,
+            ['Presents a high-level overview of the analysis results, including sample sizes, Mean Absolute Deviation (MAD), chi-square and Kolmogorov-Smirnov p-values, and critical findings for each test type.'] + [''] * (len(df_summary.columns) - 1),
+            [''] * len(df_summary.columns),
+            [''] * len(df_summary.columns),
             df_summary.columns.tolist()
         ]
         pd.DataFrame(meta_summary).to_excel(writer, index=False, header=False, sheet_name='Summary Stats')
@@ -175,6 +213,48 @@ def generate_benfords_law_insight(concur_data_path, output_excel_path):
         ]
         pd.DataFrame(meta_d12).to_excel(writer, index=False, header=False, sheet_name='First-2 Digits Analysis')
         df_d12.to_excel(writer, index=False, header=False, startrow=4, sheet_name='First-2 Digits Analysis')
+        
+        # Sheet 6: Last-2 Digits Analysis
+        meta_last2 = [
+            ['Compares the frequency of the last two digits (00–99) of whole amounts of 10 or more with the uniform distribution expected of genuine amounts; favoured endings such as 00 or 50 suggest invented figures.'] + [''] * 7,
+            [''] * 8,
+            [''] * 8,
+            df_last2.columns.tolist()
+        ]
+        pd.DataFrame(meta_last2).to_excel(writer, index=False, header=False, sheet_name='Last-2 Digits Analysis')
+        df_last2.to_excel(writer, index=False, header=False, startrow=4, sheet_name='Last-2 Digits Analysis')
+        
+        # Sheet 7: Summation Analysis
+        meta_sum = [
+            ['Compares the share of the total amount carried by each first-two-digit pair (10–99) with the equal share expected under Benford\'s Law; a large excess points at a few unusually large amounts.'] + [''] * 5,
+            [''] * 6,
+            [''] * 6,
+            df_sum.columns.tolist()
+        ]
+        pd.DataFrame(meta_sum).to_excel(writer, index=False, header=False, sheet_name='Summation Analysis')
+        df_sum.to_excel(writer, index=False, header=False, startrow=4, sheet_name='Summation Analysis')
+        
+        # Sheet 8: Segmented Analysis
+        meta_segments = [
+            [f'Tests every employee, policy and submit month with at least {min_segment_size} amounts against Benford\'s Law on its own, ranked by first-digit MAD, so the least conforming populations come first.'] + [''] * (len(segment_columns) - 1),
+            [''] * len(segment_columns),
+            [''] * len(segment_columns),
+            segment_columns
+        ]
+        pd.DataFrame(meta_segments).to_excel(writer, index=False, header=False, sheet_name='Segmented Analysis')
+        df_segments.to_excel(writer, index=False, header=False, startrow=4, sheet_name='Segmented Analysis')
+
+    # The anomaly sheet's name depends on the data; the meta file records it.
+    write_sidecar(output_excel_path, {
+        sheet_name_anomalies: (meta_anomalies, anomalies_df),
+        'Summary Stats': (meta_summary, df_summary),
+        '1st Digit Analysis': (meta_d1, df_d1),
+        '2nd Digit Analysis': (meta_d2, df_d2),
+        'First-2 Digits Analysis': (meta_d12, df_d12),
+        'Last-2 Digits Analysis': (meta_last2, df_last2),
+        'Summation Analysis': (meta_sum, df_sum),
+        'Segmented Analysis': (meta_segments, df_segments),
+    })
 
-    print(f"Benford's Law execution complete. Saved 5 sheets to {output_excel_path}.")
+    print(f"Benford's Law execution complete. Saved 8 sheets to {output_excel_path}.")
     return output_excel_path
\ No newline at end of file
@@ -1,14 +1,53 @@
 import pandas as pd
 import numpy as np
 
-def generate_new_joiner_insight(concur_data_path, emp_master_path, output_excel_path):
+from .dataset import load_table
+from .interval_join import interval_join
+from .joins import attach
+from .risk_rules import DEFAULT_RULES, evaluate_rules
+from .store import EMPLOYEE_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": [
+        'Report Name', 'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 'Approval Status',
+        'Report Start Date', 'Report End Date', 'Currency', 'Report Total', 'Payment Status', 'Amount Due Employee',
+        'Report Date', 'Policy', 'Employee ID', 'Amount Approved'
+    ],
+    "emp_master": [
+        'Position Code', 'Personnel Number', 'Employee ID(Only ALPHA NUM)', 'Employee Status', 'Supplier',
+        'Position Code Name', 'Full Name', 'Title', 'Employee Email Id', 'Phone Number', 'Employee Location',
+        'Department', 'Company name', 'Change Date', 'Joining Date', 'Employee Separation Date', 'Rep. Manager',
+        'HOD Names', 'HOD TMS Names', 'Cost Center', 'Gender', 'Date Of Birth', 'Blood Group', 'Country/Region Key',
+        'Bank Account', 'Bank Country/Region', 'Bank Number', 'Postal Code', 'Region', 'Company Code', 'IFSC Code',
+        'Account holder', 'Nationality text', 'State', 'Date'
+    ],
+}
+INPUT_FILTERS = {
+    "concur": [('Submit Date', 'not null', None)],
+    "emp_master": [('Joining Date', 'not null', None)],
+}
+
+
+def generate_new_joiner_insight(concur_data_path, emp_master_path, output_excel_path, risk_rules=None):
+    """
+    Flags claims submitted within 60 days of the employee's joining date.
+    risk_rules: the Risk Category tiers (see risk_rules.py); the engagement's configured rules
+    when run by the orchestrator, DEFAULT_RULES["PJPA29"] otherwise.
+    """
     print("Running New Joiner Early Claims Analysis (PJPA29)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    concur_df = pd.read_excel(concur_data_path)
-    emp_df = pd.read_excel(emp_master_path)
+    prof.stage("load")
+    concur_df = load_table(concur_data_path, "concur")
+    emp_df = load_table(emp_master_path, "emp_master")
+    prof.rows(len(concur_df) + len(emp_df))
     
     # Clean up column names 
+    prof.stage("normalize")
     concur_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     emp_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
@@ -22,47 +61,42 @@ def generate_new_joiner_insight(concur_data_path, emp_master_path, output_excel_
     if 'Employee Location_1' in emp_df.columns:
         emp_df.rename(columns={'Employee Location_1': 'Employee Location (#1)'}, inplace=True)
     
-    # 2. Clean Join Keys (Using Supplier ID from Emp Master to match Concur Employee ID)
-    emp_df['Supplier'] = emp_df['Supplier'].astype(str).str.strip().str.replace('\.0$', '', regex=True)
-    concur_df['Employee ID'] = concur_df['Employee ID'].astype(str).str.strip().str.replace('\.0$', '', regex=True)
+    # 2. Join Keys: Supplier ID from Emp Master matches Concur Employee ID; both were
+    # cleaned and encoded as one integer key at ingest
     
     # 3. Merge Concur claims with Employee Master
-    merged_df = pd.merge(
-        concur_df, 
-        emp_df, 
-        left_on='Employee ID', 
-        right_on='Supplier', 
-        how='inner'
-    )
-    
-    # 4. Process Dates and Calculate Duration
-    merged_df['Submit Date_Parsed'] = pd.to_datetime(merged_df['Submit Date'], errors='coerce')
-    merged_df['Joining Date'] = pd.to_datetime(merged_df['Joining Date'], errors='coerce')
-    
-    # Calculate difference in days
-    merged_df['Claim duration'] = (merged_df['Submit Date_Parsed'] - merged_df['Joining Date']).dt.days
+    prof.stage("join")
+    # Only employees with a joining date can have early claims, and only their claims are joined;
+    # the ~50 master columns are attached once the claims within the window are known
+    emp_df = emp_df[emp_df['Joining Date'].notna()]
+    concur_df = concur_df[concur_df[EMPLOYEE_KEY].isin(emp_df[EMPLOYEE_KEY])]
     
+    # 4. Calculate Duration (dates are already datetime64, parsed once at ingest)
     # 5. Filter for New Joiners (Claims within 0 to 60 days of joining)
-    # Note: >= 0 ensures we don't flag expenses that somehow have a submit date before their official joining date
-    valid_mask = (merged_df['Claim duration'] >= 0) & (merged_df['Claim duration'] <= 60)
-    exception_df = merged_df[valid_mask].copy()
+    # Note: >= 0 ensures we don't flag expenses that somehow have a submit date before their official joining date.
+    # An interval join on the employment timeline: whole days 0 to 60 after joining are the claims
+    # from the joining date up to (not including) 61 days after it
+    pairs = interval_join(concur_df, emp_df, EMPLOYEE_KEY, date='Submit Date', start='Joining Date',
+                          end='Joining Date', end_days=61, end_inclusive=False, events='left')
+    exception_df = attach(concur_df, emp_df, pairs, on=EMPLOYEE_KEY)
+    
+    prof.rows(len(exception_df))
+
+    prof.stage("aggregate")
+    exception_df['Submit Date_Parsed'] = exception_df['Submit Date']
+    exception_df['Claim duration'] = (exception_df['Submit Date_Parsed'] - exception_df['Joining Date']).dt.days
     
     # 6. Apply Risk Flagging Logic
     exception_df['Amount Approved'] = pd.to_numeric(exception_df['Amount Approved'], errors='coerce').fillna(0)
     
-    def calculate_new_joiner_risk(row):
-        # High Risk: Claimed > 5000 within the first 5 days
-        if row['Claim duration'] <= 5 and row['Amount Approved'] > 5000:
-            return 'HIGH'
-        return 'LOW'
-        
-    exception_df['Risk Category'] = exception_df.apply(calculate_new_joiner_risk, axis=1)
+    # High Risk by default: Claimed > 5000 within the first 5 days
+    exception_df['Risk Category'] = evaluate_rules(exception_df, risk_rules or DEFAULT_RULES["PJPA29"])
     
     # 7. Formatting output dates
     exception_df['Submit_Date'] = exception_df['Submit Date_Parsed'].dt.strftime('%Y-%m-%d')
     exception_df['Joining Date'] = exception_df['Joining Date'].dt.strftime('%Y-%m-%d')
     if 'Employee Separation Date' in exception_df.columns:
-        exception_df['Employee Separation Date'] = pd.to_datetime(exception_df['Employee Separation Date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        exception_df['Employee Separation Date'] = exception_df['Employee Separation Date'].dt.strftime('%Y-%m-%d')
     
     # Sort anomalies descending by Submit Date
     exception_df.sort_values(by='Submit Date', ascending=False, inplace=True)
@@ -92,7 +126,10 @@ def generate_new_joiner_insight(concur_data_path, emp_master_path, output_excel_
             
     final_df = exception_df[expected_columns]
     
+    prof.rows(len(final_df))
+
     # 9. Construct Insight Meta-Headers
+    prof.stage("write")
     header_rows = [
         ['Insight ID ', 'PJPA29'] + [''] * (len(expected_columns) - 2),
         ['Exception No', '1'] + [''] * (len(expected_columns) - 2),
@@ -109,5 +146,7 @@ def generate_new_joiner_insight(concur_data_path, emp_master_path, output_excel_
         header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=6, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"Insight execution complete. Generated {len(final_df)} exception rows.")
     return output_excel_path
\ No newline at end of file
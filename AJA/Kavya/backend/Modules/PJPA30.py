@@ -1,13 +1,28 @@
 import pandas as pd
 import numpy as np
 
+from .dataset import load_table
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": ['Employee Name', 'Employee ID', 'Report Id', 'Amount Approved', 'Report Name', 'Report Number',
+               'Submit Date', 'Approval Status', 'Report Start Date', 'Report End Date', 'Report Date', 'Policy'],
+}
+
+
 def generate_short_trip_abuse_insight(concur_data_path, output_excel_path):
     print("Running Short Trip Frequency Abuse Analysis (PJPA30)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    df = pd.read_excel(concur_data_path)
+    prof.stage("load")
+    df = load_table(concur_data_path, "concur")
+    prof.rows(len(df))
     
     # Clean column names
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
     # 2. Pre-process amounts
@@ -17,9 +32,12 @@ def generate_short_trip_abuse_insight(concur_data_path, output_excel_path):
     # Using case-insensitive match to ensure no data drops due to manual entry shifts
     short_trip_df = df[df['Policy'].astype(str).str.strip().str.lower() == 'short trip'].copy()
     
+    prof.rows(len(short_trip_df))
+
     # 4. Group by Employee to calculate frequency and financial variance
+    prof.stage("aggregate")
     # This replicates the KNIME GroupBy node and subsequent Joiner node
-    grouped = short_trip_df.groupby(['Employee Name', 'Employee ID'], as_index=False).agg(
+    grouped = short_trip_df.groupby(['Employee Name', 'Employee ID'], as_index=False, observed=True).agg(
         count_report_id=('Report Id', 'count'),
         sum_amount=('Amount Approved Numeric', 'sum'),
         # Replicate KNIME's Concatenate behavior for strings
@@ -77,7 +95,10 @@ def generate_short_trip_abuse_insight(concur_data_path, output_excel_path):
             
     final_df = grouped[expected_columns]
     
+    prof.rows(len(final_df))
+
     # 8. Construct Insight Meta-Headers
+    prof.stage("write")
     header_rows = [
         ['Insight ID ', 'PJPA30'] + [''] * (len(expected_columns) - 2),
         ['Exception No', '1'] + [''] * (len(expected_columns) - 2),
@@ -93,5 +114,7 @@ def generate_short_trip_abuse_insight(concur_data_path, output_excel_path):
         header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"Insight execution complete. Generated {len(final_df)} exception rows sorted by trip frequency.")
     return output_excel_path
\ No newline at end of file
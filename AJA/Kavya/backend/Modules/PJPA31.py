@@ -1,60 +1,96 @@
 import pandas as pd
 import numpy as np
 
-def generate_structural_splitting_insight(concur_data_path, line_item_data_path, output_excel_path):
+from .dataset import load_table
+from .aggregates import build_daily_submissions
+from .groups import flag_known_groups, flag_windows
+from .store import EMPLOYEE_KEY, REPORT_KEY, SUBMIT_DAY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": [
+        'Employee ID', 'Report Name', 'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 'Approval Status',
+        'Report Start Date', 'Report End Date', 'Currency', 'Report Total', 'Payment Status', 'Amount Due Employee',
+        'Report Date', 'Policy', 'Amount Approved'
+    ],
+    "line_items": [
+        'Employee', 'Report Name', 'Expense Type', 'Report ID', 'Approval Status', 'Payment Status', 'Report Date',
+        'Transaction Date', 'Total Approved Amount', 'City/Location', 'Payment Type', 'Approved Amount', 'Employee ID',
+        'Person Band before PMS'
+    ],
+}
+INPUT_FILTERS = {
+    "concur": [('Submit Date', 'not null', None)],
+}
+
+
+def generate_structural_splitting_insight(concur_data_path, line_item_data_path, output_excel_path,
+                                          daily_submissions=None, window_days=None, min_reports=2, min_total=None):
+    """
+    Flags employees who split a claim into 2 or more reports submitted on the same day.
+    window_days: when set, flags reports submitted within any window of this many consecutive
+    days (1 = same day, 2 = adjacent days, ...) instead of on exactly the same day; each flagged
+    run of days is reported with its totals and its first and last day (Window Start / Window End).
+    min_reports: minimum number of reports in the day (or window) to flag (Default: 2).
+    min_total: minimum summed Report Total of the day (or window) to flag (Default: no minimum).
+    Reports are counted once per day they were submitted on, so a window counts a report once as
+    long as it has a single submit date.
+    daily_submissions: the shared per-employee, per-day aggregate (aggregates.build_daily_submissions);
+    built from the Concur header when the module runs on its own.
+    """
     print("Running Structural Splitting Analysis (PJPA31)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    concur_df = pd.read_excel(concur_data_path)
-    line_item_df = pd.read_excel(line_item_data_path)
+    prof.stage("load")
+    concur_df = load_table(concur_data_path, "concur")
+    line_item_df = load_table(line_item_data_path, "line_items")
+    prof.rows(len(concur_df) + len(line_item_df))
     
     # Clean column names
+    prof.stage("normalize")
     concur_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     line_item_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
-    # Ensure IDs are strings for clean merging
-    concur_df['Employee ID'] = concur_df['Employee ID'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-    concur_df['Report Id'] = concur_df['Report Id'].astype(str).str.strip()
+    # IDs arrive cleaned, with integer keys for grouping and merging; only the output name differs
+    line_item_df.rename(columns={'Employee ID': 'Employee ID (Right)'}, inplace=True)
     
-    if 'Employee ID' in line_item_df.columns:
-        line_item_df.rename(columns={'Employee ID': 'Employee ID (Right)'}, inplace=True)
-    line_item_df['Employee ID (Right)'] = line_item_df['Employee ID (Right)'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-    line_item_df['Report ID'] = line_item_df['Report ID'].astype(str).str.strip()
-    
-    # 2. Extract strictly the Date component from the Submit Date
-    concur_df['Submit_Date_Parsed'] = pd.to_datetime(concur_df['Submit Date'], errors='coerce')
-    concur_df['Submit_Date2'] = concur_df['Submit_Date_Parsed'].dt.strftime('%Y-%m-%d')
-    concur_df['Report Total Numeric'] = pd.to_numeric(concur_df['Report Total'], errors='coerce').fillna(0)
+    # 2. The Date component of the Submit Date is the day key stored at ingest
     
     # 3. Group by Employee and Submit Date to find split submissions
-    grouped = concur_df.groupby(['Employee ID', 'Submit_Date2']).agg(
-        sum_report_total=('Report Total Numeric', 'sum'),
-        count_report_id=('Report Id', 'nunique')
-    ).reset_index()
-    
     # 4. Filter for Structural Splitting (Abuse logic: 2 or more reports submitted on the same day)
     # This mirrors the KNIME Row Filter node behavior
-    splitters = grouped[grouped['count_report_id'] >= 2].copy()
-    splitters.rename(columns={
-        'sum_report_total': 'Sum(Report Total)',
-        'count_report_id': 'Count(Report Id)'
-    }, inplace=True)
+    # 5. The header rows of the flagged days are kept with the day's totals attached, a threshold
+    # query against the shared per-day aggregate rather than a grouping of its own
+    prof.stage("aggregate")
+    if daily_submissions is None:
+        daily_submissions = build_daily_submissions(concur_df)
+
+    def is_split(days):
+        flagged = days['Count(Report Id)'] >= min_reports
+        if min_total is not None:
+            flagged &= days['Sum(Report Total)'] >= min_total
+        return flagged
+
+    if window_days is None:
+        header_merged = flag_known_groups(concur_df, [EMPLOYEE_KEY, SUBMIT_DAY], daily_submissions, is_split)
+    else:
+        # Windowed mode: per-employee scans over the sorted per-day aggregate, not a self-join of the header
+        header_merged = flag_windows(concur_df, [EMPLOYEE_KEY], SUBMIT_DAY, daily_submissions, window_days, is_split)
     
-    # 5. Merge back to Header Data to get the specific report details
-    header_merged = pd.merge(
-        splitters,
-        concur_df,
-        on=['Employee ID', 'Submit_Date2'],
-        how='inner'
-    )
+    prof.rows(len(header_merged))
+
+    prof.stage("join")
+    header_merged['Submit_Date2'] = header_merged[SUBMIT_DAY].dt.strftime('%Y-%m-%d')
     
     # 6. Merge with Line Item Data to get the granular expense breakdown
-    # Using Report ID as the primary key bridging the two datasets
+    # Using the report key (Report Id / Report ID) as the primary key bridging the two datasets
     final_merged = pd.merge(
         header_merged,
         line_item_df,
-        left_on='Report Id',
-        right_on='Report ID',
+        on=REPORT_KEY,
         how='inner'
     )
     
@@ -70,8 +106,14 @@ def generate_structural_splitting_insight(concur_data_path, line_item_data_path,
         'Report Date_x': 'Report Date'
     }
     final_merged.rename(columns=rename_mapping, inplace=True)
+    if window_days is not None:
+        final_merged['Window Start'] = final_merged['Window Start'].dt.strftime('%Y-%m-%d')
+        final_merged['Window End'] = final_merged['Window End'].dt.strftime('%Y-%m-%d')
     
+    prof.rows(len(final_merged))
+
     # 7. Organize Final Output Structure
+    prof.stage("write")
     expected_columns = [
         'Employee ID', 'Submit_Date2', 'Sum(Report Total)', 'Count(Report Id)', 'Report Name', 
         'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 'Approval Status', 
@@ -82,6 +124,9 @@ def generate_structural_splitting_insight(concur_data_path, line_item_data_path,
         'City/Location', 'Payment Type', 'Approved Amount', 'Employee ID (Right)', 
         'Person Band before PMS', 'Predicted_Range'
     ]
+    if window_days is not None:
+        # Each row's flagged run of days, right after its own submit date
+        expected_columns[2:2] = ['Window Start', 'Window End']
     
     # Gracefully add missing columns (like Predicted_Range if it was statically generated previously)
     for col in expected_columns:
@@ -94,10 +139,13 @@ def generate_structural_splitting_insight(concur_data_path, line_item_data_path,
     final_df.sort_values(by=['Count(Report Id)', 'Employee ID', 'Submit_Date2'], ascending=[False, True, True], inplace=True)
     
     # 9. Construct Insight Meta-Headers
+    exception_type = 'Structural Splitting (Structuring) - Detect multiple claims submitted by the same employee on the same day (or adjacent days) that sum up to a large amount.'
+    if window_days is not None:
+        exception_type += f' Window: {window_days} day(s).'
     header_rows = [
         ['Insight ID ', 'PJPA31'] + [''] * (len(expected_columns) - 2),
         ['Exception No', '1'] + [''] * (len(expected_columns) - 2),
-        ['Exception Type', 'Structural Splitting (Structuring) - Detect multiple claims submitted by the same employee on the same day (or adjacent days) that sum up to a large amount.'] + [''] * (len(expected_columns) - 2),
+        ['Exception Type', exception_type] + [''] * (len(expected_columns) - 2),
         [''] * len(expected_columns),
         expected_columns
     ]
@@ -109,5 +157,7 @@ def generate_structural_splitting_insight(concur_data_path, line_item_data_path,
         header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"Insight execution complete. Generated {len(final_df)} exception rows mapping headers to line items.")
     return output_excel_path
\ No newline at end of file
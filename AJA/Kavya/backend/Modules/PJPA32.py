@@ -1,6 +1,23 @@
 import pandas as pd
 import numpy as np
 
+from .dataset import load_table
+from .store import TRANSACTION_DAY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "line_items": [
+        'Employee', 'Report Name', 'Expense Type', 'Report ID', 'Approval Status', 'Payment Status', 'Report Date',
+        'Transaction Date', 'Total Approved Amount', 'City/Location', 'Payment Type', 'Approved Amount', 'Employee ID',
+        'Person Band before PMS'
+    ],
+}
+INPUT_FILTERS = {
+    "line_items": [('Transaction Date', 'not null', None)],
+}
+
+
 def generate_holiday_weekend_travel_insight(line_item_data_path, output_holiday_path, output_weekend_path):
     print("Running Holiday and Weekend Travel Analysis (PJPA32)...")
     
@@ -24,23 +41,24 @@ def generate_holiday_weekend_travel_insight(line_item_data_path, output_holiday_
         '2025-12-25': 'Christmas'
     }
     
+    prof = stage_profile()
+
     # 2. Load Data
-    df = pd.read_excel(line_item_data_path)
+    prof.stage("load")
+    # ('Employee ID (Right)' headers are mapped to 'Employee ID' when the table is normalized)
+    df = load_table(line_item_data_path, "line_items")
+    prof.rows(len(df))
+
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
-    
-    # Ensure standard schema mapping
-    if 'Employee ID (Right)' in df.columns and 'Employee ID' not in df.columns:
-        df.rename(columns={'Employee ID (Right)': 'Employee ID'}, inplace=True)
         
-    # 3. Process Transaction Dates
-    df['Transaction Date Parsed'] = pd.to_datetime(df['Transaction Date'], errors='coerce')
-    df['Date_String'] = df['Transaction Date Parsed'].dt.strftime('%Y-%m-%d')
-    df['Day of Week (Name)'] = df['Transaction Date Parsed'].dt.day_name()
+    # 3. Transaction Dates arrive parsed with a day key; day names and date strings are only rendered for flagged rows
+    holidays = pd.Series(DELHI_HOLIDAYS)
+    holidays.index = pd.to_datetime(holidays.index)
     
     # 4. Map Holidays
-    df['Holiday Name'] = df['Date_String'].map(DELHI_HOLIDAYS)
-    df['Date'] = df['Date_String']
-    df['Year'] = df['Transaction Date Parsed'].dt.year.astype('Int64').astype(str)
+    prof.stage("join")
+    df['Holiday Name'] = df[TRANSACTION_DAY].map(holidays)
     
     expected_columns = [
         'Employee', 'Report Name', 'Expense Type', 'Report ID', 'Approval Status', 
@@ -56,8 +74,12 @@ def generate_holiday_weekend_travel_insight(line_item_data_path, output_holiday_
     # ---------------------------------------------------------
     # EXCEPTION 1: HOLIDAY TRAVEL
     # ---------------------------------------------------------
+    prof.stage("aggregate")
     # Filter where a Holiday Name was successfully mapped
     holiday_df = df[df['Holiday Name'].notna()].copy()
+    holiday_df['Day of Week (Name)'] = holiday_df[TRANSACTION_DAY].dt.day_name()
+    holiday_df['Date'] = holiday_df[TRANSACTION_DAY].dt.strftime('%Y-%m-%d')
+    holiday_df['Year'] = holiday_df[TRANSACTION_DAY].dt.year.astype('Int64').astype(str)
     holiday_df = holiday_df[expected_columns]
     holiday_df.sort_values(by='Transaction Date', ascending=False, inplace=True)
     
@@ -70,6 +92,9 @@ def generate_holiday_weekend_travel_insight(line_item_data_path, output_holiday_
         expected_columns
     ]
     
+    prof.rows(len(holiday_df))
+
+    prof.stage("write")
     with pd.ExcelWriter(output_holiday_path, engine='xlsxwriter') as writer:
         pd.DataFrame(header_holiday).to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         holiday_df.to_excel(writer, index=False, header=False, startrow=6, sheet_name='Sheet1')
@@ -78,10 +103,12 @@ def generate_holiday_weekend_travel_insight(line_item_data_path, output_holiday_
     # EXCEPTION 2: WEEKEND TRAVEL
     # ---------------------------------------------------------
     # Filter for Saturday/Sunday, excluding actual public holidays
+    prof.stage("aggregate")
     weekend_df = df[
-        (df['Day of Week (Name)'].isin(['Saturday', 'Sunday'])) & 
+        (df[TRANSACTION_DAY].dt.dayofweek >= 5) & 
         (df['Holiday Name'].isna())
     ].copy()
+    weekend_df['Day of Week (Name)'] = weekend_df[TRANSACTION_DAY].dt.day_name()
     
     # Match the KNIME behavior where Date/Holiday/Year are left blank for weekends
     weekend_df['Date'] = np.nan
@@ -100,9 +127,15 @@ def generate_holiday_weekend_travel_insight(line_item_data_path, output_holiday_
         expected_columns
     ]
     
+    prof.rows(len(weekend_df))
+
+    prof.stage("write")
     with pd.ExcelWriter(output_weekend_path, engine='xlsxwriter') as writer:
         pd.DataFrame(header_weekend).to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         weekend_df.to_excel(writer, index=False, header=False, startrow=6, sheet_name='Sheet1')
 
+    write_sidecar(output_holiday_path, {'Sheet1': (header_holiday, holiday_df)})
+    write_sidecar(output_weekend_path, {'Sheet1': (header_weekend, weekend_df)})
+
     print(f"PJPA32 complete: {len(holiday_df)} Holiday exceptions, {len(weekend_df)} Weekend exceptions.")
     return output_holiday_path, output_weekend_path
\ No newline at end of file
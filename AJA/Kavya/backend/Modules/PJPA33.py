@@ -1,60 +1,72 @@
 import pandas as pd
 import numpy as np
 
-def generate_bulk_booker_insight(concur_data_path, output_excel_path, bulk_threshold=5):
+from .dataset import load_table
+from .aggregates import build_daily_submissions
+from .groups import flag_known_groups
+from .store import EMPLOYEE_KEY, SUBMIT_DAY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": [
+        'Employee ID', 'Report Name', 'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 'Approval Status',
+        'Report Start Date', 'Report End Date', 'Currency', 'Report Total', 'Payment Status', 'Amount Due Employee',
+        'Report Date', 'Policy', 'Amount Approved'
+    ],
+}
+INPUT_FILTERS = {
+    "concur": [('Submit Date', 'not null', None)],
+}
+
+
+def generate_bulk_booker_insight(concur_data_path, output_excel_path, bulk_threshold=5, daily_submissions=None):
     """
     Identifies employees who hoard receipts and submit multiple reimbursement 
     reports on a single day (Bulk Bookers).
     bulk_threshold: Minimum number of reports submitted on the same day to flag as an exception.
+    daily_submissions: the shared per-employee, per-day aggregate (aggregates.build_daily_submissions);
+    built from the Concur header when the module runs on its own.
     """
     print("Running Bulk Booker Analysis (PJPA33)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    concur_df = df = pd.read_excel(concur_data_path)
+    prof.stage("load")
+    concur_df = load_table(concur_data_path, "concur")
+    prof.rows(len(concur_df))
     
     # Clean column names
+    prof.stage("normalize")
     concur_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
-    # Ensure IDs are strings
-    concur_df['Employee ID'] = concur_df['Employee ID'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-    concur_df['Report Id'] = concur_df['Report Id'].astype(str).str.strip()
-    
-    # 2. Extract strictly the Date component from the Submit Date
-    concur_df['Submit_Date_Parsed'] = pd.to_datetime(concur_df['Submit Date'], errors='coerce')
-    concur_df['Submit_Date_2'] = concur_df['Submit_Date_Parsed'].dt.strftime('%Y-%m-%d')
-    concur_df['Report Total Numeric'] = pd.to_numeric(concur_df['Report Total'], errors='coerce').fillna(0)
+    # 2. The Date component of the Submit Date is the day key stored at ingest
     
     # 3. Group by Employee and Submit Date to count the number of DISTINCT reports submitted that day
-    grouped = concur_df.groupby(['Employee ID', 'Submit_Date_2']).agg(
-        count_report_id=('Report Id', 'nunique'),
-        # Note: If the base data has multiple rows per report, we should group by Report Id first to get accurate sums,
-        # but to maintain consistency with the established pipeline, we aggregate the row totals here.
-        sum_report_total=('Report Total Numeric', 'sum') 
-    ).reset_index()
-    
+    # (the shared per-day aggregate, on the integer employee and report keys and the day key encoded at ingest)
+    prof.stage("aggregate")
+    if daily_submissions is None:
+        daily_submissions = build_daily_submissions(concur_df)
     # 4. Filter for Bulk Bookers (Abuse logic: 5 or more reports submitted on the same day)
-    bulk_bookers = grouped[grouped['count_report_id'] >= bulk_threshold].copy()
-    
-    bulk_bookers.rename(columns={
-        'count_report_id': 'Count(Report Id)',
-        'sum_report_total': 'Sum(Report Total)'
-    }, inplace=True)
-    
-    # 5. Merge back to Header Data to get the specific report details
-    # FIXED LOGIC: Joining on BOTH Employee ID and Submit_Date_2 to prevent Cartesian explosion
-    final_merged = pd.merge(
-        bulk_bookers,
+    # 5. The specific report details are the header rows of the flagged days, kept with the day's
+    # counts attached by a threshold query against the aggregate, so there is no merge back to explode
+    final_merged = flag_known_groups(
         concur_df,
-        on=['Employee ID', 'Submit_Date_2'],
-        how='inner',
-        suffixes=('', ' (Right)')
+        [EMPLOYEE_KEY, SUBMIT_DAY],
+        daily_submissions,
+        lambda days: days['Count(Report Id)'] >= bulk_threshold
     )
     
     # Replicate KNIME's right-side suffix behavior for the output format
+    final_merged['Submit_Date_2'] = final_merged[SUBMIT_DAY].dt.strftime('%Y-%m-%d')
     final_merged['Employee ID (Right)'] = final_merged['Employee ID']
     final_merged['Submit_Date_2 (Right)'] = final_merged['Submit_Date_2']
     
+    prof.rows(len(final_merged))
+
     # 6. Organize Final Output Structure
+    prof.stage("write")
     expected_columns = [
         'Employee ID', 'Submit_Date_2', 'Count(Report Id)', 'Sum(Report Total)', 
         'Report Name', 'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 
@@ -89,5 +101,7 @@ def generate_bulk_booker_insight(concur_data_path, output_excel_path, bulk_thres
         header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"Insight execution complete. Generated {len(final_df)} exception rows for Bulk Bookers.")
     return output_excel_path
\ No newline at end of file
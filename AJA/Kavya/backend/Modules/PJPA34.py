@@ -1,6 +1,21 @@
 import pandas as pd
 import numpy as np
 
+from .dataset import load_table
+from .groups import flag_groups
+from .store import EMPLOYEE_KEY, SUBMIT_MONTH
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": ['Employee ID', 'Employee Name', 'Report Id', 'Report Number', 'Report Start Date', 'Report End Date',
+               'Currency', 'Payment Status', 'Policy', 'Amount Approved', 'Submit Date'],
+}
+INPUT_FILTERS = {
+    "concur": [('Submit Date', 'not null', None), ('Amount Approved', '>', 0)],
+}
+
+
 def generate_low_value_claims_insight(concur_data_path, output_excel_path, amount_threshold=1000, freq_threshold=10):
     """
     Identifies employees who submit a high frequency of low-value claims (under a certain threshold)
@@ -10,24 +25,21 @@ def generate_low_value_claims_insight(concur_data_path, output_excel_path, amoun
     """
     print("Running High-Frequency Low Value Claims Analysis (PJPA34)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    df = df = pd.read_excel(concur_data_path)
+    prof.stage("load")
+    df = load_table(concur_data_path, "concur")
+    prof.rows(len(df))
     
     # Clean column names
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
-    # Ensure ID is string for clean merging
-    df['Employee ID'] = df['Employee ID'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
     df['Amount Approved Numeric'] = pd.to_numeric(df['Amount Approved'], errors='coerce').fillna(0)
     
-    # 2. Extract Date Components for Grouping
-    df['Submit_Date_Parsed'] = pd.to_datetime(df['Submit Date'], errors='coerce')
-    df['Submit_Date2'] = df['Submit_Date_Parsed'].dt.strftime('%Y-%m-%d')
-    df['Year'] = df['Submit_Date_Parsed'].dt.year.astype('Int64').astype(str)
-    df['Month (Name)'] = df['Submit_Date_Parsed'].dt.strftime('%B')
-    
-    # Replicate the duplicated right-side month column from KNIME
-    df['Month (Name) (Right)'] = df['Month (Name)']
+    # 2. Year and month are grouped on through the month key stored at ingest;
+    # their display columns are only rendered for the flagged rows
     
     # 3. Filter for strictly Low Value Claims (< 1000)
     low_value_df = df[
@@ -35,32 +47,34 @@ def generate_low_value_claims_insight(concur_data_path, output_excel_path, amoun
         (df['Amount Approved Numeric'] < amount_threshold)
     ].copy()
     
+    prof.rows(len(low_value_df))
+
     # 4. Group by Employee, Year, and Month
-    grouped = low_value_df.groupby(['Employee ID', 'Employee Name', 'Year', 'Month (Name)']).agg(
-        sum_amount=('Amount Approved Numeric', 'sum'),
-        count_report=('Report Id', 'count'),
-        avg_amount=('Amount Approved Numeric', 'mean')
-    ).reset_index()
-    
     # 5. Filter for High Frequency (Abuse Logic: 10 or more low-value claims in a single month)
-    high_freq_abusers = grouped[grouped['count_report'] >= freq_threshold].copy()
-    
-    high_freq_abusers.rename(columns={
-        'sum_amount': 'Total Amount Approved',
-        'count_report': 'Count(Report Id)',
-        'avg_amount': 'Average of Amount Approved'
-    }, inplace=True)
-    
-    # 6. Merge back to the Low Value Data to get the granular report details
-    # FIXED LOGIC: Joining on Employee ID, Year, AND Month to prevent Cartesian explosion
-    final_merged = pd.merge(
-        high_freq_abusers,
+    # 6. The low value rows of the flagged months are kept with the month's totals attached, in one grouping pass
+    prof.stage("aggregate")
+    final_merged = flag_groups(
         low_value_df,
-        on=['Employee ID', 'Employee Name', 'Year', 'Month (Name)'],
-        how='inner'
+        [EMPLOYEE_KEY, 'Employee Name', SUBMIT_MONTH],
+        lambda months: months['Count(Report Id)'] >= freq_threshold,
+        {
+            'Total Amount Approved': ('Amount Approved Numeric', 'sum'),
+            'Count(Report Id)': ('Report Id', 'count'),
+            'Average of Amount Approved': ('Amount Approved Numeric', 'mean')
+        }
     )
     
+    final_merged['Submit_Date2'] = final_merged['Submit Date'].dt.strftime('%Y-%m-%d')
+    final_merged['Year'] = final_merged[SUBMIT_MONTH].dt.year.astype('Int64').astype(str)
+    final_merged['Month (Name)'] = final_merged[SUBMIT_MONTH].dt.strftime('%B')
+    
+    # Replicate the duplicated right-side month column from KNIME
+    final_merged['Month (Name) (Right)'] = final_merged['Month (Name)']
+    
+    prof.rows(len(final_merged))
+
     # 7. Organize Final Output Structure
+    prof.stage("write")
     expected_columns = [
         'Employee ID', 'Employee Name', 'Year', 'Month (Name)', 'Total Amount Approved', 
         'Count(Report Id)', 'Average of Amount Approved', 'Report Id', 'Report Number', 
@@ -95,5 +109,7 @@ def generate_low_value_claims_insight(concur_data_path, output_excel_path, amoun
         header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=6, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"Insight execution complete. Generated {len(final_df)} exception rows for High-Frequency Low Value Claims.")
     return output_excel_path
\ No newline at end of file
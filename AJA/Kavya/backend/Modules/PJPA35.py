@@ -1,37 +1,53 @@
 import pandas as pd
 import numpy as np
 
+from .dataset import load_table
+from .groups import flag_groups
+from .store import EMPLOYEE_KEY, REPORT_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": [
+        'Employee ID', 'Report Name', 'Report Id', 'Report Number', 'Submit Date', 'Employee Name', 'Approval Status',
+        'Report Start Date', 'Report End Date', 'Currency', 'Report Total', 'Payment Status', 'Amount Due Employee',
+        'Report Date', 'Policy', 'Amount Approved'
+    ],
+}
+
+
 def generate_duplicate_report_id_insight(concur_data_path, output_excel_path):
     print("Running Duplicate Report ID Analysis (PJPA35)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    df = df = pd.read_excel(concur_data_path)
+    prof.stage("load")
+    df = load_table(concur_data_path, "concur")
+    prof.rows(len(df))
     
     # Clean column names
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
-    # Ensure IDs are strings for accurate grouping
-    df['Report Id'] = df['Report Id'].astype(str).str.strip()
-    df['Employee ID'] = df['Employee ID'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-    
-    # 2. Group by Report ID and Employee ID to count occurrences
-    report_counts = df.groupby(['Report Id', 'Employee ID']).size().reset_index(name='Count_Report')
-    
-    # Replicate the KNIME output column mapping
-    report_counts['Count_Employee'] = report_counts['Count_Report']
-    
+    # 2. Group by Report ID and Employee ID (their integer keys) to count occurrences
     # 3. Filter for Duplicate Reports (Count >= 2)
-    duplicates = report_counts[report_counts['Count_Report'] >= 2].copy()
-    
-    # 4. Merge back to original data to pull in all the line-item details
-    final_merged = pd.merge(
-        duplicates, 
-        df, 
-        on=['Report Id', 'Employee ID'], 
-        how='inner'
+    # 4. The rows of the duplicated reports are kept with their count attached, in one grouping pass
+    prof.stage("aggregate")
+    final_merged = flag_groups(
+        df,
+        [REPORT_KEY, EMPLOYEE_KEY],
+        lambda reports: reports['Count_Report'] >= 2,
+        {'Count_Report': (REPORT_KEY, 'size')}
     )
     
+    # Replicate the KNIME output column mapping
+    final_merged['Count_Employee'] = final_merged['Count_Report']
+    
+    prof.rows(len(final_merged))
+
     # 5. Organize Final Output Structure
+    prof.stage("write")
     expected_columns = [
         'Employee ID', 'Report Id', 'Count_Report', 'Count_Employee', 'Report Name', 
         'Report Number', 'Submit Date', 'Employee Name', 'Approval Status', 
@@ -65,5 +81,7 @@ def generate_duplicate_report_id_insight(concur_data_path, output_excel_path):
         header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"Insight execution complete. Generated {len(final_df)} exception rows for Duplicate Reports.")
     return output_excel_path
\ No newline at end of file
@@ -1,5 +1,17 @@
 import pandas as pd
 
+from .dataset import load_table
+from .store import SUBMIT_DAY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": ['Submit Date'],
+}
+INPUT_FILTERS = {
+    "concur": [('Submit Date', 'not null', None)],
+}
+
 
 def generate_pjpa36_missing_days(
     input_excel_path,
@@ -7,36 +19,34 @@ def generate_pjpa36_missing_days(
 ):
     print("Running PJPA36 – Missing Days Analysis (Submit Date)...")
 
+    prof = stage_profile()
+
     # =====================================================
     # 1. Load data
     # =====================================================
-    df = pd.read_excel(input_excel_path)
+    prof.stage("load")
+    df = load_table(input_excel_path, "concur")
+    prof.rows(len(df))
+
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
 
     if 'Submit Date' not in df.columns:
         raise ValueError("Submit Date column not found.")
 
     # =====================================================
-    # 2. Clean Submit Date (remove time after T)
+    # 2. Submit days (the date part, stored at ingest)
     # =====================================================
-    df['Submit Date'] = (
-        df['Submit Date']
-        .astype(str)
-        .str.split('T')
-        .str[0]
-    )
+    submit_days = pd.Series(df[SUBMIT_DAY].dropna().unique())
 
-    df['Submit Date'] = pd.to_datetime(
-        df['Submit Date'], errors='coerce'
-    ).dt.date
-
-    df = df[df['Submit Date'].notna()].copy()
+    prof.rows(len(submit_days))
 
     # =====================================================
     # 3. Find min & max dates
     # =====================================================
-    min_date = df['Submit Date'].min()
-    max_date = df['Submit Date'].max()
+    prof.stage("aggregate")
+    min_date = submit_days.min().date()
+    max_date = submit_days.max().date()
 
     print(f"Date range: {min_date} → {max_date}")
 
@@ -52,7 +62,7 @@ def generate_pjpa36_missing_days(
     # =====================================================
     # 5. Find missing days
     # =====================================================
-    present_dates = set(df['Submit Date'].unique())
+    present_dates = set(submit_days.dt.date)
     missing_dates = sorted(set(full_dates) - present_dates)
 
     if not missing_dates:
@@ -63,9 +73,12 @@ def generate_pjpa36_missing_days(
         'Missing Submit Date': missing_dates
     })
 
+    prof.rows(len(missing_df))
+
     # =====================================================
     # 6. Metadata header
     # =====================================================
+    prof.stage("write")
     header_rows = [
         ['Insight ID', 'PJPA36'],
         ['Exception No', '1'],
@@ -95,6 +108,8 @@ def generate_pjpa36_missing_days(
             sheet_name='PJPA36'
         )
 
+    write_sidecar(output_excel_path, {'PJPA36': (header_rows, missing_df)})
+
     print(f"PJPA36 complete. Missing days found: {len(missing_df)}")
     return output_excel_path
 
@@ -1,6 +1,17 @@
 import pandas as pd
 import numpy as np
 
+from .dataset import load_table
+from .store import EMPLOYEE_KEY, NULL_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "line_items": ['Expense Type', 'Employee ID', 'Employee', 'Report Name', 'Report ID', 'Report Date',
+                   'Transaction Date', 'Approved Amount'],
+}
+
+
 def generate_odd_travels_insight(line_item_data_path, output_excel_path, rare_threshold_pct=5):
     """
     Identifies 'Odd Travels' by calculating the percentage breakdown of travel modes 
@@ -9,17 +20,21 @@ def generate_odd_travels_insight(line_item_data_path, output_excel_path, rare_th
     """
     print("Running Odd Travels Analysis (PJPA38)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    df = pd.read_excel(line_item_data_path)
+    prof.stage("load")
+    df = load_table(line_item_data_path, "line_items")
+    prof.rows(len(df))
     
     # Clean column names
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
-    # Ensure ID is a clean string
-    if 'Employee ID' in df.columns:
-        df['Employee ID'] = df['Employee ID'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-    else:
+    # Employee IDs arrive cleaned, with an integer key to group on
+    if 'Employee ID' not in df.columns:
         df['Employee ID'] = "UNKNOWN"
+        df[EMPLOYEE_KEY] = NULL_KEY
         
     # Ensure Approved Amount is numeric
     if 'Approved Amount' in df.columns:
@@ -31,23 +46,30 @@ def generate_odd_travels_insight(line_item_data_path, output_excel_path, rare_th
         df['Expense Type'] = "Unknown"
         
     # 2. Grouping to find Mode_Count and Total_Trips
+    prof.stage("aggregate")
     # Calculate how many times each employee used each travel mode
-    mode_counts = df.groupby(['Employee ID', 'Expense Type']).size().reset_index(name='Mode_Count')
+    mode_counts = df.groupby([EMPLOYEE_KEY, 'Expense Type'], observed=True).size().reset_index(name='Mode_Count')
     
     # Calculate total trips per employee
-    total_trips = df.groupby('Employee ID').size().reset_index(name='Total_Trips')
+    total_trips = df.groupby(EMPLOYEE_KEY).size().reset_index(name='Total_Trips')
     
     # 3. Merge to calculate Usage Percentage
-    counts_df = pd.merge(mode_counts, total_trips, on='Employee ID')
+    counts_df = pd.merge(mode_counts, total_trips, on=EMPLOYEE_KEY)
     counts_df['Usage_Pct'] = (counts_df['Mode_Count'] / counts_df['Total_Trips']) * 100
     
     # 4. Assign Flag (Adjust the rare_threshold_pct parameter if you want <10% instead of <5%)
     counts_df['Flag'] = np.where(counts_df['Usage_Pct'] <= rare_threshold_pct, 'Rare', 'Dominant')
     
+    prof.rows(len(counts_df))
+
     # 5. Merge stats back to the original line item dataframe
-    final_merged = pd.merge(df, counts_df, on=['Employee ID', 'Expense Type'], how='left')
+    prof.stage("join")
+    final_merged = pd.merge(df, counts_df, on=[EMPLOYEE_KEY, 'Expense Type'], how='left')
     
+    prof.rows(len(final_merged))
+
     # 6. Prepare Output Structure matching your requested columns
+    prof.stage("write")
     expected_columns = [
         'Expense Type', 'Employee ID', 'Mode_Count', 'Total_Trips', 
         'Employee', 'Report Name', 'Report ID', 'Report Date', 
@@ -94,4 +116,9 @@ def generate_odd_travels_insight(line_item_data_path, output_excel_path, rare_th
         pd.DataFrame(header_rows_2).to_excel(writer, index=False, header=False, sheet_name='Anomaly Only')
         sheet2_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Anomaly Only')
         
+    write_sidecar(output_excel_path, {
+        'Context and Anomaly': (header_rows_1, sheet1_df),
+        'Anomaly Only': (header_rows_2, sheet2_df),
+    })
+
     print(f"PJPA38 complete: {len(sheet2_df)} anomaly rows detected out of {len(sheet1_df)} total trips.")
\ No newline at end of file
@@ -1,15 +1,26 @@
 import pandas as pd
 import numpy as np
 
+from .dataset import load_table
+from .store import KEY_SPACES
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
 def generate_active_with_sep_date_insight(emp_master_path, output_excel_path):
     print("Running Active Employees with Separation Date Analysis (PJPA39)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    df = pd.read_excel(emp_master_path)
+    prof.stage("load")
+    df = load_table(emp_master_path, "emp_master")
+    prof.rows(len(df))
     
     # Clean column names
+    prof.stage("normalize")
     df.rename(columns=lambda x: str(x).strip(), inplace=True)
-    original_cols = df.columns.tolist()
+    # The surrogate key columns are internal and not part of the report
+    original_cols = [col for col in df.columns if col not in KEY_SPACES]
     
     # 2. Identify the Employee ID column dynamically based on the master file
     id_col = 'Employee ID(Only ALPHA NUM)' if 'Employee ID(Only ALPHA NUM)' in df.columns else 'Supplier'
@@ -20,6 +31,7 @@ def generate_active_with_sep_date_insight(emp_master_path, output_excel_path):
     df['Status_Clean'] = df['Employee Status'].astype(str).str.strip().str.upper()
     
     # 3. Apply the "Strictly Active" Rule
+    prof.stage("aggregate")
     # First, find any employee ID that has a non-active record (e.g., 'INACTIVE', 'SEPARATED', etc.)
     non_active_emps = df[df['Status_Clean'] != 'ACTIVE']['Emp_ID_Clean'].unique()
     
@@ -27,13 +39,14 @@ def generate_active_with_sep_date_insight(emp_master_path, output_excel_path):
     strictly_active_df = df[~df['Emp_ID_Clean'].isin(non_active_emps)].copy()
     
     # 4. Apply the Separation Date Rule
-    # Convert separation dates to datetime objects so we can easily filter out the blanks/nulls
-    strictly_active_df['Sep_Date_Parsed'] = pd.to_datetime(strictly_active_df['Employee Separation Date'], errors='coerce')
-    
+    # Separation dates are parsed at ingest, so blanks/nulls are already NaT
     # The exceptions are the strictly active employees who actually have a parsed separation date
-    exception_df = strictly_active_df[strictly_active_df['Sep_Date_Parsed'].notna()].copy()
+    exception_df = strictly_active_df[strictly_active_df['Employee Separation Date'].notna()].copy()
     
+    prof.rows(len(exception_df))
+
     # 5. Format the Output
+    prof.stage("write")
     final_df = exception_df[original_cols].copy()
     
     # Sort the exceptions by Separation Date (newest first)
@@ -54,4 +67,6 @@ def generate_active_with_sep_date_insight(emp_master_path, output_excel_path):
         pd.DataFrame(header_rows).to_excel(writer, index=False, header=False, sheet_name='Sheet1')
         final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Sheet1')
         
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
     print(f"PJPA39 complete: {len(final_df)} exceptions found.")
\ No newline at end of file
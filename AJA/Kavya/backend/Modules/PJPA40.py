@@ -1,54 +1,76 @@
 import pandas as pd
 import numpy as np
 
+from .dataset import load_table
+from .joins import attach, narrow_merge
+from .store import EMPLOYEE_KEY, REPORT_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": ['Report Number', 'Submit Date', 'Report Start Date', 'Report End Date', 'Currency', 'Report Total',
+               'Amount Due Employee', 'Policy'],
+    "line_items": [
+        'Employee', 'Report Name', 'Expense Type', 'Report ID', 'Approval Status', 'Payment Status', 'Report Date',
+        'Transaction Date', 'Total Approved Amount', 'City/Location', 'Payment Type', 'Approved Amount', 'Employee ID'
+    ],
+}
+INPUT_FILTERS = {
+    "concur": [('Report Start Date', 'not null', None)],
+    "line_items": [('Transaction Date', 'not null', None)],
+}
+
+
 def generate_transaction_date_anomaly_insight(concur_data_path, line_item_data_path, output_excel_path):
     print("Running Transaction Date Anomaly Analysis (PJPA40)...")
     
+    prof = stage_profile()
+
     # 1. Load Data
-    concur_df = pd.read_excel(concur_data_path)
-    line_item_df = pd.read_excel(line_item_data_path)
+    prof.stage("load")
+    concur_df = load_table(concur_data_path, "concur")
+    line_item_df = load_table(line_item_data_path, "line_items")
+    prof.rows(len(concur_df) + len(line_item_df))
     
     # Clean column names
+    prof.stage("normalize")
     concur_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     line_item_df.rename(columns=lambda x: str(x).strip(), inplace=True)
     
-    # Standardize join keys (handle potential slight naming variations)
-    report_id_col_concur = 'Report Id' if 'Report Id' in concur_df.columns else 'Report ID'
-    concur_df['Report ID_Join'] = concur_df[report_id_col_concur].astype(str).str.strip()
-    concur_df['Employee ID_Join'] = concur_df['Employee ID'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-    
-    report_id_col_line = 'Report Id' if 'Report Id' in line_item_df.columns else 'Report ID'
-    line_item_df['Report ID_Join'] = line_item_df[report_id_col_line].astype(str).str.strip()
-    line_item_df['Employee ID_Join'] = line_item_df['Employee ID'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+    # Join keys: Report Id/Report ID naming variations are resolved at ingest, and both
+    # tables carry the same integer report and employee keys
     
     # 2. Merge Line Items with Concur Headers to get the bounding dates
-    merged_df = pd.merge(
-        line_item_df, 
-        concur_df, 
-        on=['Report ID_Join', 'Employee ID_Join'], 
-        how='inner', 
-        suffixes=('', '_header')
-    )
+    prof.stage("join")
+    # Filter out rows missing core comparative dates before joining, and join only the dates;
+    # the full line and header rows are attached to the exceptions alone
+    line_item_df = line_item_df[line_item_df['Transaction Date'].notna()]
+    concur_df = concur_df[concur_df['Report Start Date'].notna()]
+    keys = [REPORT_KEY, EMPLOYEE_KEY]
+    pairs = narrow_merge(line_item_df, concur_df, on=keys, suffixes=('', '_header'),
+                         columns=['Transaction Date', 'Report Start Date', 'Report End Date'])
     
+    prof.rows(len(pairs))
+
     # 3. Process Dates for Comparison
-    merged_df['Transaction Date Parsed'] = pd.to_datetime(merged_df['Transaction Date'], errors='coerce')
-    merged_df['Report Start Date Parsed'] = pd.to_datetime(merged_df['Report Start Date'], errors='coerce')
-    
+    prof.stage("aggregate")
+    # (already datetime64, parsed once at ingest)
     # CRITICAL RULE: If Report End Date is missing, assume it equals Report Start Date
-    merged_df['Report End Date Parsed'] = pd.to_datetime(merged_df['Report End Date'], errors='coerce')
-    merged_df['Report End Date Parsed'] = merged_df['Report End Date Parsed'].fillna(merged_df['Report Start Date Parsed'])
-    
-    # Filter out rows missing core comparative dates
-    valid_dates = merged_df.dropna(subset=['Transaction Date Parsed', 'Report Start Date Parsed']).copy()
+    report_end = pairs['Report End Date'].fillna(pairs['Report Start Date'])
     
     # 4. Apply Exception Logic
     # Case 1: Transaction happened AFTER the trip ended
-    case1_df = valid_dates[valid_dates['Transaction Date Parsed'] > valid_dates['Report End Date Parsed']].copy()
+    case1_df = attach(line_item_df, concur_df, pairs[pairs['Transaction Date'] > report_end],
+                      on=keys, suffixes=('', '_header'))
     
     # Case 2: Transaction happened BEFORE the trip started
-    case2_df = valid_dates[valid_dates['Transaction Date Parsed'] < valid_dates['Report Start Date Parsed']].copy()
+    case2_df = attach(line_item_df, concur_df, pairs[pairs['Transaction Date'] < pairs['Report Start Date']],
+                      on=keys, suffixes=('', '_header'))
     
+    prof.rows(len(case1_df) + len(case2_df))
+
     # 5. Format Output Columns
+    prof.stage("write")
     expected_columns = [
         'Employee', 'Report Name', 'Expense Type', 'Report ID', 'Approval Status', 'Payment Status',
         'Report Date', 'Transaction Date', 'Total Approved Amount', 'City/Location', 'Payment Type', 
@@ -89,4 +111,9 @@ def generate_transaction_date_anomaly_insight(concur_data_path, line_item_data_p
         pd.DataFrame(header_case2).to_excel(writer, index=False, header=False, sheet_name='Before Start Date')
         case2_final.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Before Start Date')
         
+    write_sidecar(output_excel_path, {
+        'After End Date': (header_case1, case1_final),
+        'Before Start Date': (header_case2, case2_final),
+    })
+
     print(f"PJPA40 complete: {len(case1_final)} claims after end date, {len(case2_final)} claims before start date.")
\ No newline at end of file
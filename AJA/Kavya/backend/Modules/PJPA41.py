@@ -0,0 +1,123 @@
+import pandas as pd
+import numpy as np
+
+from .dataset import load_table
+from .interval_join import expand_ranges, lex_searchsorted
+from .store import EMPLOYEE_KEY, REPORT_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": ['Employee ID', 'Employee Name', 'Report Id', 'Report Number', 'Report Name', 'Report Start Date',
+               'Report End Date', 'Submit Date', 'Approval Status', 'Policy', 'Report Total', 'Amount Approved'],
+}
+INPUT_FILTERS = {
+    "concur": [('Report Start Date', 'not null', None)],
+}
+
+# Report columns shown for both reports of an overlapping pair; the second report's get a ' (Right)' suffix
+REPORT_COLUMNS = ['Report Id', 'Report Number', 'Report Name', 'Report Start Date', 'Report End Date', 'Submit Date',
+                  'Approval Status', 'Policy', 'Report Total', 'Amount Approved']
+
+
+def generate_overlapping_trips_insight(concur_data_path, output_excel_path, min_overlap_days=1):
+    """
+    Identifies employees claiming overlapping trips: two different reports of
+    the same employee whose Report Start / End Date intervals share days
+    (double-dipping on travel allowances or expenses).
+    min_overlap_days: the fewest shared calendar days for a pair to be flagged (Default: 1,
+    i.e. a trip starting on the day another one ends counts).
+    """
+    print("Running Overlapping Trips Analysis (PJPA41)...")
+
+    prof = stage_profile()
+
+    # 1. Load Data
+    prof.stage("load")
+    df = load_table(concur_data_path, "concur")
+    prof.rows(len(df))
+
+    # Clean column names
+    prof.stage("normalize")
+    df.rename(columns=lambda x: str(x).strip(), inplace=True)
+
+    # 2. One trip interval per report (the header may repeat a report), for known employees only:
+    # all unknown ones share NULL_KEY and would be swept as one. Dates are datetime64 from ingest
+    trips = df[(df[EMPLOYEE_KEY] >= 0) & df['Report Start Date'].notna()]
+    trips = trips.drop_duplicates(subset=[EMPLOYEE_KEY, REPORT_KEY]).reset_index(drop=True)
+    start = trips['Report Start Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    end = trips['Report End Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    # Same rule as PJPA40: a missing (or inverted) Report End Date means a one-day trip
+    end = np.where(trips['Report End Date'].isna().to_numpy() | (end < start), start, end)
+
+    prof.rows(len(trips))
+
+    # 3. Sort-and-sweep per employee: with trips sorted by (employee, start), the trips overlapping
+    # trip i that start after it are exactly the ones up to the first start beyond i's end date,
+    # found for every trip at once by one binary search; no pairwise self-join
+    prof.stage("aggregate")
+    keys = trips[EMPLOYEE_KEY].to_numpy()
+    order = np.lexsort((end, start, keys))
+    keys, start, end = keys[order], start[order], end[order]
+    reach = lex_searchsorted(keys, start, keys, end, 'right')
+    first = np.arange(len(trips)) + 1
+    earlier, later = expand_ranges(first, np.maximum(reach - first, 0))
+
+    # Overlap of each pair, in calendar days (both ends inclusive)
+    overlap_start = start[later]
+    overlap_end = np.minimum(end[earlier], end[later])
+    overlap_days = overlap_end - overlap_start + 1
+    kept = overlap_days >= min_overlap_days
+    earlier, later = order[earlier[kept]], order[later[kept]]
+
+    prof.rows(len(earlier))
+
+    # 4. One output row per overlapping pair: the employee, both reports and the shared days
+    prof.stage("join")
+    first_trip = trips.iloc[earlier].reset_index(drop=True)
+    second_trip = trips.iloc[later].reset_index(drop=True)
+    pairs_df = first_trip[[c for c in ['Employee ID', 'Employee Name'] + REPORT_COLUMNS if c in first_trip.columns]].copy()
+    for col in REPORT_COLUMNS:
+        pairs_df[f'{col} (Right)'] = second_trip[col].to_numpy() if col in second_trip.columns else np.nan
+    pairs_df['Overlap Start'] = pd.to_datetime(overlap_start[kept], unit='D').strftime('%Y-%m-%d')
+    pairs_df['Overlap End'] = pd.to_datetime(overlap_end[kept], unit='D').strftime('%Y-%m-%d')
+    pairs_df['Overlapping Days'] = overlap_days[kept]
+
+    prof.rows(len(pairs_df))
+
+    # 5. Organize Final Output Structure
+    prof.stage("write")
+    expected_columns = (['Employee ID', 'Employee Name'] + REPORT_COLUMNS + [f'{col} (Right)' for col in REPORT_COLUMNS]
+                        + ['Overlap Start', 'Overlap End', 'Overlapping Days'])
+
+    # Gracefully add missing columns if schema drifts
+    for col in expected_columns:
+        if col not in pairs_df.columns:
+            pairs_df[col] = np.nan
+
+    final_df = pairs_df[expected_columns]
+
+    # 6. Sort to keep the longest overlaps at the top, grouped by employee
+    final_df = final_df.sort_values(by=['Overlapping Days', 'Employee ID', 'Report Start Date'],
+                                    ascending=[False, True, True], kind='stable')
+
+    # 7. Construct Insight Meta-Headers
+    header_rows = [
+        ['Insight ID ', 'PJPA41'] + [''] * (len(expected_columns) - 2),
+        ['Exception No', '1'] + [''] * (len(expected_columns) - 2),
+        ['Exception Type', 'Overlapping Trips - The same employee claiming different reports whose trip dates overlap'] + [''] * (len(expected_columns) - 2),
+        [''] * len(expected_columns),
+        expected_columns
+    ]
+
+    header_df = pd.DataFrame(header_rows)
+
+    # 8. Export seamlessly to matching Excel layout
+    with pd.ExcelWriter(output_excel_path, engine='xlsxwriter') as writer:
+        header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
+        final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Sheet1')
+
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
+    print(f"Insight execution complete. Generated {len(final_df)} overlapping trip pairs.")
+    return output_excel_path
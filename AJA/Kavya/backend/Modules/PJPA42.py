@@ -0,0 +1,150 @@
+import pandas as pd
+import numpy as np
+
+from .dataset import iter_table, load_table
+from .store import REPORT_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "concur": ['Employee ID', 'Employee Name', 'Report Id', 'Report Number', 'Report Name', 'Submit Date',
+               'Approval Status', 'Report Total', 'Amount Approved'],
+    "line_items": ['Employee ID', 'Employee', 'Report ID', 'Report Name', 'Approved Amount'],
+}
+
+# Line item columns kept for the first line of every report, to describe orphaned reports
+LINE_DETAIL_COLUMNS = ['Report ID', 'Employee ID', 'Employee', 'Report Name']
+
+HEADER_COLUMNS = ['Employee ID', 'Employee Name', 'Report Id', 'Report Number', 'Report Name', 'Submit Date',
+                  'Approval Status', 'Report Total', 'Amount Approved']
+
+
+def _grow(totals, size):
+    # Per-report arrays are indexed by report key + 1 and grow as higher keys show up in later batches
+    return np.pad(totals, (0, max(size - len(totals), 0)))
+
+
+def generate_reconciliation_insight(concur_data_path, line_item_data_path, output_excel_path, tolerance=1.0):
+    """
+    Reconciles the Concur header with the line items: the line items of every
+    report are summed and compared with the report's Amount Approved (its
+    Report Total when no approved amount was recorded).
+    Flags three exceptions, one sheet each:
+        1. Amount Mismatch: the line items differ from the header by more than tolerance,
+           or the header has no numeric amount to compare them with (Difference left blank)
+        2. Orphan Line Items: line items of reports missing from the header
+        3. Reports Without Lines: header reports with no line items
+    The line items are folded into per-report counts and totals one batch at
+    a time (np.bincount on the report keys), so the full line item file is
+    read in one pass and memory grows with the number of reports, not lines.
+    tolerance: largest absolute difference still treated as reconciled (Default: 1.0, for rounding).
+    """
+    print("Running Header vs Line Item Reconciliation (PJPA42)...")
+
+    prof = stage_profile()
+
+    # 1. Load Data: the header whole, one report per row
+    prof.stage("load")
+    concur_df = load_table(concur_data_path, "concur")
+    concur_df.rename(columns=lambda x: str(x).strip(), inplace=True)
+    prof.rows(len(concur_df))
+
+    # 2. One grouped pass over the line items: per report key, the line count and approved total.
+    # Slot 0 collects the lines without a Report ID (NULL_KEY + 1).
+    prof.stage("aggregate")
+    line_counts = np.zeros(0, dtype=np.int64)
+    line_sums = np.zeros(0)
+    first_lines = []
+    line_rows = 0
+    for batch in iter_table(line_item_data_path, "line_items", INPUT_COLUMNS["line_items"]):
+        slots = batch[REPORT_KEY].to_numpy(dtype=np.int64) + 1
+        amounts = pd.to_numeric(batch['Approved Amount'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        size = int(slots.max()) + 1 if len(slots) else 0
+        line_counts, line_sums = _grow(line_counts, size), _grow(line_sums, size)
+
+        # Details of the first line of every report not seen in an earlier batch
+        unseen = line_counts[slots] == 0
+        first_lines.append(batch.loc[unseen, [REPORT_KEY] + [c for c in LINE_DETAIL_COLUMNS if c in batch.columns]]
+                           .drop_duplicates(subset=[REPORT_KEY]))
+
+        line_counts += np.bincount(slots, minlength=len(line_counts))
+        line_sums += np.bincount(slots, weights=amounts, minlength=len(line_sums))
+        line_rows += len(batch)
+    prof.rows(line_rows)
+
+    first_lines_df = pd.concat(first_lines, ignore_index=True) if first_lines else pd.DataFrame(columns=[REPORT_KEY])
+
+    # 3. Join the per-report totals to the header on the encoded report key: a plain array lookup
+    prof.stage("join")
+    header_df = concur_df[concur_df[REPORT_KEY] >= 0].drop_duplicates(subset=[REPORT_KEY]).reset_index(drop=True)
+    header_slots = header_df[REPORT_KEY].to_numpy(dtype=np.int64) + 1
+    size = max(len(line_counts), int(header_slots.max()) + 1 if len(header_slots) else 0)
+    line_counts, line_sums = _grow(line_counts, size), _grow(line_sums, size)
+
+    header_df['Line Item Count'] = line_counts[header_slots]
+    header_df['Line Item Approved Amount'] = line_sums[header_slots]
+    approved = pd.to_numeric(header_df['Amount Approved'], errors='coerce')
+    header_amount = approved.fillna(pd.to_numeric(header_df['Report Total'], errors='coerce'))
+    header_df['Difference'] = header_df['Line Item Approved Amount'] - header_amount
+    header_df['Difference %'] = (header_df['Difference'] / header_amount.where(header_amount != 0)) * 100
+
+    # 4. The three exceptions
+    prof.stage("aggregate")
+    has_lines = header_df['Line Item Count'] > 0
+    unreconciled = (header_df['Difference'].abs() > tolerance) | header_amount.isna()
+    mismatch_df = header_df[has_lines & unreconciled].copy()
+    no_lines_df = header_df[~has_lines].copy()
+
+    in_header = np.zeros(size, dtype=bool)
+    in_header[header_slots] = True
+    orphan_slots = np.flatnonzero((line_counts > 0) & ~in_header)
+    orphan_df = first_lines_df[first_lines_df[REPORT_KEY].isin(orphan_slots - 1)].copy()
+    orphan_slot_index = orphan_df[REPORT_KEY].to_numpy(dtype=np.int64) + 1
+    orphan_df['Line Item Count'] = line_counts[orphan_slot_index]
+    orphan_df['Line Item Approved Amount'] = line_sums[orphan_slot_index]
+
+    prof.rows(len(mismatch_df) + len(orphan_df) + len(no_lines_df))
+
+    # 5. Organize Final Output Structure, largest amounts at the top
+    prof.stage("write")
+    sheets = [
+        ('Amount Mismatch', 'Header vs Line Items - Sum of line item Approved Amount differs from the report header',
+         mismatch_df.assign(**{'Abs Difference': mismatch_df['Difference'].abs()})
+         .sort_values(by=['Abs Difference', 'Employee ID'], ascending=[False, True], kind='stable'),
+         HEADER_COLUMNS + ['Line Item Count', 'Line Item Approved Amount', 'Difference', 'Difference %']),
+        ('Orphan Line Items', 'Header vs Line Items - Line items whose report is missing from the Concur header',
+         orphan_df.sort_values(by=['Line Item Approved Amount'], ascending=False, kind='stable'),
+         LINE_DETAIL_COLUMNS + ['Line Item Count', 'Line Item Approved Amount']),
+        ('Reports Without Lines', 'Header vs Line Items - Reports in the Concur header with no line items',
+         no_lines_df.sort_values(by=['Report Total', 'Employee ID'], ascending=[False, True], kind='stable'),
+         HEADER_COLUMNS),
+    ]
+
+    tables = {}
+    for number, (sheet_name, exception_type, df, expected_columns) in enumerate(sheets, start=1):
+        # Gracefully add missing columns if schema drifts
+        for col in expected_columns:
+            if col not in df.columns:
+                df[col] = np.nan
+
+        # 6. Construct Insight Meta-Headers
+        header_rows = [
+            ['Insight ID ', 'PJPA42'] + [''] * (len(expected_columns) - 2),
+            ['Exception No', str(number)] + [''] * (len(expected_columns) - 2),
+            ['Exception Type', exception_type] + [''] * (len(expected_columns) - 2),
+            [''] * len(expected_columns),
+            expected_columns
+        ]
+        tables[sheet_name] = (header_rows, df[expected_columns])
+
+    # 7. Export seamlessly to matching Excel layout
+    with pd.ExcelWriter(output_excel_path, engine='xlsxwriter') as writer:
+        for sheet_name, (header_rows, final_df) in tables.items():
+            pd.DataFrame(header_rows).to_excel(writer, index=False, header=False, sheet_name=sheet_name)
+            final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name=sheet_name)
+
+    write_sidecar(output_excel_path, tables)
+
+    print(f"Insight execution complete. {len(mismatch_df)} mismatched reports, {len(orphan_df)} orphaned reports, "
+          f"{len(no_lines_df)} reports without line items.")
+    return output_excel_path
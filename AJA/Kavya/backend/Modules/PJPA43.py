@@ -0,0 +1,178 @@
+import pandas as pd
+import numpy as np
+
+from .dataset import load_table
+from .interval_join import expand_ranges, lex_searchsorted
+from .store import EMPLOYEE_KEY, REPORT_KEY
+from .profiling import stage_profile
+from .sidecar import write_sidecar
+
+INPUT_COLUMNS = {
+    "line_items": ['Employee ID', 'Employee', 'Report ID', 'Report Name', 'Expense Type', 'Transaction Date',
+                   'Approved Amount', 'City/Location', 'Payment Type'],
+}
+INPUT_FILTERS = {
+    "line_items": [('Transaction Date', 'not null', None), ('Approved Amount', '>', 0)],
+}
+
+# Line item columns shown for both lines of a candidate pair; the second line's get a ' (Right)' suffix
+LINE_COLUMNS = ['Report ID', 'Report Name', 'Expense Type', 'Transaction Date', 'Approved Amount', 'City/Location',
+                'Payment Type']
+
+# Points each kind of agreement adds to a pair's Match Score (out of 100). Amount and date
+# points shrink linearly with the difference across the rounding unit / date window.
+SCORE_WEIGHTS = {'amount': 40, 'date': 30, 'Expense Type': 20, 'City/Location': 10}
+
+
+def generate_near_duplicate_insight(line_item_data_path, output_excel_path, amount_rounding=1.0, window_days=3,
+                                    min_score=70, max_block_lines=5, same_report=False):
+    """
+    Identifies expenses claimed twice: line items of the same employee for
+    amounts at most amount_rounding apart with transaction dates at most
+    window_days apart, resubmitted under another report. Each candidate pair
+    is scored on how closely amount, date, Expense Type and City/Location agree.
+    Blocking keeps the cost near-linear: lines are sorted by (employee,
+    amount bucket, date) and a line is only compared with the lines of its
+    own bucket and the next one that fall inside its date window, found by
+    binary search; two amounts within one bucket width are always in the
+    same or neighbouring buckets.
+    amount_rounding: the bucket width, and the largest amount difference paired (Default: 1.0)
+    min_score: the lowest Match Score reported (Default: 70)
+    max_block_lines: more lines than this of one employee in one amount bucket within
+    window_days either side of a line are a recurring charge (a daily allowance) rather than
+    duplicates; those lines and the ones within their window are not paired. None pairs
+    every line (Default: 5)
+    same_report: also pair two lines of the same report (Default: False)
+    """
+    print("Running Near-Duplicate Claims Analysis (PJPA43)...")
+
+    prof = stage_profile()
+
+    # 1. Load Data
+    prof.stage("load")
+    df = load_table(line_item_data_path, "line_items")
+    prof.rows(len(df))
+
+    # Clean column names
+    prof.stage("normalize")
+    df.rename(columns=lambda x: str(x).strip(), inplace=True)
+
+    # 2. Keep the lines that can be compared: a known employee, a date and a positive amount
+    amounts = pd.to_numeric(df['Approved Amount'], errors='coerce')
+    lines = df[(df[EMPLOYEE_KEY] >= 0) & df['Transaction Date'].notna() & (amounts > 0)].reset_index(drop=True)
+    amount = pd.to_numeric(lines['Approved Amount'], errors='coerce').to_numpy(dtype=np.float64)
+    day = lines['Transaction Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    prof.rows(len(lines))
+
+    # 3. Blocking: sort by (employee, amount bucket, date) and number the (employee, amount bucket) blocks
+    prof.stage("aggregate")
+    bucket = np.floor(amount / amount_rounding).astype(np.int64)
+    employee = lines[EMPLOYEE_KEY].to_numpy(dtype=np.int64)
+    order = np.lexsort((day, bucket, employee))
+    employee, bucket, day, amount = employee[order], bucket[order], day[order], amount[order]
+    starts = np.flatnonzero(np.r_[True, (employee[1:] != employee[:-1]) | (bucket[1:] != bucket[:-1])])[:len(order)]
+    block = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))
+
+    # Recurring charges: lines with too many lines of their block within window_days either side,
+    # and the lines in the window of one, are left out on both sides of every pair. Counting per
+    # window keeps an amount claimed now and then over a year pairable
+    routine = np.zeros(len(order), dtype=bool)
+    if max_block_lines is not None:
+        window_first = lex_searchsorted(block, day, block, day - window_days, 'left')
+        window_last = lex_searchsorted(block, day, block, day + window_days, 'right')
+        dense = np.r_[0, np.cumsum(window_last - window_first > max_block_lines)]
+        routine = dense[window_last] > dense[window_first]
+    block_employee, block_bucket = employee[starts], bucket[starts]
+    order, block, day, amount = order[~routine], block[~routine], day[~routine], amount[~routine]
+
+    # 4. Candidate pairs, found for all lines by binary search (same sweep as PJPA41):
+    # the later lines of the own block within window_days, and every line of the next
+    # bucket's block within window_days either side
+    reach = lex_searchsorted(block, day, block, day + window_days, 'right')
+    first = np.arange(len(order)) + 1
+    own, own_later = expand_ranges(first, np.maximum(reach - first, 0))
+
+    next_block = np.minimum(block + 1, max(len(starts) - 1, 0))
+    adjacent = ((block + 1 < len(starts)) & (block_employee[next_block] == block_employee[block])
+                & (block_bucket[next_block] == block_bucket[block] + 1))
+    low = lex_searchsorted(block, day, block + 1, day - window_days, 'left')
+    high = lex_searchsorted(block, day, block + 1, day + window_days, 'right')
+    near, near_other = expand_ranges(low, np.where(adjacent, np.maximum(high - low, 0), 0))
+
+    # Each pair ordered by date, earlier line first
+    one, other = np.r_[own, near], np.r_[own_later, near_other]
+    swap = day[other] < day[one]
+    earlier, later = np.where(swap, other, one), np.where(swap, one, other)
+
+    # 5. Score the candidates
+    amount_gap = np.abs(amount[earlier] - amount[later])
+    days_apart = day[later] - day[earlier]
+    score = (SCORE_WEIGHTS['amount'] * np.clip(1 - amount_gap / amount_rounding, 0, 1)
+             + SCORE_WEIGHTS['date'] * (1 - days_apart / (window_days + 1)))
+    earlier, later = order[earlier], order[later]
+    for col in ('Expense Type', 'City/Location'):
+        if col in lines.columns:
+            values = lines[col].astype(object).to_numpy()
+            same = pd.notna(values[earlier]) & (values[earlier] == values[later])
+            score = score + SCORE_WEIGHTS[col] * same
+    score = np.round(score, 1)
+    reports = lines[REPORT_KEY].to_numpy()
+    kept = (score >= min_score) & (amount_gap <= amount_rounding)
+    if not same_report:
+        kept &= reports[earlier] != reports[later]
+    earlier, later = earlier[kept], later[kept]
+
+    prof.rows(len(earlier))
+
+    # 6. One output row per pair: the employee, both lines and how they match
+    prof.stage("join")
+    first_line = lines.iloc[earlier].reset_index(drop=True)
+    second_line = lines.iloc[later].reset_index(drop=True)
+    pairs_df = first_line[[c for c in ['Employee ID', 'Employee'] + LINE_COLUMNS if c in first_line.columns]].copy()
+    for col in LINE_COLUMNS:
+        pairs_df[f'{col} (Right)'] = second_line[col].to_numpy() if col in second_line.columns else np.nan
+    pairs_df['Days Apart'] = days_apart[kept]
+    pairs_df['Amount Difference'] = np.round(amount_gap[kept], 2)
+    pairs_df['Same Report'] = np.where(reports[earlier] == reports[later], 'Yes', 'No')
+    pairs_df['Match Score'] = score[kept]
+
+    prof.rows(len(pairs_df))
+
+    # 7. Organize Final Output Structure
+    prof.stage("write")
+    expected_columns = (['Employee ID', 'Employee'] + LINE_COLUMNS + [f'{col} (Right)' for col in LINE_COLUMNS]
+                        + ['Days Apart', 'Amount Difference', 'Same Report', 'Match Score'])
+
+    # Gracefully add missing columns if schema drifts
+    for col in expected_columns:
+        if col not in pairs_df.columns:
+            pairs_df[col] = np.nan
+
+    final_df = pairs_df[expected_columns]
+
+    # 8. Sort to keep the strongest matches at the top, grouped by employee
+    final_df = final_df.sort_values(by=['Match Score', 'Employee ID', 'Transaction Date'],
+                                    ascending=[False, True, True], kind='stable')
+
+    # 9. Construct Insight Meta-Headers
+    header_rows = [
+        ['Insight ID ', 'PJPA43'] + [''] * (len(expected_columns) - 2),
+        ['Exception No', '1'] + [''] * (len(expected_columns) - 2),
+        ['Exception Type', 'Near-Duplicate Claims - The same employee claiming the same amount again within a few days'] + [''] * (len(expected_columns) - 2),
+        [''] * len(expected_columns),
+        expected_columns
+    ]
+
+    header_df = pd.DataFrame(header_rows)
+
+    # 10. Export seamlessly to matching Excel layout
+    with pd.ExcelWriter(output_excel_path, engine='xlsxwriter') as writer:
+        header_df.to_excel(writer, index=False, header=False, sheet_name='Sheet1')
+        final_df.to_excel(writer, index=False, header=False, startrow=5, sheet_name='Sheet1')
+
+    write_sidecar(output_excel_path, {'Sheet1': (header_rows, final_df)})
+
+    print(f"Insight execution complete. Generated {len(final_df)} near-duplicate pairs "
+          f"({int(routine.sum())} lines of recurring charges skipped).")
+    return output_excel_path
@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .dtypes import read_plan, to_pandas
+from .store import EMPLOYEE_KEY, REPORT_KEY, SUBMIT_DAY, ensure_columnar, read_columnar_table
+
+
+def build_daily_submissions(concur):
+    """
+    Per employee and submit day of the Concur header: the distinct reports
+    submitted ('Count(Report Id)') and the summed report totals
+    ('Sum(Report Total)'). One row per day an employee submitted on, in key
+    order; rows without a submit day belong to no day.
+    Totals are summed per row: if the header has several rows per report, the
+    report is counted once but its rows' totals all add up, as the same-day
+    insights have always reported it.
+    """
+    days = pd.DataFrame({
+        EMPLOYEE_KEY: concur[EMPLOYEE_KEY],
+        SUBMIT_DAY: concur[SUBMIT_DAY],
+        REPORT_KEY: concur[REPORT_KEY],
+        'Report Total Numeric': pd.to_numeric(concur['Report Total'], errors='coerce').fillna(0),
+    })
+    return days.groupby([EMPLOYEE_KEY, SUBMIT_DAY]).agg(**{
+        'Count(Report Id)': (REPORT_KEY, 'nunique'),
+        'Sum(Report Total)': ('Report Total Numeric', 'sum'),
+    }).reset_index()
+
+
+# Aggregates materialized next to the stored tables, each built from the columns it needs of one table:
+# name -> (table, columns read besides the key columns, builder)
+AGGREGATES = {
+    "daily_submissions": ("concur", ['Report Total'], build_daily_submissions),
+}
+
+
+def aggregate_path(data_dir, name):
+    return os.path.join(data_dir, f"{name}.parquet")
+
+
+def ensure_aggregate(data_dir, name):
+    """
+    Returns the file of a materialized aggregate, rebuilt whenever its source
+    table is newer, so it is computed once per version of the data and shared
+    by every insight (and worker) that queries it.
+    """
+    table, columns, build = AGGREGATES[name]
+    source = ensure_columnar(data_dir, table)
+    path = aggregate_path(data_dir, name)
+    if not os.path.exists(path) or os.path.getmtime(source) > os.path.getmtime(path):
+        print(f"Building the {name} aggregate ...")
+        stored = read_columnar_table(source, columns)
+        aggregate = build(to_pandas(stored, read_plan(stored.schema.metadata)))
+        tmp_path = path + ".tmp"
+        pq.write_table(pa.Table.from_pandas(aggregate, preserve_index=False), tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def read_aggregate(path):
+    return pq.read_table(path).to_pandas()
@@ -0,0 +1,205 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Expected Benford proportions, indexed by the digit value itself (unused leading entries are 0)
+FIRST_DIGIT_PROBS = np.r_[0.0, np.log10(1 + 1 / np.arange(1, 10))]
+SECOND_DIGIT_PROBS = np.array([sum(np.log10(1 + 1 / (10 * k + d)) for k in range(1, 10)) for d in range(10)])
+FIRST_TWO_PROBS = np.r_[np.zeros(10), np.log10(1 + 1 / np.arange(10, 100))]
+# Last two digits of amounts of 10 or more are uniform; the summation test expects every
+# first-two-digit pair to carry the same share of the total
+LAST_TWO_PROBS = np.full(100, 1 / 100)
+SUMMATION_PROBS = np.r_[np.zeros(10), np.full(90, 1 / 90)]
+
+# Amounts are read to this many decimals, as the digit strings of the original module were
+AMOUNT_DECIMALS = 10
+# Below this, amount * 10**AMOUNT_DECIMALS still fits in int64; above it the integer part alone
+# carries the leading digits
+SCALED_LIMIT = 1e8
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+# Series terms / continued-fraction steps of the incomplete gamma function before giving up
+GAMMA_ITERATIONS = 500
+GAMMA_EPSILON = 1e-14
+
+
+def leading_digits(amounts):
+    """
+    First two significant digits (10-99) of every amount, computed on the
+    numbers: each amount is rounded to AMOUNT_DECIMALS decimals as an integer
+    and its digit count found against exact powers of ten, so values such as
+    0.29 (stored as 0.28999...) still give 29. One-digit values give d*10.
+    Amounts that round to zero give 0 (no digits).
+    """
+    amounts = np.abs(np.asarray(amounts, dtype=np.float64))
+    small = amounts < SCALED_LIMIT
+    scaled = np.where(small, np.rint(amounts * 10.0 ** AMOUNT_DECIMALS), np.floor(amounts)).astype(np.int64)
+    width = np.searchsorted(POWERS_OF_TEN, scaled, side='right')
+    leading = scaled // POWERS_OF_TEN[np.maximum(width - 2, 0)]
+    return np.where(width >= 2, leading, leading * 10)
+
+
+def last_two_digits(amounts):
+    """Last two digits (0-99) of the whole part of each amount; -1 for amounts under 10, which have none to test."""
+    whole = np.floor(np.abs(np.asarray(amounts, dtype=np.float64)))
+    return np.where(whole >= 10, np.fmod(whole, 100), -1).astype(np.int64)
+
+
+def chi_square_pvalue(statistic, dof):
+    """Upper tail of the chi-square distribution, Q(dof / 2, statistic / 2)."""
+    if dof <= 0 or not np.isfinite(statistic):
+        return np.nan
+    return _upper_gamma(dof / 2, statistic / 2)
+
+
+def _upper_gamma(a, x):
+    # Regularized upper incomplete gamma: series below a + 1, Lentz continued fraction above
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1 / a
+        for n in range(1, GAMMA_ITERATIONS):
+            term *= x / (a + n)
+            total += term
+            if abs(term) < abs(total) * GAMMA_EPSILON:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for n in range(1, GAMMA_ITERATIONS):
+        an = -n * (n - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        step = d * c
+        h *= step
+        if abs(step - 1) < GAMMA_EPSILON:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+def ks_pvalue(statistic, n):
+    """Asymptotic Kolmogorov-Smirnov p-value of a maximum distance between cumulative proportions over n values."""
+    if n <= 0:
+        return np.nan
+    root = math.sqrt(n)
+    lam = (root + 0.12 + 0.11 / root) * statistic
+    if lam < 1e-3:
+        return 1.0
+    terms = [2 * (-1) ** (j - 1) * math.exp(-2 * j * j * lam * lam) for j in range(1, 101)]
+    return min(1.0, max(0.0, sum(terms)))
+
+
+def digit_test(counts, probs, digits):
+    """
+    Compares observed digit counts with expected proportions.
+    counts, probs: arrays indexed by digit value; digits: the values tested.
+    Returns the per-digit table and {MAD, Chi-Square, P-Value, KS Statistic,
+    KS P-Value}; MAD is the mean absolute difference of the proportions.
+    """
+    counts = np.asarray(counts, dtype=np.float64)[digits]
+    probs = probs[digits]
+    n = counts.sum()
+    actual = counts / n if n else np.zeros(len(digits))
+    variance = probs * (1 - probs) / n if n else np.zeros(len(digits))
+    z_scores = np.divide(actual - probs, np.sqrt(variance), out=np.zeros(len(digits)), where=variance > 0)
+    table = pd.DataFrame({
+        'Digit': digits,
+        'Actual Count': counts.astype(np.int64),
+        'Expected Count': probs * n,
+        'Actual %': actual * 100,
+        'Expected %': probs * 100,
+        'Diff %': actual * 100 - probs * 100,
+        'Abs Diff %': np.abs(actual * 100 - probs * 100),
+        'Z-Score': z_scores,
+    })
+    expected = probs * n
+    chi_square = float(np.sum((counts - expected) ** 2 / expected)) if n else np.nan
+    ks = float(np.max(np.abs(np.cumsum(actual) - np.cumsum(probs)))) if n else np.nan
+    stats = {
+        'MAD': float((table['Abs Diff %'] / 100).mean()),
+        'Chi-Square': chi_square,
+        'P-Value': chi_square_pvalue(chi_square, len(digits) - 1),
+        'KS Statistic': ks,
+        'KS P-Value': ks_pvalue(ks, n) if n else np.nan,
+    }
+    return table, stats
+
+
+def summation_test(sums):
+    """
+    Share of the summed amounts per first-two-digit pair (10-99) against the
+    equal 1/90 share the summation test expects; large positive differences
+    point at a few large amounts starting with that pair.
+    sums: array of summed amounts indexed by pair.
+    """
+    digits = np.arange(10, 100)
+    sums = np.asarray(sums, dtype=np.float64)[digits]
+    probs = SUMMATION_PROBS[digits]
+    total = sums.sum()
+    actual = sums / total if total else np.zeros(len(digits))
+    table = pd.DataFrame({
+        'Digit': digits,
+        'Sum': sums,
+        'Actual %': actual * 100,
+        'Expected %': probs * 100,
+        'Diff %': actual * 100 - probs * 100,
+        'Abs Diff %': np.abs(actual * 100 - probs * 100),
+    })
+    return table, {'MAD': float((table['Abs Diff %'] / 100).mean())}
+
+
+# Nigrini's MAD conformity bands (upper bounds) for the first-digit and first-two-digit tests
+FIRST_DIGIT_CONFORMITY = [(0.006, "Close"), (0.012, "Acceptable"), (0.015, "Marginal")]
+FIRST_TWO_CONFORMITY = [(0.0012, "Close"), (0.0018, "Acceptable"), (0.0022, "Marginal")]
+
+
+def conformity(mad, bands):
+    """Conformity label of each MAD value; above the last band is 'Nonconformity'."""
+    bounds = np.array([bound for bound, _ in bands])
+    labels = np.array([label for _, label in bands] + ["Nonconformity"])
+    return labels[np.searchsorted(bounds, mad, side='right')]
+
+
+def segment_tests(codes, d12, min_size):
+    """
+    First-digit and first-two-digit tests of every segment at once.
+    codes: segment number (0..n-1) of each amount, -1 for none; d12: its
+    first two digits. Segments with fewer than min_size amounts are left out
+    (MAD and Z-scores of small samples say little). The digit counts of all
+    the kept segments come from one bincount over segment * 100 + d12.
+    Returns one row per kept segment: 'Segment Code', 'Sample Size', both
+    MADs and the largest first-digit Z-score with its digit.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    sizes = np.bincount(codes[codes >= 0])
+    kept = np.flatnonzero(sizes >= max(min_size, 1))
+    # Kept segments renumbered 0..k-1, so the count matrix only has rows for them
+    compact = np.full(len(sizes) + 1, -1, dtype=np.int64)
+    compact[kept] = np.arange(len(kept))
+    rows = compact[codes]
+    mask = rows >= 0
+    counts = np.bincount(rows[mask] * 100 + d12[mask], minlength=len(kept) * 100).reshape(len(kept), 100)
+
+    n = sizes[kept].astype(np.float64)[:, None]
+    first_two = counts[:, 10:] / n
+    first = counts[:, 10:].reshape(len(kept), 9, 10).sum(axis=2) / n
+    probs = FIRST_DIGIT_PROBS[1:]
+    z_scores = (first - probs) / np.sqrt(probs * (1 - probs) / n)
+    strongest = np.argmax(z_scores, axis=1) if len(kept) else np.array([], dtype=np.int64)
+    return pd.DataFrame({
+        'Segment Code': kept,
+        'Sample Size': sizes[kept],
+        'First Digit MAD': np.abs(first - probs).mean(axis=1),
+        'First 2 Digits MAD': np.abs(first_two - FIRST_TWO_PROBS[10:]).mean(axis=1),
+        'Max Z-Score': z_scores[np.arange(len(kept)), strongest],
+        'Max Z Digit': strongest + 1,
+    })
@@ -0,0 +1,203 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .aggregates import ensure_aggregate, read_aggregate
+from .dtypes import read_plan, to_pandas
+from .store import (CHUNK_ROWS, DATE_KEY_COLUMNS, KEY_SPACES, TABLE_KEYS, KeyDictionary, add_date_keys,
+                    apply_schema, canonical_columns, ensure_arrow, ensure_columnar, read_arrow, read_arrow_table,
+                    read_columnar, read_columnar_table)
+
+# Key dictionaries for tables that were not read from the store (e.g. a module run
+# directly on Excel files), shared within the process so those tables still join
+_local_dictionaries = {}
+
+
+def clean_columns(df):
+    # Same header clean-up every module used to do after its own read_excel
+    df.rename(columns=lambda x: str(x).strip(), inplace=True)
+    return df
+
+
+def normalize_table(df, name):
+    """
+    Applies the normalization of ingest to a table that did not come from the
+    store: drifted headers renamed, declared column types, date keys, and
+    surrogate key columns coded by in-process dictionaries.
+    """
+    df.columns = canonical_columns(list(df.columns), name)
+    df = add_date_keys(apply_schema(df, name), name)
+    for key, col in TABLE_KEYS[name].items():
+        if col in df.columns:
+            if KEY_SPACES[key] not in _local_dictionaries:
+                _local_dictionaries[KEY_SPACES[key]] = KeyDictionary()
+            df[key] = _local_dictionaries[KEY_SPACES[key]].encode(df[col])
+    return df
+
+
+def load_table(source, name=None):
+    """
+    Returns a private DataFrame for an insight module.
+    source: a file path (the original calling convention, Excel or Parquet),
+    an Arrow table handed out by a DatasetContext, or a DataFrame.
+    name: the table it is ("concur", "line_items", ...). Tables from the
+    store already carry canonical IDs and surrogate keys; any other source is
+    normalized here the same way.
+    Modules mutate their input in place, so a DataFrame is always handed out
+    as a copy; Arrow tables are converted into a new one anyway.
+    """
+    if isinstance(source, pa.Table):
+        df = clean_columns(to_pandas(source, read_plan(source.schema.metadata)))
+    elif isinstance(source, pd.DataFrame):
+        df = source.copy()
+    elif str(source).lower().endswith('.parquet'):
+        df = clean_columns(read_columnar(source))
+    elif str(source).lower().endswith('.arrow'):
+        df = clean_columns(read_arrow(source))
+    else:
+        df = clean_columns(pd.read_excel(source))
+    if name is not None and not any(key in df.columns for key in KEY_SPACES):
+        df = normalize_table(df, name)
+    return df
+
+
+def iter_table(source, name=None, columns=None, batch_rows=CHUNK_ROWS):
+    """
+    Yields a table as DataFrames of at most batch_rows rows, for modules that
+    fold a large table into per-key totals instead of loading it whole.
+    source: as for load_table(). Arrow tables and stored Parquet files are
+    converted one record batch at a time, so only a batch is ever in pandas
+    form; other sources are loaded whole and then sliced.
+    columns: only these columns (plus the key columns), or None for all.
+    """
+    derived = set(KEY_SPACES) | DATE_KEY_COLUMNS
+    suffix = '' if isinstance(source, (pa.Table, pd.DataFrame)) else str(source).lower()
+    if isinstance(source, pa.Table) or suffix.endswith(('.parquet', '.arrow')):
+        if suffix.endswith('.parquet'):
+            parquet_file = pq.ParquetFile(source)
+            schema = parquet_file.schema_arrow.with_metadata(parquet_file.metadata.metadata or {})
+            selected = [c for c in schema.names if columns is None or c in columns or c in derived]
+            batches = parquet_file.iter_batches(batch_size=batch_rows, columns=selected)
+        else:
+            table = source if isinstance(source, pa.Table) else read_arrow_table(source)
+            if columns is not None:
+                table = table.select([c for c in table.column_names if c in columns or c in derived])
+            schema, batches = table.schema, table.to_batches(max_chunksize=batch_rows)
+        plan = read_plan(schema.metadata)
+        for batch in batches:
+            df = clean_columns(to_pandas(pa.Table.from_batches([batch]), plan))
+            if name is not None and not any(key in df.columns for key in KEY_SPACES):
+                df = normalize_table(df, name)
+            yield df
+        return
+    df = load_table(source, name)
+    if columns is not None:
+        df = df[[c for c in df.columns if c in columns or c in derived]]
+    for first in range(0, max(len(df), 1), batch_rows):
+        yield df.iloc[first:first + batch_rows]
+
+
+# Row filters an insight can declare per input table, as (column, op, value)
+FILTER_OPS = {
+    "==": lambda field, value: field == value,
+    "!=": lambda field, value: field != value,
+    "<": lambda field, value: field < value,
+    "<=": lambda field, value: field <= value,
+    ">": lambda field, value: field > value,
+    ">=": lambda field, value: field >= value,
+    "in": lambda field, value: field.isin(value),
+    "not null": lambda field, value: field.is_valid(),
+}
+
+
+def filter_expression(filters, columns):
+    """
+    The AND of the (column, op, value) filters as an Arrow expression, or None.
+    Filters on columns the table does not have are skipped; the module then
+    sees those rows, as it would without the filter.
+    """
+    expression = None
+    for col, op, value in filters or []:
+        if col not in columns:
+            continue
+        term = FILTER_OPS[op](pc.field(col), value)
+        expression = term if expression is None else expression & term
+    return expression
+
+
+class DatasetContext:
+    """
+    Run-scoped cache of the input tables. Each table is read from the
+    columnar store into Arrow on first use and then shared by every insight
+    in the run; each insight gets its own view with just the columns and
+    rows it declared (see table()).
+    memory_map: read the Arrow IPC copies instead of Parquet (used by pool
+    workers, which share the mapped pages through the OS page cache).
+    columns: {table: columns to read, or None for all} (see
+    main_orchestrator.required_columns); tables not listed are read whole.
+    """
+
+    def __init__(self, data_dir, memory_map=False, columns=None):
+        self.data_dir = data_dir
+        self.memory_map = memory_map
+        self.columns = columns or {}
+        self._tables = {}
+        self._aggregates = {}
+
+    def path(self, name):
+        if self.memory_map:
+            return ensure_arrow(self.data_dir, name)
+        return ensure_columnar(self.data_dir, name)
+
+    def arrow(self, name):
+        if name not in self._tables:
+            path = self.path(name)
+            print(f"Loading {path} ...")
+            if self.memory_map:
+                self._tables[name] = read_arrow_table(path)
+            else:
+                self._tables[name] = read_columnar_table(path, self.columns.get(name))
+        return self._tables[name]
+
+    def table(self, name, columns=None, filters=None):
+        """
+        The table for one insight, as an Arrow table for load_table().
+        columns: only these columns (plus the key columns), or None for all.
+        filters: (column, op, value) row filters, applied before any row is
+        converted to pandas. Selecting columns costs nothing; filtering
+        copies only the surviving rows.
+        Each insight module declares both per input table at module level:
+        INPUT_COLUMNS, the columns it reads, and INPUT_FILTERS, the rows that
+        can never be flagged (see main_orchestrator.input_columns()).
+        """
+        table = self.arrow(name)
+        if columns is not None:
+            derived = set(KEY_SPACES) | DATE_KEY_COLUMNS
+            table = table.select([c for c in table.column_names if c in columns or c in derived])
+        expression = filter_expression(filters, table.column_names)
+        if expression is not None:
+            table = table.filter(expression)
+        return table
+
+    def aggregate(self, name):
+        """A materialized aggregate (see aggregates.AGGREGATES) as a DataFrame, shared by the run's insights."""
+        if name not in self._aggregates:
+            self._aggregates[name] = read_aggregate(ensure_aggregate(self.data_dir, name))
+        return self._aggregates[name]
+
+    @property
+    def concur(self):
+        return self.table("concur")
+
+    @property
+    def left_employees(self):
+        return self.table("left_employees")
+
+    @property
+    def emp_master(self):
+        return self.table("emp_master")
+
+    @property
+    def line_items(self):
+        return self.table("line_items")
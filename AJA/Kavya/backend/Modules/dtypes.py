@@ -0,0 +1,157 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    # Arrow-backed strings with NaN for missing values, so masks and comparisons behave as on object columns
+    STRING_DTYPE = pd.StringDtype("pyarrow", na_value=np.nan)
+except TypeError:  # pandas < 2.3 only has the pd.NA variant; text then stays object
+    STRING_DTYPE = None
+
+# Text columns with at most this many distinct values, and no more than this share of
+# the rows, load as categoricals; every other text column as Arrow-backed strings
+CATEGORY_MAX_UNIQUE = 50_000
+CATEGORY_MAX_RATIO = 0.5
+
+# Smallest integer types tried for integer columns (the surrogate keys), in order
+INT_DTYPES = ["int8", "int16", "int32"]
+
+# Approximate CPython size of a str object beyond its characters, and of a pointer
+STR_OVERHEAD = 49
+POINTER_BYTES = 8
+
+
+def _int_dtype(low, high):
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return None
+
+
+class DtypePlanner:
+    """
+    Collects per-column statistics while a table is written and turns them
+    into its dtype plan ({column: dtype}) plus an estimate of the memory every
+    planned column takes loaded as planned versus as plain object / int32
+    columns. Only text and integer columns are planned; dates and amounts
+    keep their datetime64 / float64 types.
+    """
+
+    def __init__(self, schema):
+        self.rows = 0
+        self.text = [f.name for f in schema if pa.types.is_string(f.type)]
+        self.ints = [f.name for f in schema if pa.types.is_integer(f.type)]
+        self.distinct = {col: set() for col in self.text}
+        self.values = {col: 0 for col in self.text}
+        self.text_bytes = {col: 0 for col in self.text}
+        self.bounds = {col: None for col in self.ints}
+
+    def add(self, table):
+        self.rows += table.num_rows
+        for col in self.text:
+            values = table.column(col)
+            self.values[col] += len(values) - values.null_count
+            self.text_bytes[col] += pc.sum(pc.binary_length(values)).as_py() or 0
+            # Distinct values are only counted as long as the column can still become a categorical
+            if self.distinct[col] is not None:
+                self.distinct[col].update(pc.unique(values).drop_null().to_pylist())
+                if len(self.distinct[col]) > CATEGORY_MAX_UNIQUE:
+                    self.distinct[col] = None
+        for col in self.ints:
+            bounds = pc.min_max(table.column(col)).as_py()
+            if bounds["min"] is None:
+                continue
+            if self.bounds[col] is not None:
+                bounds = {"min": min(bounds["min"], self.bounds[col]["min"]),
+                          "max": max(bounds["max"], self.bounds[col]["max"])}
+            self.bounds[col] = bounds
+
+    def _is_category(self, col):
+        distinct = self.distinct[col]
+        return distinct is not None and len(distinct) <= max(1, self.rows * CATEGORY_MAX_RATIO)
+
+    def plan(self):
+        plan = {}
+        for col in self.text:
+            if self._is_category(col):
+                plan[col] = "category"
+            elif STRING_DTYPE is not None:
+                plan[col] = "string"
+        for col in self.ints:
+            bounds = self.bounds[col] or {"min": 0, "max": 0}
+            dtype = _int_dtype(bounds["min"], bounds["max"])
+            if dtype is not None:
+                plan[col] = dtype
+        return plan
+
+    def memory_report(self, plan):
+        """{column: {"dtype", "bytes_before", "bytes_after", "bytes_saved"}} of the planned columns."""
+        report = {}
+        for col, dtype in plan.items():
+            if col in self.text:
+                before = POINTER_BYTES * self.rows + STR_OVERHEAD * self.values[col] + self.text_bytes[col]
+                if dtype == "category":
+                    categories = len(self.distinct[col])
+                    average = self.text_bytes[col] / self.values[col] if self.values[col] else 0
+                    codes = np.dtype(_int_dtype(-1, categories)).itemsize
+                    after = codes * self.rows + int(categories * (POINTER_BYTES + STR_OVERHEAD + average))
+                else:
+                    # Arrow string: the characters, 4-byte offsets and a validity bitmap
+                    after = self.text_bytes[col] + 4 * (self.rows + 1) + (self.rows + 7) // 8
+            else:
+                before = 4 * self.rows
+                after = np.dtype(dtype).itemsize * self.rows
+            report[col] = {"dtype": dtype, "bytes_before": int(before), "bytes_after": int(after),
+                           "bytes_saved": int(before - after)}
+        return report
+
+
+def describe_memory_report(name, report):
+    """One line per column, for the ingest log."""
+    lines = []
+    total_before = sum(r["bytes_before"] for r in report.values())
+    total_after = sum(r["bytes_after"] for r in report.values())
+    for col, r in sorted(report.items(), key=lambda item: -item[1]["bytes_saved"]):
+        lines.append(f"  {col}: {r['dtype']}, {r['bytes_before'] / 1024 ** 2:.1f} -> "
+                     f"{r['bytes_after'] / 1024 ** 2:.1f} MiB")
+    lines.insert(0, f"Memory plan of {name}: {total_before / 1024 ** 2:.1f} -> {total_after / 1024 ** 2:.1f} MiB "
+                    f"over {len(report)} planned columns")
+    return "\n".join(lines)
+
+
+def read_plan(metadata):
+    """The dtype plan recorded in Parquet / Arrow metadata, or None for tables stored before plans."""
+    raw = (metadata or {}).get(b"dtype_plan")
+    return json.loads(raw) if raw else None
+
+
+def to_pandas(table, plan):
+    """
+    Converts an Arrow table to pandas following its dtype plan. Category
+    columns are dictionary-encoded in Arrow, so no object column is built on
+    the way; their categories are sorted, so sorting and grouping on them
+    orders values as on the plain strings.
+    """
+    if not plan:
+        return table.to_pandas()
+    for col, dtype in plan.items():
+        index = table.schema.get_field_index(col)
+        if dtype == "category" and index >= 0 and not pa.types.is_dictionary(table.schema.field(index).type):
+            table = table.set_column(index, col, pc.dictionary_encode(table.column(index)))
+    mapper = {pa.string(): STRING_DTYPE}.get if STRING_DTYPE is not None else None
+    df = table.to_pandas(types_mapper=mapper)
+    for col, dtype in plan.items():
+        if col not in df.columns:
+            continue
+        if dtype == "category":
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+            categories = df[col].cat.categories
+            df[col] = df[col].cat.reorder_categories(categories.sort_values())
+        elif dtype in INT_DTYPES:
+            df[col] = df[col].astype(dtype)
+    return df
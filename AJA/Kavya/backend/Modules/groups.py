@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+
+def flag_groups(df, by, condition, aggregations):
+    """
+    Keeps the rows of df whose group satisfies a threshold, with the group's
+    statistics attached, in one grouping pass and without merging the
+    aggregate back onto df.
+    by: the group key column(s).
+    condition: function of the per-group statistics (a DataFrame with one
+    column per aggregation) returning a boolean mask of the groups to keep.
+    aggregations: {name: (column, func)}, as in DataFrame.groupby().agg().
+    Rows come in group order (groups sorted by key, rows in df order within a
+    group), the order an inner merge of the filtered aggregate onto df gives.
+    Rows with a missing key (NaN) belong to no group and are never kept.
+    NULL_KEY is an ordinary key: the unknown employees or reports form one
+    group, as the missing IDs formed one 'nan' group on the ID strings.
+    """
+    grouped = df.groupby(by, observed=True)
+    stats = grouped.agg(**aggregations).reset_index(drop=True)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return _flagged_rows(df, stats, codes, condition)
+
+
+def flag_known_groups(df, by, stats, condition):
+    """
+    flag_groups() against statistics computed beforehand, e.g. a materialized
+    aggregate shared by several insights, so df itself is never grouped.
+    stats: one row per group in key order, with the by columns and one column
+    per statistic. Rows of df whose key has no row in stats are never kept.
+    """
+    index = pd.MultiIndex.from_frame(stats[by])
+    codes = index.get_indexer(pd.MultiIndex.from_frame(df[by])).astype(np.int64)
+    return _flagged_rows(df, stats.drop(columns=by).reset_index(drop=True), codes, condition)
+
+
+def flag_windows(df, by, day, stats, window_days, condition):
+    """
+    Windowed form of flag_known_groups(): keeps the rows of df whose day lies
+    in a window of window_days consecutive calendar days (per by key) whose
+    summed statistics satisfy condition. Overlapping qualifying windows are
+    merged into one run, and every kept row gets its run's totals plus
+    'Window Start' and 'Window End' (first and last day of the run).
+    stats: one row per key and day, sorted by key then day, with additive
+    statistic columns (counts, sums), e.g. a materialized per-day aggregate.
+    condition: function of the window totals (one row per window, ending on
+    each row of stats) returning a boolean mask of the qualifying windows.
+    The windows are found with one searchsorted over the sorted days and each
+    holds at most window_days rows of stats, so the cost stays linear in the
+    days rather than a self-join.
+    """
+    n = len(stats)
+    # Group number of each row, from the key changes along the sorted rows
+    changed = np.zeros(n, dtype=bool)
+    changed[:1] = True
+    for col in by:
+        keys = stats[col].to_numpy()
+        changed[1:] |= keys[1:] != keys[:-1]
+    group = np.cumsum(changed) - 1
+    # Days as integers, offset per group so one searchsorted finds every window's first day
+    days = stats[day].to_numpy().astype('datetime64[D]').astype(np.int64)
+    days = days - (days.min() if n else 0)
+    span = (days.max() if n else 0) + window_days + 1
+    position = group * span + days
+    start = np.searchsorted(position, position - (window_days - 1), side='left')
+
+    columns = [col for col in stats.columns if col not in by + [day]]
+    last = np.arange(n)
+    totals = pd.DataFrame({col: _range_sums(stats[col].to_numpy(), start, last) for col in columns})
+    ends = np.flatnonzero(np.asarray(condition(totals), dtype=bool))
+    starts = start[ends]
+
+    # Qualifying windows that overlap (they are ordered by their last day) form one run
+    first = np.flatnonzero(np.r_[True, starts[1:] > ends[:-1]]) if len(ends) else np.array([], dtype=np.int64)
+    run_start = starts[first]
+    run_end = ends[np.r_[first[1:] - 1, len(ends) - 1]] if len(ends) else ends
+    runs = pd.DataFrame({
+        'Window Start': stats[day].to_numpy()[run_start],
+        'Window End': stats[day].to_numpy()[run_end],
+        **{col: _range_sums(stats[col].to_numpy(), run_start, run_end) for col in columns},
+    })
+
+    # Run of each day of stats (-1 outside every run), then of each row of df through its day
+    cover = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(cover, run_start, 1)
+    np.add.at(cover, run_end + 1, -1)
+    day_run = np.where(np.cumsum(cover)[:n] > 0, np.searchsorted(run_start, np.arange(n), side='right') - 1, -1)
+    index = pd.MultiIndex.from_frame(stats[by + [day]])
+    positions = index.get_indexer(pd.MultiIndex.from_frame(df[by + [day]])).astype(np.int64)
+    codes = np.where(positions >= 0, np.append(day_run, -1)[positions], -1)
+    return _flagged_rows(df, runs, codes, lambda runs: np.ones(len(runs), dtype=bool))
+
+
+def _range_sums(values, first, last):
+    # Sums of values[first:last + 1] per range, each added up directly (differences of running
+    # totals would carry their rounding into amounts)
+    if not len(first):
+        return values[:0]
+    bounds = np.column_stack([first, last + 1]).ravel()
+    return np.add.reduceat(np.append(values, values[:1] * 0), bounds)[0::2]
+
+
+def _flagged_rows(df, stats, codes, condition):
+    # codes: position of each row's group in stats, -1 for none
+    keep = np.append(np.asarray(condition(stats), dtype=bool), False)
+    # codes of -1 (no group) index the trailing False
+    rows = np.flatnonzero(keep[codes])
+    rows = rows[np.argsort(codes[rows], kind='stable')]
+
+    flagged = df.iloc[rows].reset_index(drop=True)
+    group_stats = stats.iloc[codes[rows]].reset_index(drop=True)
+    for name in group_stats.columns:
+        flagged[name] = group_stats[name].to_numpy()
+    return flagged
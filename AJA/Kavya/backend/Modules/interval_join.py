@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from .joins import LEFT_ROW, RIGHT_ROW
+
+DAY_NS = 86_400 * 10 ** 9
+
+
+def _instants(series):
+    # Nanoseconds since the epoch; NaT becomes the smallest int64 and sorts before every date
+    return series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def lex_searchsorted(keys, dates, query_keys, query_dates, side):
+    """
+    np.searchsorted over events sorted by (key, date), for (key, date) queries:
+    sorts events and queries together (queries before equal events for
+    side='left', after them for side='right') and counts the events ahead of
+    every query.
+    """
+    n, m = len(keys), len(query_keys)
+    query_first = side == 'left'
+    ties = np.r_[np.full(n, 1 if query_first else 0), np.full(m, 0 if query_first else 1)]
+    order = np.lexsort((ties, np.r_[dates, query_dates], np.r_[keys, query_keys]))
+    is_event = order < n
+    before = np.cumsum(is_event) - is_event
+    positions = np.empty(m, dtype=np.int64)
+    positions[order[~is_event] - n] = before[~is_event]
+    return positions
+
+
+def expand_ranges(first, counts):
+    """(range number, position) of every element of the ranges [first, first + counts), without a Python loop."""
+    owners = np.repeat(np.arange(len(first)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(first, counts) + offsets
+
+
+def interval_join(left, right, on, date, start, end=None, start_days=0, end_days=0, end_inclusive=True,
+                  events='right'):
+    """
+    Pairs rows of two tables that share a key when one row's event date lies
+    inside the other row's window on the employment timeline:
+
+        timeline[start] + start_days <= events[date] <= timeline[end] + end_days
+
+    (strictly before the upper bound with end_inclusive=False), and returns
+    them as narrow_merge() would after filtering on the window: one row per
+    pair with LEFT_ROW and RIGHT_ROW, in pd.merge order, ready for attach().
+    events: which table ('left' or 'right') holds the event dates; the other
+    holds the window columns. Some windows:
+        N days after joining:       start='Joining Date', end='Joining Date', end_days=N
+        resignation to last day:    start='Date of Resignation', end='Employee Last Working Date'
+        after separation:           start='Employee Separation Date', start_days=1
+    end=None leaves the window open-ended. Rows with a missing event date or
+    window bound never pair; NULL_KEY rows pair with each other, as the
+    missing IDs did in a merge on the ID strings.
+    Events are sorted by (key, date) once and each window becomes a range of
+    them by binary search, so the cost is O(n log n) plus the pairs returned,
+    instead of every claim of an employee against every timeline row.
+    """
+    event_df, timeline = (left, right) if events == 'left' else (right, left)
+    keys = event_df[on].to_numpy()
+    dates = _instants(event_df[date])
+    order = np.lexsort((dates, keys))
+    keys, dates = keys[order], dates[order]
+
+    window_keys = timeline[on].to_numpy()
+    starts = _instants(timeline[start])
+    valid = starts != np.iinfo(np.int64).min
+    first = lex_searchsorted(keys, dates, window_keys, starts + start_days * DAY_NS, 'left')
+    if end is None:
+        last = np.searchsorted(keys, window_keys, side='right')
+    else:
+        ends = _instants(timeline[end])
+        valid &= ends != np.iinfo(np.int64).min
+        side = 'right' if end_inclusive else 'left'
+        last = lex_searchsorted(keys, dates, window_keys, ends + end_days * DAY_NS, side)
+    counts = np.where(valid, np.maximum(last - first, 0), 0)
+
+    # Expand every window's range of sorted events into pairs
+    window_rows, positions = expand_ranges(first, counts)
+    event_rows = order[positions]
+
+    left_rows, right_rows = (event_rows, window_rows) if events == 'left' else (window_rows, event_rows)
+    # pd.merge order: left rows in order, each one's matches in right order
+    merge_order = np.lexsort((right_rows, left_rows))
+    return pd.DataFrame({LEFT_ROW: left_rows[merge_order], RIGHT_ROW: right_rows[merge_order]})
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# Columns narrow_merge() adds with the position of each result row's source rows
+LEFT_ROW = "_left_row"
+RIGHT_ROW = "_right_row"
+
+
+def _keys(on):
+    return [on] if isinstance(on, str) else list(on)
+
+
+def narrow_merge(left, right, on, columns, suffixes=('_x', '_y')):
+    """
+    The inner pd.merge(left, right, on=on, suffixes=suffixes), restricted to
+    the join keys and the given result columns, plus the positions of every
+    result row's left and right source rows (LEFT_ROW, RIGHT_ROW). Filter it,
+    then attach() the full rows of the survivors, so wide columns are only
+    copied for rows that are kept.
+    columns: names as they appear in the full merge result; a name both
+    sides share is taken from both, so suffixes resolve exactly as there.
+    """
+    keys = _keys(on)
+    wanted = set(columns)
+    names = set()
+    for col in list(left.columns) + list(right.columns):
+        if col not in keys and (col in wanted or f"{col}{suffixes[0]}" in wanted or f"{col}{suffixes[1]}" in wanted):
+            names.add(col)
+    left_part = left[keys + [c for c in left.columns if c in names]].copy()
+    right_part = right[keys + [c for c in right.columns if c in names]].copy()
+    left_part[LEFT_ROW] = np.arange(len(left))
+    right_part[RIGHT_ROW] = np.arange(len(right))
+    return pd.merge(left_part, right_part, on=on, how='inner', suffixes=suffixes)
+
+
+def attach(left, right, pairs, on, suffixes=('_x', '_y')):
+    """
+    The rows pd.merge(left, right, on=on, how='inner', suffixes=suffixes)
+    gives for the (LEFT_ROW, RIGHT_ROW) pairs of a filtered narrow_merge(),
+    in the same order and with the same columns.
+    """
+    keys = _keys(on)
+    left_rows = left.iloc[pairs[LEFT_ROW].to_numpy()].reset_index(drop=True)
+    right_rows = right.iloc[pairs[RIGHT_ROW].to_numpy()].drop(columns=keys).reset_index(drop=True)
+    overlap = set(left_rows.columns) & set(right_rows.columns)
+    left_rows.rename(columns={c: f"{c}{suffixes[0]}" for c in overlap}, inplace=True)
+    right_rows.rename(columns={c: f"{c}{suffixes[1]}" for c in overlap}, inplace=True)
+    return pd.concat([left_rows, right_rows], axis=1)
@@ -0,0 +1,167 @@
+import sys
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; peak RSS is then not reported
+    resource = None
+
+# Stage records of the insight currently running in this thread or process, set by capture()
+_capture = contextvars.ContextVar("profiling_capture", default=None)
+
+
+def peak_rss_bytes(children=False):
+    # children: the largest peak among finished child processes (e.g. pool workers) instead
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageProfile:
+    """
+    Times the consecutive stages of one insight (load, normalize, join,
+    aggregate, write). stage() closes the running stage and opens the next,
+    so a module only marks where each step begins. Each stage records wall
+    time, process CPU time, the peak RSS reached so far and, when given, the
+    rows it produced.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self._open = None
+
+    def stage(self, name):
+        self.finish()
+        self._open = {"stage": name, "rows": None, "wall_start": time.perf_counter(), "cpu_start": time.process_time()}
+
+    def rows(self, count):
+        if self._open is not None:
+            self._open["rows"] = int(count)
+
+    def finish(self):
+        if self._open is None:
+            return
+        record = self._open
+        self._open = None
+        self.records.append({
+            "stage": record["stage"],
+            "wall_seconds": round(time.perf_counter() - record["wall_start"], 6),
+            "cpu_seconds": round(time.process_time() - record["cpu_start"], 6),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "rows": record["rows"],
+        })
+
+
+def stage_profile():
+    """
+    Returns the stage profile for the calling insight. Outside capture()
+    (e.g. a module run on its own) the stages are timed but not kept.
+    """
+    captured = _capture.get()
+    if captured is None:
+        return StageProfile([])
+    profile = StageProfile(captured["stages"])
+    captured["profiles"].append(profile)
+    return profile
+
+
+@contextmanager
+def capture():
+    """Collects the stage records of everything run inside the block into the yielded list."""
+    captured = {"stages": [], "profiles": []}
+    token = _capture.set(captured)
+    try:
+        yield captured["stages"]
+    finally:
+        # A stage still open here is the last one, or the one that raised
+        for profile in captured["profiles"]:
+            profile.finish()
+        _capture.reset(token)
+
+
+# name -> (type, help) of every exported metric
+METRIC_HELP = {
+    "insight_runs_total": ("counter", "Insight runs by final status."),
+    "insight_run_seconds": ("gauge", "Wall time of the last run of an insight."),
+    "insight_run_seconds_total": ("counter", "Wall time spent in an insight across all runs."),
+    "insight_stage_wall_seconds": ("gauge", "Wall time of a stage in the last run of an insight."),
+    "insight_stage_cpu_seconds": ("gauge", "Process CPU time of a stage in the last run of an insight."),
+    "insight_stage_peak_rss_bytes": ("gauge", "Peak resident memory reached by the end of a stage in the last run."),
+    "insight_stage_rows": ("gauge", "Rows produced by a stage in the last run of an insight."),
+    "insight_stage_wall_seconds_total": ("counter", "Wall time spent in a stage across all runs."),
+}
+
+
+def merge_stages(stages):
+    """
+    One record per stage name. A module that alternates between stages
+    (e.g. PJPA32 writing one workbook before filtering the next) has its
+    times summed, the highest RSS and the last row count kept.
+    """
+    merged = {}
+    for record in stages:
+        if record["stage"] not in merged:
+            merged[record["stage"]] = dict(record)
+            continue
+        total = merged[record["stage"]]
+        total["wall_seconds"] = round(total["wall_seconds"] + record["wall_seconds"], 6)
+        total["cpu_seconds"] = round(total["cpu_seconds"] + record["cpu_seconds"], 6)
+        if record["peak_rss_bytes"] is not None:
+            total["peak_rss_bytes"] = max(total["peak_rss_bytes"] or 0, record["peak_rss_bytes"])
+        if record["rows"] is not None:
+            total["rows"] = record["rows"]
+    return list(merged.values())
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels)
+
+
+class MetricsRegistry:
+    """Process-wide insight metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {name: {} for name in METRIC_HELP}
+
+    def _set(self, name, labels, value, add=False):
+        if value is None:
+            return
+        series = self._values[name]
+        series[labels] = series.get(labels, 0) + value if add else value
+
+    def record(self, results):
+        """Adds the results of one run ({insight_id: result}) to the metrics."""
+        with self._lock:
+            for insight_id, result in results.items():
+                status = "cached" if result.get("cached") else result["status"]
+                self._set("insight_runs_total", (("insight", insight_id), ("status", status)), 1, add=True)
+                if result.get("cached"):
+                    continue
+                self._set("insight_run_seconds", (("insight", insight_id),), result.get("elapsed"))
+                self._set("insight_run_seconds_total", (("insight", insight_id),), result.get("elapsed"), add=True)
+                for record in merge_stages(result.get("stages", [])):
+                    labels = (("insight", insight_id), ("stage", record["stage"]))
+                    self._set("insight_stage_wall_seconds", labels, record["wall_seconds"])
+                    self._set("insight_stage_cpu_seconds", labels, record["cpu_seconds"])
+                    self._set("insight_stage_peak_rss_bytes", labels, record["peak_rss_bytes"])
+                    self._set("insight_stage_rows", labels, record["rows"])
+                    self._set("insight_stage_wall_seconds_total", labels, record["wall_seconds"], add=True)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in METRIC_HELP.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in sorted(self._values[name].items()):
+                    lines.append(f"{name}{{{_labels(labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,92 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Per-engagement overrides of the rules below, kept in the data folder next to the uploads
+RULES_FILE = "risk_rules.json"
+
+# Risk tiers per insight: the first tier whose conditions all hold gives a row its category,
+# rows matching none get the default. Conditions are (column, op, value), as in INPUT_FILTERS.
+DEFAULT_RULES = {
+    "PJPA27": {
+        "tiers": [
+            {"category": "UNKNOWN", "when": [["Notice Period Days", "null", None]]},
+            {"category": "Critical", "when": [["Notice Period Days", "<=", 0]]},
+            {"category": "HIGH", "when": [["Amount Approved", ">=", 7000]]},
+            {"category": "MEDIUM", "when": [["Amount Approved", ">=", 3750]]},
+        ],
+        "default": "LOW",
+    },
+    "PJPA29": {
+        # High Risk: Claimed > 5000 within the first 5 days
+        "tiers": [
+            {"category": "HIGH", "when": [["Claim duration", "<=", 5], ["Amount Approved", ">", 5000]]},
+        ],
+        "default": "LOW",
+    },
+}
+
+RULE_OPS = {
+    "==": lambda values, value: values == value,
+    "!=": lambda values, value: values != value,
+    "<": lambda values, value: values < value,
+    "<=": lambda values, value: values <= value,
+    ">": lambda values, value: values > value,
+    ">=": lambda values, value: values >= value,
+    "in": lambda values, value: values.isin(value),
+    "null": lambda values, value: values.isna(),
+    "not null": lambda values, value: values.notna(),
+}
+
+
+def validate_rules(rules, insight_id=""):
+    """Raises ValueError when a rule set is not {"tiers": [{"category", "when": [[column, op, value], ...]}], "default"}."""
+    where = f"Risk rules {insight_id}".strip()
+    if not isinstance(rules, dict) or not isinstance(rules.get("tiers", []), list):
+        raise ValueError(f"{where}: expected an object with a list of tiers.")
+    for tier in rules.get("tiers", []):
+        if "category" not in tier or not isinstance(tier.get("when"), list):
+            raise ValueError(f"{where}: every tier needs a category and a list of conditions.")
+        for condition in tier["when"]:
+            if len(condition) != 3 or condition[1] not in RULE_OPS:
+                raise ValueError(f"{where}: invalid condition {condition}; ops are {', '.join(RULE_OPS)}.")
+    return rules
+
+
+def load_rules(data_dir, insight_id):
+    """
+    The rule set an insight runs with: the engagement's own from
+    <data_dir>/risk_rules.json ({insight_id: rule set}) when it has one for
+    the insight, else DEFAULT_RULES. An engagement's rule set replaces the
+    default one whole, so thresholds can be retuned without a deployment.
+    """
+    path = os.path.join(data_dir, RULES_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            configured = json.load(f)
+        if insight_id in configured:
+            return validate_rules(configured[insight_id], insight_id)
+    return DEFAULT_RULES[insight_id]
+
+
+def evaluate_rules(df, rules):
+    """
+    The category of every row of df under a rule set, evaluated column-wise:
+    each tier's conditions become one boolean mask and np.select picks the
+    first matching tier per row. Comparisons against missing values are False.
+    """
+    conditions, categories = [], []
+    for tier in rules.get("tiers", []):
+        mask = np.ones(len(df), dtype=bool)
+        for col, op, value in tier["when"]:
+            if col not in df.columns:
+                raise ValueError(f"Risk rule for '{tier['category']}' refers to missing column '{col}'.")
+            mask &= np.asarray(RULE_OPS[op](df[col], value), dtype=bool)
+        conditions.append(mask)
+        categories.append(tier["category"])
+    default = rules.get("default", "")
+    if not conditions:
+        return pd.Series(default, index=df.index, dtype=object)
+    return pd.Series(np.select(conditions, categories, default=default), index=df.index, dtype=object)
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .store import column_names
+
+
+def meta_path(output_excel_path):
+    return os.path.splitext(output_excel_path)[0] + ".meta.json"
+
+
+def sheet_path(output_excel_path, index):
+    # The first sheet is the insight's primary result table
+    stem = os.path.splitext(output_excel_path)[0]
+    return f"{stem}.parquet" if index == 0 else f"{stem}.sheet{index}.parquet"
+
+
+def to_arrow(df):
+    """
+    Converts a result table to Arrow. Object columns that Arrow cannot type
+    (mixed ints and strings, as Excel-sourced IDs often are) are stored as
+    strings; blank values stay null.
+    """
+    df = df.copy()
+    df.columns = column_names(df.columns)
+    # Categorical and Arrow-string input columns are stored as plain strings, like every other text column
+    for col in df.columns:
+        if isinstance(df[col].dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            df[col] = df[col].astype(object)
+    for col in df.columns[df.dtypes == object]:
+        # An empty string is a blank cell in the workbook, so it is stored as null too
+        df[col] = df[col].mask(df[col].eq(''))
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+# Labels of the metadata rows at the top of every insight sheet
+META_LABELS = {"Insight ID": "insight_id", "Exception No": "exception_no", "Exception Type": "exception_type"}
+
+
+def parse_header(header_rows):
+    """
+    Reads the metadata block written above a sheet's table ('Insight ID ',
+    'Exception No', 'Exception Type'). Sheets that carry a plain description
+    line instead get it as 'description'.
+    """
+    rows = header_rows.values.tolist() if isinstance(header_rows, pd.DataFrame) else header_rows
+    info = {}
+    for row in rows:
+        if len(row) >= 2 and str(row[0]).strip() in META_LABELS:
+            info[META_LABELS[str(row[0]).strip()]] = str(row[1]).strip()
+    if not info and rows and rows[0] and str(rows[0][0]).strip():
+        info["description"] = str(rows[0][0]).strip()
+    return info
+
+
+def write_sidecar(output_excel_path, sheets):
+    """
+    Writes the tables behind a generated workbook next to it: one Parquet file
+    per sheet plus <stem>.meta.json with the insight metadata, so the API can
+    serve results without parsing Excel. Every insight calls it right after
+    writing its workbook, with the same sheets.
+    sheets: {sheet name: (metadata header rows, DataFrame)} in workbook order.
+    """
+    meta = {"workbook": os.path.basename(output_excel_path), "generated_at": time.time(), "sheets": []}
+    for index, (name, (header_rows, df)) in enumerate(sheets.items()):
+        path = sheet_path(output_excel_path, index)
+        pq.write_table(to_arrow(df), path)
+        entry = {"name": name, "file": os.path.basename(path), "rows": len(df)}
+        entry.update(parse_header(header_rows))
+        meta["sheets"].append(entry)
+
+    # Workbook-level metadata comes from the primary sheet
+    primary = meta["sheets"][0] if meta["sheets"] else {}
+    for key in META_LABELS.values():
+        meta[key] = primary.get(key)
+
+    # The meta file goes last: once it is there, every table it lists is complete
+    tmp_path = meta_path(output_excel_path) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path(output_excel_path))
+    return meta
+
+
+def read_meta(output_excel_path):
+    path = meta_path(output_excel_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def sidecar_files(output_excel_path):
+    """Every file written for one workbook: the workbook, its meta file and its sheet tables."""
+    meta = read_meta(output_excel_path)
+    if meta is None:
+        return [output_excel_path]
+    folder = os.path.dirname(output_excel_path)
+    return [output_excel_path, meta_path(output_excel_path)] + [os.path.join(folder, s["file"]) for s in meta["sheets"]]
+
+
+def find_sheet(meta, sheet=None):
+    """
+    Picks a sheet entry from the meta file by name or position; the primary
+    sheet when none is asked for. Returns None for an unknown sheet.
+    """
+    if sheet is None or sheet == '':
+        return meta["sheets"][0] if meta["sheets"] else None
+    for entry in meta["sheets"]:
+        if entry["name"] == sheet:
+            return entry
+    if str(sheet).isdigit() and int(sheet) < len(meta["sheets"]):
+        return meta["sheets"][int(sheet)]
+    return None
+
+
+def read_sheet(output_excel_path, sheet=None):
+    meta = read_meta(output_excel_path)
+    entry = find_sheet(meta, sheet) if meta else None
+    if entry is None:
+        return None
+    return pd.read_parquet(os.path.join(os.path.dirname(output_excel_path), entry["file"]))
@@ -0,0 +1,691 @@
+import os
+import json
+import uuid
+import shutil
+import tempfile
+import zipfile
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.tseries.api import guess_datetime_format
+
+from .dtypes import DtypePlanner, describe_memory_report, read_plan, to_pandas
+
+# Raw upload name (the legacy Excel file) and columnar file for every input table
+TABLE_FILES = {
+    "concur": ("Concur_Header_Data.xlsx", "Concur_Header_Data.parquet"),
+    "left_employees": ("Left_Employees.xlsx", "Left_Employees.parquet"),
+    "emp_master": ("Employee_Master.xlsx", "Employee_Master.parquet"),
+    "line_items": ("Line_Item_Data.xlsx", "Line_Item_Data.parquet"),
+}
+
+# Declared column types per table. Columns not listed are stored as strings,
+# which keeps the schema identical across chunks and ZIP members.
+TABLE_SCHEMAS = {
+    "concur": {
+        "ids": ["Employee ID", "Report Id", "Report Number"],
+        "dates": ["Submit Date", "Report Start Date", "Report End Date", "Report Date"],
+        "amounts": ["Report Total", "Amount Due Employee", "Amount Approved"],
+    },
+    "line_items": {
+        "ids": ["Employee ID", "Report ID"],
+        "dates": ["Report Date", "Transaction Date"],
+        "amounts": ["Total Approved Amount", "Approved Amount"],
+    },
+    "left_employees": {
+        "ids": ["Emp_CODE"],
+        "dates": ["DOB", "DOJ", "Date of Resignation", "Employee Last Working Date", "Date of Retirement"],
+        "amounts": [],
+    },
+    "emp_master": {
+        "ids": ["Supplier", "Personnel Number", "Employee ID(Only ALPHA NUM)", "Position Code"],
+        "dates": ["Change Date", "Joining Date", "Employee Separation Date", "Date Of Birth", "Date"],
+        "amounts": [],
+    },
+}
+
+# Header spellings that drift between extracts -> the name every module expects
+COLUMN_ALIASES = {
+    "concur": {"Report ID": "Report Id"},
+    "line_items": {"Report Id": "Report ID", "Employee ID (Right)": "Employee ID"},
+}
+
+# Integer surrogate keys stored next to the ID columns. Codes come from append-only
+# dictionaries shared by every table of a data folder, so an employee or report has the
+# same code in all tables and modules can join and group on ints instead of strings.
+EMPLOYEE_KEY = "_employee_key"
+REPORT_KEY = "_report_key"
+KEY_SPACES = {EMPLOYEE_KEY: "employee", REPORT_KEY: "report"}
+
+# Key column -> the ID column it encodes, per table
+TABLE_KEYS = {
+    "concur": {EMPLOYEE_KEY: "Employee ID", REPORT_KEY: "Report Id"},
+    "line_items": {EMPLOYEE_KEY: "Employee ID", REPORT_KEY: "Report ID"},
+    "left_employees": {EMPLOYEE_KEY: "Emp_CODE"},
+    "emp_master": {EMPLOYEE_KEY: "Supplier"},
+}
+
+# Code of a missing ID
+NULL_KEY = -1
+
+# Date column -> prefix of the day and month key columns stored with it, per table. The keys
+# are datetime64 values truncated to the day / the first of the month, so modules group and
+# look up holidays on them instead of on strftime strings.
+DATE_KEYS = {
+    "concur": {"Submit Date": "_submit"},
+    "line_items": {"Transaction Date": "_transaction"},
+}
+SUBMIT_DAY, SUBMIT_MONTH = "_submit_day", "_submit_month"
+TRANSACTION_DAY, TRANSACTION_MONTH = "_transaction_day", "_transaction_month"
+DATE_KEY_COLUMNS = {f"{prefix}_{unit}" for keys in DATE_KEYS.values() for prefix in keys.values()
+                    for unit in ("day", "month")}
+
+# Candidate formats of text date columns, tried in this order (day-first before month-first,
+# as in the Indian extracts). The one parsing most of a sample wins and is cached per column.
+DATE_FORMATS = [
+    "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d",
+    "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y %H:%M:%S", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y %H:%M",
+    "%d/%m/%Y %H:%M", "%d-%b-%Y", "%d %b %Y", "%d-%b-%y", "%m/%d/%Y", "%m-%d-%Y",
+]
+DATE_SAMPLE_ROWS = 1000
+
+# Per table and date column, the format inferred when the table was last stored
+DATE_FORMATS_FILE = "date_formats.json"
+
+DATA_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Rows converted and appended to the store at a time; bounds ingest memory regardless of file size
+CHUNK_ROWS = 100_000
+
+# Bytes sampled from the start of a CSV to pick its encoding
+ENCODING_PROBE_BYTES = 64 * 1024
+
+
+def raw_path(data_dir, name):
+    return os.path.join(data_dir, TABLE_FILES[name][0])
+
+
+def columnar_path(data_dir, name):
+    return os.path.join(data_dir, TABLE_FILES[name][1])
+
+
+def arrow_path(data_dir, name):
+    return os.path.splitext(columnar_path(data_dir, name))[0] + ".arrow"
+
+
+def date_key_columns(name, columns=None):
+    """Day and month key columns of a table (of the given columns only, if passed)."""
+    keys = []
+    for col, prefix in DATE_KEYS.get(name, {}).items():
+        if columns is None or col in columns:
+            keys += [f"{prefix}_day", f"{prefix}_month"]
+    return keys
+
+
+def key_dictionary_path(data_dir, space):
+    return os.path.join(data_dir, f"{space}_keys.parquet")
+
+
+def canonical_columns(columns, name):
+    # A drifted header is only renamed when the expected spelling is not present as well
+    aliases = COLUMN_ALIASES.get(name, {})
+    return [aliases[c] if c in aliases and aliases[c] not in columns else c for c in columns]
+
+
+def clean_id(series):
+    # Excel hands numeric IDs back as floats, so '13005599.0' and 13005599 must end up as the same key
+    cleaned = series.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+    return cleaned.where(series.notna(), None)
+
+
+def infer_date_format(values, preferred=None):
+    """
+    The format that parses most of a sample of a text date column, or None
+    when the column holds no text or no candidate parses any of it.
+    preferred: format cached from an earlier upload, tried first.
+    """
+    sample = values[values.map(lambda v: isinstance(v, str))].head(DATE_SAMPLE_ROWS)
+    if sample.empty:
+        return None
+    candidates = [preferred] if preferred else []
+    guessed = guess_datetime_format(sample.iloc[0], dayfirst=True)
+    candidates += DATE_FORMATS + ([guessed] if guessed else [])
+    best, best_count = None, 0
+    for fmt in dict.fromkeys(candidates):
+        count = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if count > best_count:
+            best, best_count = fmt, count
+    return best
+
+
+def parse_dates(values, fmt=None):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if fmt is None:
+        return pd.to_datetime(values, format='mixed', dayfirst=True, errors='coerce')
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+    # Values written some other way than the column's format are parsed one by one
+    rest = parsed.isna() & values.notna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(values[rest], format='mixed', dayfirst=True, errors='coerce')
+    return parsed
+
+
+def add_date_keys(df, name):
+    for col, prefix in DATE_KEYS.get(name, {}).items():
+        if col in df.columns:
+            values = df[col].to_numpy(dtype='datetime64[ns]')
+            df[f"{prefix}_day"] = values.astype('datetime64[D]').astype('datetime64[ns]')
+            df[f"{prefix}_month"] = values.astype('datetime64[M]').astype('datetime64[ns]')
+    return df
+
+
+def apply_schema(df, name, date_formats=None, preferred_formats=None):
+    """
+    Coerces a raw table to its declared schema: IDs as clean strings, dates as
+    datetime64 and amounts as float64. Remaining object columns are stored as
+    strings so mixed-type Excel columns can be written to Parquet.
+    date_formats: {column: format} of the text date columns; formats of
+    columns not in it are inferred and added, so later chunks reuse them.
+    preferred_formats: formats cached from an earlier upload, tried first.
+    """
+    df.rename(columns=lambda x: str(x).strip(), inplace=True)
+    schema = TABLE_SCHEMAS[name]
+    date_formats = {} if date_formats is None else date_formats
+
+    for col in schema["ids"]:
+        if col in df.columns:
+            df[col] = clean_id(df[col])
+    for col in schema["dates"]:
+        if col in df.columns:
+            if date_formats.get(col) is None and df[col].dtype == object:
+                date_formats[col] = infer_date_format(df[col].dropna(), (preferred_formats or {}).get(col))
+            df[col] = parse_dates(df[col], date_formats.get(col))
+    for col in schema["amounts"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def arrow_schema(columns, name):
+    schema = TABLE_SCHEMAS[name]
+    fields = []
+    for col in columns:
+        if col in KEY_SPACES:
+            fields.append(pa.field(col, pa.int32()))
+        elif col in schema["dates"] or col in DATE_KEY_COLUMNS:
+            fields.append(pa.field(col, pa.timestamp('ns')))
+        elif col in schema["amounts"]:
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+class KeyDictionary:
+    """
+    Append-only mapping of canonical ID strings to int32 codes (the row
+    number of the ID in the dictionary file). Existing codes never change, so
+    tables encoded at different times stay joinable. Each dictionary file
+    carries a random id that the tables encoded with it record; a table whose
+    recorded id differs (e.g. the dictionary was deleted) is re-encoded.
+    path: the dictionary file, or None for an in-memory dictionary.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.dictionary_id = uuid.uuid4().hex
+        known = []
+        if path and os.path.exists(path):
+            table = pq.read_table(path)
+            self.dictionary_id = table.schema.metadata[b"dictionary_id"].decode()
+            known = table.column("key").to_pylist()
+        # New keys collect in a second index that is folded into the first once it
+        # grows, so encoding chunk after chunk does not re-hash every known key
+        self._known = pd.Index(known, dtype=object)
+        self._recent = pd.Index([], dtype=object)
+        self._lock = threading.Lock()
+        self.changed = False
+
+    def __len__(self):
+        return len(self._known) + len(self._recent)
+
+    def encode(self, values):
+        """Codes of canonical IDs as an int32 array; unseen IDs are appended, missing ones get NULL_KEY."""
+        values = pd.Series(values, dtype=object).to_numpy()
+        with self._lock:
+            codes = self._known.get_indexer(values)
+            missing = codes == -1
+            if len(self._recent) and missing.any():
+                recent = self._recent.get_indexer(values[missing])
+                codes[missing] = np.where(recent >= 0, recent + len(self._known), -1)
+                missing = codes == -1
+            missing &= pd.notna(values)
+            if missing.any():
+                new = pd.Index(pd.unique(values[missing]), dtype=object)
+                codes[missing] = len(self) + new.get_indexer(values[missing])
+                self._recent = self._recent.append(new)
+                if len(self._recent) * 4 > len(self._known):
+                    self._known, self._recent = self._known.append(self._recent), pd.Index([], dtype=object)
+                self.changed = True
+            codes[codes == -1] = NULL_KEY
+        return codes.astype(np.int32)
+
+    def save(self):
+        with self._lock:
+            if self.path is None or not self.changed:
+                return
+            keys = pa.array(list(self._known) + list(self._recent), type=pa.string())
+            table = pa.table({"key": keys}).replace_schema_metadata({"dictionary_id": self.dictionary_id})
+            pq.write_table(table, self.path + ".tmp")
+            os.replace(self.path + ".tmp", self.path)
+            self.changed = False
+
+
+# Dictionary file -> [KeyDictionary, writers using it]. Writers of one data folder share
+# the dictionary in memory, so two tables written at the same time never hand out one code twice.
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+def _acquire_dictionary(data_dir, space):
+    path = key_dictionary_path(data_dir, space)
+    with _dictionaries_lock:
+        if path not in _dictionaries:
+            _dictionaries[path] = [KeyDictionary(path), 0]
+        _dictionaries[path][1] += 1
+        return _dictionaries[path][0]
+
+
+def _release_dictionary(dictionary):
+    with _dictionaries_lock:
+        entry = _dictionaries[dictionary.path]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _dictionaries[dictionary.path]
+
+
+_date_formats_lock = threading.Lock()
+
+
+def load_date_formats(data_dir, name):
+    path = os.path.join(data_dir, DATE_FORMATS_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get(name, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_date_formats(data_dir, name, formats):
+    formats = {col: fmt for col, fmt in formats.items() if fmt}
+    if not formats:
+        return
+    path = os.path.join(data_dir, DATE_FORMATS_FILE)
+    with _date_formats_lock:
+        cached = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                pass
+        cached.setdefault(name, {}).update(formats)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(cached, f, indent=2, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+
+def dictionary_ids(data_dir, keys):
+    """{key space: dictionary id} of the given key columns, leaving out dictionaries not written yet."""
+    ids = {}
+    for key in keys:
+        path = key_dictionary_path(data_dir, KEY_SPACES[key])
+        if os.path.exists(path):
+            ids[KEY_SPACES[key]] = pq.read_schema(path).metadata[b"dictionary_id"].decode()
+    return ids
+
+
+class TableWriter:
+    """
+    Writes one table of the store chunk by chunk: each chunk is coerced to the
+    declared schema and gets its surrogate key and date key columns. Date
+    formats inferred on the first chunk are reused for the rest and cached in
+    the data folder for the next upload. The dtype plan the table loads with
+    (see dtypes.py) is recorded in the file's metadata. The file is written
+    next to the target and swapped in on close(), so a running insight never
+    sees a half-written table.
+    """
+
+    def __init__(self, data_dir, name, columns):
+        self.name = name
+        self.data_dir = data_dir
+        self.path = columnar_path(data_dir, name)
+        self.columns = [c for c in columns if c not in KEY_SPACES and c not in DATE_KEY_COLUMNS]
+        self.keys = {key: col for key, col in TABLE_KEYS[name].items() if col in self.columns}
+        self.dictionaries = {key: _acquire_dictionary(data_dir, KEY_SPACES[key]) for key in self.keys}
+        self.preferred_formats = load_date_formats(data_dir, name)
+        self.date_formats = {}
+        ids = {KEY_SPACES[key]: d.dictionary_id for key, d in self.dictionaries.items()}
+        derived = list(self.keys) + date_key_columns(name, self.columns)
+        self.schema = arrow_schema(self.columns + derived, name).with_metadata(
+            {"key_dictionaries": json.dumps(ids, sort_keys=True)})
+        self.planner = DtypePlanner(self.schema)
+        self.memory_report = {}
+        self.rows = 0
+        self._writer = pq.ParquetWriter(self.path + ".tmp", self.schema)
+
+    def write(self, chunk):
+        for col in self.columns:
+            if col not in chunk.columns:
+                chunk[col] = None
+        chunk = apply_schema(chunk[self.columns].copy(), self.name, self.date_formats, self.preferred_formats)
+        add_date_keys(chunk, self.name)
+        for key, col in self.keys.items():
+            chunk[key] = self.dictionaries[key].encode(chunk[col])
+        table = pa.Table.from_pandas(chunk, schema=self.schema, preserve_index=False)
+        self.planner.add(table)
+        self._writer.write_table(table)
+        self.rows += len(chunk)
+
+    def close(self, commit=True):
+        """Swaps the written table in, or with commit=False discards it."""
+        try:
+            if commit:
+                plan = self.planner.plan()
+                self.memory_report = self.planner.memory_report(plan)
+                self._writer.add_key_value_metadata({"dtype_plan": json.dumps(plan),
+                                                     "memory_report": json.dumps(self.memory_report)})
+            self._writer.close()
+            if commit:
+                # Dictionaries first: a stored table must never hold codes its dictionaries lack
+                for dictionary in self.dictionaries.values():
+                    dictionary.save()
+                os.replace(self.path + ".tmp", self.path)
+                save_date_formats(self.data_dir, self.name, self.date_formats)
+            elif os.path.exists(self.path + ".tmp"):
+                os.remove(self.path + ".tmp")
+        finally:
+            for dictionary in self.dictionaries.values():
+                _release_dictionary(dictionary)
+        return self.path
+
+
+def detect_encoding(prefix):
+    if prefix.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    try:
+        prefix.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the probe window is still valid UTF-8
+        if e.start < len(prefix) - 3:
+            return 'latin1'
+    return 'utf-8'
+
+
+def column_names(raw_names):
+    # Same naming pandas applies on read: blank headers become 'Unnamed: n', repeats get '.1', '.2', ...
+    names, seen = [], {}
+    for i, raw in enumerate(raw_names):
+        name = str(raw).strip() if raw is not None and str(raw).strip() != '' else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_columns(filename, opener):
+    if filename.lower().endswith('.csv'):
+        with opener() as f:
+            encoding = detect_encoding(f.read(ENCODING_PROBE_BYTES))
+        with opener() as f:
+            return column_names(pd.read_csv(f, nrows=0, encoding=encoding, encoding_errors='replace').columns)
+    if filename.lower().endswith('.xlsx'):
+        import openpyxl
+        with opener() as f:
+            wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+            try:
+                header = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+            finally:
+                wb.close()
+        return column_names(header)
+    with opener() as f:
+        return column_names(pd.read_excel(f, nrows=0).columns)
+
+
+def iter_chunks(filename, opener, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the rows of one CSV/Excel source as DataFrames of at most chunk_rows
+    rows, all values as raw objects. CSV encoding is detected from a prefix
+    instead of decoding the whole file twice.
+    """
+    if filename.lower().endswith('.csv'):
+        with opener() as f:
+            encoding = detect_encoding(f.read(ENCODING_PROBE_BYTES))
+        with opener() as f:
+            for chunk in pd.read_csv(f, dtype=str, encoding=encoding, encoding_errors='replace', chunksize=chunk_rows):
+                chunk.columns = column_names(chunk.columns)
+                yield chunk
+    elif filename.lower().endswith('.xlsx'):
+        # openpyxl's read-only mode streams rows from the sheet XML instead of building the workbook in memory
+        import openpyxl
+        with opener() as f:
+            wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+            try:
+                rows = wb.worksheets[0].iter_rows(values_only=True)
+                columns = column_names(next(rows, ()))
+                batch = []
+                for row in rows:
+                    if any(v is not None for v in row):
+                        batch.append(row[:len(columns)])
+                    if len(batch) >= chunk_rows:
+                        yield pd.DataFrame(batch, columns=columns, dtype=object)
+                        batch = []
+                if batch:
+                    yield pd.DataFrame(batch, columns=columns, dtype=object)
+            finally:
+                wb.close()
+    else:
+        # Legacy .xls has no streaming reader; it is small by nature of the format's row limit
+        with opener() as f:
+            df = pd.read_excel(f, dtype=object)
+        df.columns = column_names(df.columns)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def write_sources(sources, data_dir, name, chunk_rows=CHUNK_ROWS):
+    """
+    Appends every (filename, opener) source to the table's Parquet file one
+    chunk at a time. Column sets are unioned up front from the headers, so
+    sources with drifting layouts still share one schema.
+    """
+    columns = []
+    for filename, opener in sources:
+        columns += [c for c in canonical_columns(read_columns(filename, opener), name) if c not in columns]
+
+    writer = TableWriter(data_dir, name, columns)
+    try:
+        for filename, opener in sources:
+            for chunk in iter_chunks(filename, opener, chunk_rows):
+                chunk.columns = canonical_columns(list(chunk.columns), name)
+                writer.write(chunk)
+    except Exception:
+        writer.close(commit=False)
+        raise
+    path = writer.close()
+    print(f"Stored {name} as {path} ({writer.rows} rows).")
+    print(describe_memory_report(name, writer.memory_report))
+    return path
+
+
+def ingest_upload(upload, filename, data_dir, name, chunk_rows=CHUNK_ROWS):
+    """
+    Converts one upload (CSV, Excel or a ZIP of them) into the table's
+    columnar file. Nothing is held in memory beyond one chunk: uploads and
+    Excel ZIP members are spooled to a temp file, CSV members stream straight
+    out of the archive.
+    """
+    tmp_dir = tempfile.mkdtemp(dir=data_dir)
+    try:
+        if not filename.lower().endswith('.zip'):
+            path = os.path.join(tmp_dir, os.path.basename(filename))
+            with open(path, 'wb') as dst:
+                shutil.copyfileobj(upload, dst)
+            return write_sources([(filename, lambda: open(path, 'rb'))], data_dir, name, chunk_rows)
+
+        with zipfile.ZipFile(upload, 'r') as z:
+            sources = []
+            for i, info in enumerate(z.infolist()):
+                if info.filename.startswith('__MACOSX') or not info.filename.lower().endswith(DATA_EXTENSIONS):
+                    continue
+                if info.filename.lower().endswith('.csv'):
+                    sources.append((info.filename, lambda info=info: z.open(info)))
+                else:
+                    member_path = os.path.join(tmp_dir, f"{i}_{os.path.basename(info.filename)}")
+                    with z.open(info) as src, open(member_path, 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                    sources.append((info.filename, lambda p=member_path: open(p, 'rb')))
+            if not sources:
+                raise ValueError(f"No valid data files found inside {filename}.")
+            return write_sources(sources, data_dir, name, chunk_rows)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def ensure_columnar(data_dir, name):
+    """
+    Returns the columnar file for a table, converting the legacy Excel file
+    once if it is missing or newer than the converted copy.
+    """
+    path = columnar_path(data_dir, name)
+    legacy = raw_path(data_dir, name)
+    if os.path.exists(legacy) and (not os.path.exists(path) or os.path.getmtime(legacy) > os.path.getmtime(path)):
+        print(f"Converting {TABLE_FILES[name][0]} to columnar storage ...")
+        write_sources([(legacy, lambda: open(legacy, 'rb'))], data_dir, name)
+    elif os.path.exists(path):
+        ensure_keys(data_dir, name)
+    return path
+
+
+def ensure_keys(data_dir, name):
+    """
+    Re-encodes a stored table whose surrogate or date keys or dtype plan are
+    missing (stored before they existed) or whose keys were made with
+    dictionaries that no longer exist.
+    """
+    path = columnar_path(data_dir, name)
+    schema = pq.read_schema(path)
+    planned = read_plan(pq.read_metadata(path).metadata) is not None
+    expected = {key for key, col in TABLE_KEYS[name].items() if col in schema.names}
+    recorded = json.loads((schema.metadata or {}).get(b"key_dictionaries", b"{}"))
+    derived = expected | set(date_key_columns(name, schema.names))
+    if planned and derived <= set(schema.names) and recorded == dictionary_ids(data_dir, expected):
+        return
+    print(f"Encoding the keys of {name} ...")
+    parquet_file = pq.ParquetFile(path)
+    writer = TableWriter(data_dir, name, schema.names)
+    try:
+        for batch in parquet_file.iter_batches(batch_size=CHUNK_ROWS):
+            writer.write(batch.to_pandas())
+    except Exception:
+        writer.close(commit=False)
+        raise
+    writer.close()
+
+
+def table_fingerprint(data_dir, name):
+    """
+    Cheap identity of a table's current contents: size and modification time
+    of whichever file a run would read. None when the table was never uploaded.
+    """
+    for path in (columnar_path(data_dir, name), raw_path(data_dir, name)):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            return [os.path.basename(path), stat.st_size, stat.st_mtime_ns]
+    return None
+
+
+def memory_report(data_dir, name):
+    """Per-column memory estimate recorded when the table was stored, or None."""
+    path = columnar_path(data_dir, name)
+    if not os.path.exists(path):
+        return None
+    raw = (pq.read_metadata(path).metadata or {}).get(b"memory_report")
+    return json.loads(raw) if raw else None
+
+
+def table_rows(data_dir, name):
+    # Read from the Parquet footer, so no data pages are touched
+    path = columnar_path(data_dir, name)
+    if not os.path.exists(path):
+        return None
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def ensure_arrow(data_dir, name):
+    """
+    Returns an uncompressed Arrow IPC copy of a table, rebuilt whenever the
+    Parquet file is newer. Worker processes memory-map it instead of having
+    DataFrames pickled to them or decoding Parquet once per worker.
+    """
+    source = ensure_columnar(data_dir, name)
+    path = arrow_path(data_dir, name)
+    if not os.path.exists(path) or os.path.getmtime(source) > os.path.getmtime(path):
+        parquet_file = pq.ParquetFile(source)
+        # The dtype plan lives in the Parquet footer; the IPC copy carries it in its schema
+        schema = parquet_file.schema_arrow
+        plan = (parquet_file.metadata.metadata or {}).get(b"dtype_plan")
+        if plan:
+            schema = schema.with_metadata({**(schema.metadata or {}), b"dtype_plan": plan})
+        tmp_path = path + ".tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in parquet_file.iter_batches():
+                writer.write_batch(batch)
+        os.replace(tmp_path, path)
+    return path
+
+
+def read_columnar_table(path, columns=None):
+    """
+    Reads a stored table into Arrow, with its dtype plan in the schema metadata
+    for to_pandas(). Category columns stay dictionary-encoded as stored.
+    columns: read only these (and the derived key columns), or None for all.
+    """
+    raw_plan = (pq.read_metadata(path).metadata or {}).get(b"dtype_plan")
+    plan = json.loads(raw_plan) if raw_plan else {}
+    if columns is not None:
+        derived = set(KEY_SPACES) | DATE_KEY_COLUMNS
+        columns = [c for c in pq.read_schema(path).names if c in columns or c in derived]
+    categories = [col for col, dtype in plan.items() if dtype == "category"]
+    table = pq.read_table(path, columns=columns, read_dictionary=categories or None)
+    if raw_plan:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"dtype_plan": raw_plan})
+    return table
+
+
+def read_arrow_table(path):
+    # Memory-mapped: the table's buffers are the mapped pages, shared with every process mapping the file
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def read_columnar(path):
+    """Loads a stored table with its dtype plan; categoricals are decoded straight from Parquet dictionaries."""
+    table = read_columnar_table(path)
+    return to_pandas(table, read_plan(table.schema.metadata))
+
+
+def read_arrow(path):
+    table = read_arrow_table(path)
+    return to_pandas(table, read_plan(table.schema.metadata))
@@ -1,14 +1,15 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
-import pandas as pd
 import os
-import zipfile
-import io
 import traceback
 from werkzeug.utils import secure_filename
 
-# Import the updated orchestrator function
-from main_orchestrator import run_selected_insights 
+from jobs import JobManager
+from Modules.profiling import METRICS
+from Modules.sidecar import find_sheet, read_meta
+from Modules.store import ingest_upload, memory_report
+from table_query import load_result, parse_query, query_table
+from response_formats import ARROW_MIME, COLUMNAR_MIME, JSON_MIME, arrow_ipc, columnar, compress, negotiate
 
 app = Flask(__name__)
 CORS(app) 
@@ -18,6 +19,9 @@ OUTPUT_DIR = r"Output"
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Generation runs in the background; /api/generate only queues a job
+JOBS = JobManager(DATA_DIR, OUTPUT_DIR)
+
 MOCK_USERS = [
     {"id": "1", "username": "admin", "password": "password123", "role": "admin", "status": "Active"},
     {"id": "2", "username": "uploader", "password": "password123", "role": "uploader", "status": "Active"},
@@ -50,12 +54,13 @@ def delete_user(user_id):
     MOCK_USERS = [u for u in MOCK_USERS if u['id'] != user_id]
     return jsonify({"message": "User deleted successfully"}), 200
 
-# CLEANED FILENAMES: Now Pandas knows they are definitely Excel files!
-EXPECTED_FILENAMES = {
-    "concurFile": "Concur_Header_Data.xlsx",
-    "leftEmpFile": "Left_Employees.xlsx",
-    "empMasterFile": "Employee_Master.xlsx",
-    "lineItemFile": "Line_Item_Data.xlsx"
+# Upload form field -> input table. Every upload is converted once to the typed columnar
+# store in Data/, so insight runs never parse Excel.
+EXPECTED_TABLES = {
+    "concurFile": "concur",
+    "leftEmpFile": "left_employees",
+    "empMasterFile": "emp_master",
+    "lineItemFile": "line_items"
 }
 
 
@@ -65,40 +70,22 @@ def upload_files():
         if not request.files:
             return jsonify({"status": "error", "message": "No files provided."}), 400
 
-        for key, expected_name in EXPECTED_FILENAMES.items():
+        memory = {}
+        for key, table_name in EXPECTED_TABLES.items():
             if key in request.files:
                 file = request.files[key]
                 if file.filename != '':
-                    save_path = os.path.join(DATA_DIR, expected_name)
-                    
-                    if file.filename.lower().endswith('.zip'):
-                        dfs = []
-                        with zipfile.ZipFile(file, 'r') as z:
-                            for file_info in z.infolist():
-                                if not file_info.filename.startswith('__MACOSX') and file_info.filename.lower().endswith(('.csv', '.xlsx', '.xls')):
-                                    with z.open(file_info) as f:
-                                        file_bytes = f.read()
-                                        if file_info.filename.lower().endswith('.csv'):
-                                            try:
-                                                df = pd.read_csv(io.BytesIO(file_bytes), low_memory=False)
-                                            except UnicodeDecodeError:
-                                                df = pd.read_csv(io.BytesIO(file_bytes), encoding='latin1', low_memory=False)
-                                        else:
-                                            df = pd.read_excel(io.BytesIO(file_bytes))
-                                        dfs.append(df)
-                        
-                        if dfs:
-                            combined_df = pd.concat(dfs, ignore_index=True)
-                            # We now explicitly force it to save as an Excel file
-                            combined_df.to_excel(save_path, index=False)
-                        else:
-                            return jsonify({"status": "error", "message": f"No valid data files found inside the ZIP for {key}."}), 400
-                    else:
-                        file.save(save_path)
+                    # ZIP members and large sheets are streamed into the columnar store chunk by chunk
+                    ingest_upload(file.stream, file.filename, DATA_DIR, table_name)
+                    # Per-column memory of the table as loaded with its dtype plan vs plain object columns
+                    memory[table_name] = memory_report(DATA_DIR, table_name)
 
         # Notice we removed the "run_all_insights()" from here! It ONLY uploads now.
-        return jsonify({"status": "success", "message": "Files uploaded successfully!"}), 200
+        return jsonify({"status": "success", "message": "Files uploaded successfully!", "memory": memory}), 200
 
+    except ValueError as e:
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -109,23 +96,36 @@ def generate_insights():
     try:
         data = request.get_json()
         selected_insights = data.get('insights', [])
-        
+        # Optional per-insight overrides of the default thresholds, e.g. {"PJPA33": {"bulk_threshold": 5}}
+        params = data.get('params') or {}
+
         if not selected_insights:
             return jsonify({"status": "error", "message": "No insights selected."}), 400
-        
-        # Pass the list of requested modules to the orchestrator
-        run_selected_insights(selected_insights)
-        
-        return jsonify({"status": "success", "message": "Generation complete."}), 200
-        
+
+        # Queued as a background job; an identical job that is still pending is reused
+        job, coalesced = JOBS.submit(selected_insights, params)
+
+        return jsonify({"status": "accepted", "job_id": job["job_id"], "coalesced": coalesced, "job": job}), 202
+
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
 
-SKIP_ROWS_MAP = {
-    "PJPA27": 5, "PJPA28": 5, "PJPA29": 5, "PJPA30": 4, "PJPA31": 4,
-    "PJPA32_HOL": 5, "PJPA32_WE": 5, "PJPA33": 4, "PJPA34": 5, "PJPA35": 4, "PJPA36": 5, "PJPA38": 5, "PJPA39": 4, "PJPA40": 4
-}
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = JOBS.status(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/progress', methods=['GET'])
+def get_job_progress(job_id):
+    progress = JOBS.progress(job_id)
+    if progress is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(progress)
 
 FILE_MAP = {
     "PJPA27": "PJPA27_Generated.xlsx", "PJPA28": "PJPA28_Generated.xlsx",
@@ -133,9 +133,17 @@ FILE_MAP = {
     "PJPA31": "PJPA31_Generated.xlsx", "PJPA32_HOL": "PJPA32_Holiday_Generated.xlsx",
     "PJPA32_WE": "PJPA32_Weekend_Generated.xlsx", "PJPA33": "PJPA33_Generated.xlsx",
     "PJPA34": "PJPA34_Generated.xlsx", "PJPA35": "PJPA35_Generated.xlsx", "PJPA36": "PJPA36_Generated.xlsx",
-    "PJPA38": "PJPA38_Generated.xlsx", "PJPA39": "PJPA39_Generated.xlsx", "PJPA40": "PJPA40_Generated.xlsx"
+    "PJPA38": "PJPA38_Generated.xlsx", "PJPA39": "PJPA39_Generated.xlsx", "PJPA40": "PJPA40_Generated.xlsx",
+    "PJPA41": "PJPA41_Generated.xlsx",
+    "PJPA42": "PJPA42_Generated.xlsx",
+    "PJPA43": "PJPA43_Generated.xlsx"
 }
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text exposition of the per-insight, per-stage run metrics
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/insights', methods=['GET'])
 def get_insights_list():
     insights = [{"id": k, "name": v} for k, v in FILE_MAP.items()]
@@ -146,21 +154,48 @@ def get_insight_data(insight_id):
     try:
         if insight_id not in FILE_MAP:
             return jsonify({"status": "error", "message": "Insight not found"}), 404
-            
+
+        # Served from the columnar copy written next to the workbook; ?sheet= picks another sheet by name or position
         file_path = os.path.join(OUTPUT_DIR, FILE_MAP[insight_id])
-        if not os.path.exists(file_path):
+        meta = read_meta(file_path)
+        if meta is None:
             return jsonify({"status": "error", "message": "Data not generated yet. Please upload master data first."}), 404
 
-        if insight_id == "PJPA28":
-            df = pd.read_excel(file_path, sheet_name='Anomalies (30-42)', skiprows=SKIP_ROWS_MAP[insight_id])
+        sheet = find_sheet(meta, request.args.get('sheet'))
+        if sheet is None:
+            return jsonify({"status": "error", "message": "Sheet not found"}), 404
+
+        # Filtering, sorting and paging run on the Arrow table; only the requested page is converted
+        query = parse_query(request.args)
+        response_format = negotiate(request.headers.get('Accept'), request.args.get('format'))
+        table = load_result(os.path.join(OUTPUT_DIR, sheet["file"]))
+        page, total = query_table(table, query)
+
+        info = {"status": "success", "insight_id": insight_id, "sheet": sheet["name"],
+                "sheets": [s["name"] for s in meta["sheets"]], "columns": page.column_names,
+                "total": total, "total_unfiltered": table.num_rows,
+                "offset": query["offset"], "limit": query["limit"]}
+
+        if response_format == "arrow":
+            body, mimetype = arrow_ipc(page, info), ARROW_MIME
+        elif response_format == "columnar":
+            body, mimetype = app.json.dumps({**info, **columnar(page)}).encode('utf-8'), COLUMNAR_MIME
         else:
-            df = pd.read_excel(file_path, skiprows=SKIP_ROWS_MAP[insight_id])
-            
-        df.columns = df.columns.astype(str)
-        df = df.fillna("N/A")
-        
-        return jsonify({"status": "success", "insight_id": insight_id, "data": df.to_dict(orient='records')})
-
+            df = page.to_pandas()
+            df.columns = df.columns.astype(str)
+            df = df.fillna("N/A")
+            body, mimetype = app.json.dumps({**info, "data": df.to_dict(orient='records')}).encode('utf-8'), JSON_MIME
+
+        # gzip or brotli per Accept-Encoding
+        body, encoding = compress(body, request.headers.get('Accept-Encoding'))
+        response = Response(body, mimetype=mimetype)
+        response.headers['Vary'] = 'Accept, Accept-Encoding'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -0,0 +1,202 @@
+"""
+Benchmarks every insight and the full run on synthetic data.
+
+For each size the runner generates (or reuses) the synthetic input tables,
+times each insight's generate_* function on its own and then the whole
+run_selected_insights. Every measurement runs in a fresh process, so its
+peak memory is that of the measured work alone and no table is already
+loaded. Results are saved as JSON; given a baseline, they are compared
+against it and the exit code is 1 when anything got slower, heavier or
+stopped succeeding.
+
+Usage (from the backend folder):
+    python -m benchmarks.run_benchmarks --sizes 10k,760k --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --sizes 10k,760k --baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from main_orchestrator import INSIGHTS, required_columns, run_insight, run_selected_insights
+from Modules.dataset import DatasetContext
+from Modules.profiling import peak_rss_bytes
+from benchmarks.synthetic_data import generate_dataset, parse_size
+
+WORK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".work")
+
+FULL_RUN = "full_run"
+
+# Allowed growth over the baseline before a measurement counts as a regression
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.15
+
+
+def _measure_insight(insight_id, data_dir, output_dir):
+    return run_insight(insight_id, DatasetContext(data_dir, columns=required_columns([insight_id])), output_dir)
+
+
+def _measure_full_run(insight_ids, data_dir, output_dir, workers):
+    start = time.time()
+    cpu_start = time.process_time()
+    results = run_selected_insights(insight_ids, data_dir, output_dir, workers=workers)
+    failed = sorted(insight_id for insight_id, result in results.items() if result["status"] != "done")
+    peak = peak_rss_bytes()
+    if peak is not None:
+        # With a pool, the insights ran in worker processes that have their own peaks
+        peak = max(peak, peak_rss_bytes(children=True))
+    return {
+        "status": "failed" if failed else "done",
+        "error": f"failed: {', '.join(failed)}" if failed else None,
+        "elapsed": round(time.time() - start, 3),
+        "cpu_seconds": round(time.process_time() - cpu_start, 3),
+        "peak_rss_bytes": peak,
+    }
+
+
+def measure(func, *args):
+    """Runs func(*args) in a new process and returns its result."""
+    # spawn, so the measured process starts without anything the runner has loaded
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(func, *args).result()
+
+
+def _entry(result, input_rows):
+    entry = {key: result.get(key) for key in ("status", "error", "elapsed", "cpu_seconds", "peak_rss_bytes")}
+    entry["input_rows"] = input_rows
+    entry["rows_per_second"] = round(input_rows / result["elapsed"]) if result.get("elapsed") else None
+    if result.get("stages"):
+        entry["stages"] = result["stages"]
+    return entry
+
+
+def benchmark_size(size, insight_ids, work_dir, repeat=1, workers=None, seed=0):
+    """Benchmarks one size; returns {insight_id or 'full_run': measurement}."""
+    rows = parse_size(size)
+    data_dir = os.path.join(work_dir, str(size), "Data")
+    output_dir = os.path.join(work_dir, str(size), "Output")
+    tables = generate_dataset(data_dir, rows, seed=seed)["tables"]
+
+    runs = [(insight_id, _measure_insight, (insight_id, data_dir, output_dir),
+             sum(tables[name] for name in INSIGHTS[insight_id]["inputs"])) for insight_id in insight_ids]
+    used = {name for insight_id in insight_ids for name in INSIGHTS[insight_id]["inputs"]}
+    runs.append((FULL_RUN, _measure_full_run, (insight_ids, data_dir, output_dir, workers),
+                 sum(tables[name] for name in used)))
+
+    results = {}
+    for name, func, args, input_rows in runs:
+        best = None
+        for _ in range(repeat):
+            # A fresh output folder each time, so the full run never restores cached results
+            shutil.rmtree(output_dir, ignore_errors=True)
+            os.makedirs(output_dir)
+            try:
+                result = measure(func, *args)
+            except Exception as e:
+                # The measured process died, most likely out of memory
+                result = {"status": "failed", "error": str(e)}
+            if best is None or (result.get("elapsed") or float("inf")) < (best.get("elapsed") or float("inf")):
+                best = result
+        results[name] = _entry(best, input_rows)
+        if name == FULL_RUN:
+            results[name]["insights"] = insight_ids
+        print(f"[{size}] {name}: {_describe(results[name])}")
+    return results
+
+
+def _describe(entry):
+    if entry["status"] != "done":
+        return f"{entry['status']} ({entry['error']})"
+    peak = f"{entry['peak_rss_bytes'] / 1024 ** 2:.0f} MiB" if entry["peak_rss_bytes"] else "n/a"
+    return f"{entry['elapsed']:.2f}s, {entry['rows_per_second']:,} rows/s, peak {peak}"
+
+
+def compare(results, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """
+    Lists the regressions of results against a baseline of the same shape
+    ({size: {name: measurement}}). Sizes or insights missing from either side
+    are skipped.
+    """
+    regressions = []
+    for size, measurements in results.items():
+        for name, current in measurements.items():
+            previous = baseline.get(size, {}).get(name)
+            # A full run is only comparable with one over the same insights
+            if previous is None or previous["status"] != "done" or previous.get("insights") != current.get("insights"):
+                continue
+            if current["status"] != "done":
+                regressions.append(f"[{size}] {name}: {current['status']} ({current['error']})")
+                continue
+            if current["elapsed"] > previous["elapsed"] * (1 + time_tolerance):
+                regressions.append(f"[{size}] {name}: {current['elapsed']:.2f}s vs {previous['elapsed']:.2f}s baseline")
+            if current["peak_rss_bytes"] and previous["peak_rss_bytes"] and \
+                    current["peak_rss_bytes"] > previous["peak_rss_bytes"] * (1 + memory_tolerance):
+                regressions.append(f"[{size}] {name}: peak {current['peak_rss_bytes'] / 1024 ** 2:.0f} MiB "
+                                   f"vs {previous['peak_rss_bytes'] / 1024 ** 2:.0f} MiB baseline")
+    return regressions
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, default=str)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the insight modules on synthetic data.")
+    parser.add_argument("--sizes", default="10k", help="comma-separated sizes, e.g. 10k,760k,5M")
+    parser.add_argument("--insights", help="comma-separated insight ids (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per measurement; the fastest is kept")
+    parser.add_argument("--workers", type=int, help="pool size of the full run (default: INSIGHT_WORKERS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=WORK_DIR, help="where synthetic data and outputs are kept")
+    parser.add_argument("--output", help="results file (default: <work-dir>/results.json)")
+    parser.add_argument("--baseline", help="baseline results to compare against")
+    parser.add_argument("--save-baseline", help="also save these results as a baseline")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    insight_ids = [i.strip() for i in args.insights.split(",")] if args.insights else list(INSIGHTS)
+    unknown = [i for i in insight_ids if i not in INSIGHTS]
+    if unknown:
+        parser.error(f"unknown insight(s): {', '.join(unknown)}")
+
+    results = {}
+    for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        results[size] = benchmark_size(size, insight_ids, args.work_dir, args.repeat, args.workers, args.seed)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    _write_json(args.output or os.path.join(args.work_dir, "results.json"), report)
+    if args.save_baseline:
+        _write_json(args.save_baseline, report)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
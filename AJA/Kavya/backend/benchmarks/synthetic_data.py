@@ -0,0 +1,359 @@
+"""
+Deterministic synthetic Concur extracts for benchmarking the insights.
+
+Writes the four input tables straight into the columnar store of a data
+folder (the same Parquet files an upload produces), so sizes beyond Excel's
+row limit can be generated. The distributions are chosen so that every
+insight has exceptions to report:
+
+- amounts are log-normal (Benford, low-value claims, risk bands)
+- a few heavy claimants and same-day submission runs (splitting, bulk booking)
+- a small share of re-submitted report ids (duplicate reports)
+- submit dates skip the public holidays (missing days)
+- line items dated outside their report, on weekends and on holidays
+- line items that add up to their report's approved amount, except for a
+  small share of mismatched reports, reports without line items and line
+  items whose report is missing from the header (reconciliation)
+- expenses resubmitted on the employee's next report (near-duplicate claims)
+- rare expense types (odd travel modes)
+- resigned employees, new joiners and active employees with a separation date
+
+Usage (from the backend folder):
+    python -m benchmarks.synthetic_data 760k benchmarks/.work/760k/Data
+"""
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from Modules.store import TableWriter
+
+# Named sizes, as header (report) rows; line items come to about twice as many
+SIZES = {"10k": 10_000, "760k": 760_000, "5M": 5_000_000}
+
+# Written next to the tables; a folder whose manifest matches is not generated again
+MANIFEST = "synthetic_manifest.json"
+
+# Rows generated and appended at a time, which bounds memory at any size
+CHUNK_ROWS = 250_000
+
+# The holiday calendar of PJPA32 covers 2025
+YEAR = 2025
+HOLIDAYS = ['2025-01-26', '2025-08-15', '2025-10-02', '2025-10-20', '2025-12-25']
+
+REPORTS_PER_EMPLOYEE = 40
+MIN_EMPLOYEES = 200
+LEFT_EMPLOYEE_SHARE = 0.08
+NEW_JOINER_SHARE = 0.15
+INACTIVE_HISTORY_SHARE = 0.05
+ACTIVE_WITH_SEPARATION_SHARE = 0.01
+
+# Chance that a report is submitted on the same day as the same employee's previous one;
+# bulk bookers batch their submissions far more often than everyone else
+SAME_DAY_SHARE = 0.08
+BULK_BOOKER_SHARE = 0.05
+BULK_BOOKER_SAME_DAY_SHARE = 0.6
+DUPLICATE_REPORT_SHARE = 0.005
+# Share of line items dated before the report start or after its end
+OUT_OF_RANGE_SHARE = 0.05
+# Reconciliation exceptions: reports whose approved amount was changed without their line
+# items, reports with no line items, and reports whose header row is missing from the extract
+MISMATCHED_REPORT_SHARE = 0.02
+LINELESS_REPORT_SHARE = 0.01
+HEADERLESS_REPORT_SHARE = 0.005
+# Share of line items claimed again on the same employee's next report, up to a few days later
+RESUBMITTED_LINE_SHARE = 0.01
+
+POLICIES = (["Domestic", "Short trip", "International"], [0.6, 0.35, 0.05])
+REPORT_NAMES = (["Site visit", "Dealer meet", "Plant visit", "Conference", "Training"], [0.35, 0.25, 0.2, 0.1, 0.1])
+EXPENSE_TYPES = (["Taxi", "Hotel", "Meals", "Personal Car", "Personal Bike", "Flight", "Train", "Bus", "Helicopter"],
+                 [0.2, 0.2, 0.16, 0.12, 0.1, 0.1, 0.08, 0.035, 0.005])
+CITIES = ["Delhi", "Mumbai", "Udaipur", "Kanpur", "Katni", "Jharli", "Nimbahera", "Mangrol", "Ahmedabad", "Indore"]
+BANDS = ["5A", "5B", "6A", "6B", "7A", "7B"]
+DEPARTMENTS = ["Sales", "Marketing", "Operations", "Finance", "HR", "Logistics", "Projects", "IT"]
+
+EMP_MASTER_COLUMNS = [
+    'Position Code', 'Personnel Number', 'Employee ID(Only ALPHA NUM)', 'Employee Status', 'Supplier',
+    'Position Code Name', 'Full Name', 'Title', 'Employee Email Id', 'Phone Number', 'Employee Location',
+    'Department', 'Company name', 'Employee Alias', 'Change Date', 'Joining Date', 'Employee Separation Date',
+    'Rep. Manager', 'HOD Names', 'HOD TMS Names', 'Cost Center', 'Gender', 'Date Of Birth', 'Blood Group',
+    'Indicator', 'Country/Region Key', 'Bank Account', 'Bank Country/Region', 'Bank Number', 'Postal Code',
+    'Region', 'Company Code', 'IFSC Code', 'Account holder', 'Nationality text', 'Title.1', 'State',
+    'Name of Financial Institution', 'Date', 'Employee Location.1', 'Character Field with Length 10',
+    'Payroll area', 'Flag on and off', 'Record Updated or not',
+]
+
+
+def parse_size(size):
+    """'760k', '5M' or a plain row count."""
+    if size in SIZES:
+        return SIZES[size]
+    text = str(size).strip().lower().replace('_', '')
+    factor = 1
+    if text.endswith('k'):
+        text, factor = text[:-1], 1_000
+    elif text.endswith('m'):
+        text, factor = text[:-1], 1_000_000
+    try:
+        return int(float(text) * factor)
+    except ValueError:
+        raise ValueError(f"Invalid size '{size}'. Use a row count or one of: {', '.join(SIZES)}.")
+
+
+def _pick(rng, choices, n):
+    values, weights = choices
+    return np.array(values, dtype=object)[rng.choice(len(values), n, p=weights)]
+
+
+def _days(rng, low, high, n):
+    return pd.to_timedelta(rng.integers(low, high, n), unit='D')
+
+
+def employees(rng, count):
+    """Employee master and left-employee tables for `count` employees."""
+    year_start = pd.Timestamp(f"{YEAR}-01-01")
+    ids = (13_000_000 + np.arange(count)).astype(str)
+    names = np.char.add("Employee ", np.arange(count).astype(str)).astype(object)
+
+    joining = pd.Timestamp("2010-01-01") + _days(rng, 0, 15 * 365, count)
+    new_joiners = rng.random(count) < NEW_JOINER_SHARE
+    joining = joining.where(~new_joiners, year_start + _days(rng, -30, 330, count))
+
+    left = rng.random(count) < LEFT_EMPLOYEE_SHARE
+    resignation = year_start + _days(rng, 0, 365, count)
+    # A zero notice period is what PJPA27 rates as critical
+    notice = pd.to_timedelta(rng.choice([0, 30, 60, 90], count, p=[0.1, 0.3, 0.3, 0.3]), unit='D')
+    last_working = resignation + notice
+
+    status = np.where(left, "INACTIVE", "ACTIVE").astype(object)
+    separation = pd.Series(last_working).where(left)
+    # Active employees carrying a separation date are the data-quality exceptions of PJPA39
+    flagged = ~left & (rng.random(count) < ACTIVE_WITH_SEPARATION_SHARE)
+    separation[flagged] = (year_start + _days(rng, 0, 365, count))[flagged]
+
+    emp = pd.DataFrame({col: None for col in EMP_MASTER_COLUMNS}, index=range(count))
+    emp['Personnel Number'] = ids
+    emp['Employee ID(Only ALPHA NUM)'] = np.char.zfill(ids, 10)
+    emp['Employee Status'] = status
+    emp['Supplier'] = ids
+    emp['Full Name'] = names
+    emp['Title'] = "Individual Cont"
+    emp['Employee Location'] = np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), count)]
+    emp['Employee Location.1'] = emp['Employee Location']
+    emp['Department'] = np.array(DEPARTMENTS, dtype=object)[rng.integers(0, len(DEPARTMENTS), count)]
+    emp['Company name'] = "JK Cement Ltd"
+    emp['Change Date'] = joining + _days(rng, 0, 365, count)
+    emp['Joining Date'] = joining
+    emp['Employee Separation Date'] = separation.values
+    emp['Gender'] = np.where(rng.random(count) < 0.8, "M", "F")
+    emp['Date Of Birth'] = joining - _days(rng, 22 * 365, 40 * 365, count)
+    emp['Country/Region Key'] = "IN"
+    emp['Company Code'] = "1000"
+    emp['Nationality text'] = "Indian"
+
+    # Older records of some employees, kept in the master with a non-active status
+    history = emp[rng.random(count) < INACTIVE_HISTORY_SHARE].copy()
+    history['Employee Status'] = "INACTIVE"
+    history['Change Date'] = history['Joining Date']
+    emp_master = pd.concat([emp, history], ignore_index=True)
+
+    left_employees = pd.DataFrame({
+        'Emp_CODE': ids[left],
+        'NAME': names[left],
+        'Designation Name': "Senior Executive",
+        'Job Level': "Senior Officer",
+        'Person Band': np.array(BANDS, dtype=object)[rng.integers(0, len(BANDS), count)][left],
+        'DOB': emp['Date Of Birth'][left].values,
+        'DOJ': joining[left],
+        'Location': emp['Employee Location'][left].values,
+        'Business Unit': "Sales & Marketing",
+        'Department Name': emp['Department'][left].values,
+        'Division  Name': "Grey Cement Division",
+        'Separation Reason': "Resignation",
+        'Date of Resignation': resignation[left],
+        'Employee Last Working Date': last_working[left],
+        'Date of Retirement': (joining + pd.to_timedelta(30 * 365, unit='D'))[left],
+    })
+    return emp_master, left_employees, ids, names
+
+
+def report_chunk(rng, first_report, n, ids, names, weights, same_day, submit_days):
+    """Header rows for reports first_report .. first_report + n - 1, plus their line items."""
+    emp = rng.choice(len(ids), n, p=weights)
+
+    # Runs of reports by the same employee on one day: after sorting by employee, a
+    # report reuses the day of the previous one with the employee's same-day probability
+    day = rng.choice(submit_days, n)
+    order = np.argsort(emp, kind='stable')
+    sorted_emp = emp[order]
+    reuse = (rng.random(n) < same_day[sorted_emp]) & np.r_[False, sorted_emp[1:] == sorted_emp[:-1]]
+    run_start = np.maximum.accumulate(np.where(reuse, 0, np.arange(n)))
+    day[order] = day[order][run_start]
+
+    submit = pd.Timestamp(f"{YEAR}-01-01") + pd.to_timedelta(day, unit='D') + pd.to_timedelta(rng.integers(0, 86400, n), unit='s')
+    start = submit.normalize() - _days(rng, 1, 20, n)
+    duration = rng.integers(0, 5, n)
+    end = start + pd.to_timedelta(duration, unit='D')
+    amount = np.round(np.exp(rng.normal(7, 1.3, n)), 2)
+    report_ids = np.char.add("R", np.char.zfill((first_report + np.arange(n)).astype(str), 9)).astype(object)
+    report_names = _pick(rng, REPORT_NAMES, n)
+    approval = np.where(rng.random(n) < 0.9, "Approved", "Pending Approval").astype(object)
+    payment = np.where(rng.random(n) < 0.85, "Payment Confirmed", "Not Paid").astype(object)
+
+    lines_per_report = np.where(rng.random(n) < LINELESS_REPORT_SHARE, 0, rng.integers(1, 4, n))
+    report = np.repeat(np.arange(n), lines_per_report)
+    m = len(report)
+    offset = rng.integers(0, duration[report] + 1)
+    outside = rng.random(m) < OUT_OF_RANGE_SHARE
+    late = rng.random(m) < 0.5
+    offset = np.where(outside & late, duration[report] + rng.integers(1, 6, m), offset)
+    offset = np.where(outside & ~late, -rng.integers(1, 6, m), offset)
+
+    # Each report's amount split over its line items; the last line takes the rounding remainder
+    share = rng.random(m) + 0.2
+    line_amount = np.round(amount[report] * share / np.bincount(report, share, minlength=n)[report], 2)
+    last_line = np.cumsum(lines_per_report)[lines_per_report > 0] - 1
+    line_amount[last_line] += np.round(amount - np.bincount(report, line_amount, minlength=n), 2)[lines_per_report > 0]
+    line_amount = np.round(line_amount, 2)
+    expense_types = _pick(rng, EXPENSE_TYPES, m)
+    cities = np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), m)]
+
+    # Resubmitted expenses: a line copied onto the employee's next report (in report order),
+    # dated up to two days later, with the report's amount raised to match
+    next_report = np.full(n, -1)
+    next_report[order[:-1]] = np.where(sorted_emp[1:] == sorted_emp[:-1], order[1:], -1)
+    resubmitted = np.flatnonzero((rng.random(m) < RESUBMITTED_LINE_SHARE) & (next_report[report] >= 0))
+    copies = next_report[report[resubmitted]]
+    moved = (start[report[resubmitted]] - start[copies]).days.to_numpy()
+    offset = np.r_[offset, moved + offset[resubmitted] + rng.integers(0, 3, len(resubmitted))]
+    report = np.r_[report, copies]
+    line_amount = np.r_[line_amount, line_amount[resubmitted]]
+    expense_types = np.r_[expense_types, expense_types[resubmitted]]
+    cities = np.r_[cities, cities[resubmitted]]
+    np.add.at(amount, copies, line_amount[resubmitted])
+    amount = np.round(amount, 2)
+    m = len(report)
+
+    # Approved amounts cut (or raised) on the header without touching the line items
+    approved = np.where(rng.random(n) < MISMATCHED_REPORT_SHARE, np.round(amount * rng.uniform(0.5, 1.3, n), 2), amount)
+
+    headers = pd.DataFrame({
+        'Employee ID': ids[emp],
+        'Report Name': report_names,
+        'Report Id': report_ids,
+        'Report Number': np.char.add("N", rng.integers(100_000, 1_000_000, n).astype(str)).astype(object),
+        'Submit Date': submit,
+        'Employee Name': names[emp],
+        'Approval Status': approval,
+        'Report Start Date': start,
+        'Report End Date': end,
+        'Currency': "INR",
+        'Report Total': amount,
+        'Payment Status': payment,
+        'Amount Due Employee': amount,
+        'Report Date': start,
+        'Policy': _pick(rng, POLICIES, n),
+        'Amount Approved': approved,
+    })
+    # Reports whose header row is missing: their line items are orphans
+    headers = headers[rng.random(n) >= HEADERLESS_REPORT_SHARE].reset_index(drop=True)
+    # Re-submitted reports: the same report id and employee appear twice
+    duplicates = headers.iloc[rng.choice(len(headers), int(n * DUPLICATE_REPORT_SHARE), replace=False)]
+    headers = pd.concat([headers, duplicates], ignore_index=True)
+
+    line_items = pd.DataFrame({
+        'Employee': names[emp][report],
+        'Report Name': report_names[report],
+        'Expense Type': expense_types,
+        'Report ID': report_ids[report],
+        'Approval Status': approval[report],
+        'Payment Status': payment[report],
+        'Report Date': start[report],
+        'Transaction Date': start[report] + pd.to_timedelta(offset, unit='D'),
+        'Total Approved Amount': line_amount,
+        'City/Location': cities,
+        'Payment Type': "Self",
+        'Approved Amount': line_amount,
+        'Employee ID': ids[emp][report],
+        'Person Band before PMS': np.array(BANDS, dtype=object)[rng.integers(0, len(BANDS), m)],
+    })
+    return headers, line_items
+
+
+def generate_dataset(data_dir, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """
+    Writes the four input tables for `rows` reports into data_dir and returns
+    the manifest ({table: rows}, size and seed). The same size and seed always
+    produce the same data.
+    """
+    if rows < 1:
+        raise ValueError("At least one report row is needed.")
+    os.makedirs(data_dir, exist_ok=True)
+    manifest_path = os.path.join(data_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if (manifest.get("reports"), manifest.get("seed"), manifest.get("chunk_rows")) == (rows, seed, chunk_rows):
+            print(f"Synthetic data for {rows} reports already in {data_dir}.")
+            return manifest
+
+    print(f"Generating synthetic data for {rows} reports in {data_dir} ...")
+    rng = np.random.default_rng([seed, 0])
+    emp_master, left_employees, ids, names = employees(rng, max(MIN_EMPLOYEES, rows // REPORTS_PER_EMPLOYEE))
+    ids, names = ids.astype(object), names.astype(object)
+
+    # A few heavy claimants and a long tail, as in the real extracts
+    weights = 1 / np.arange(1, len(ids) + 1) ** 0.7
+    weights = rng.permutation(weights / weights.sum())
+    same_day = np.where(rng.random(len(ids)) < BULK_BOOKER_SHARE, BULK_BOOKER_SAME_DAY_SHARE, SAME_DAY_SHARE)
+    year_days = pd.date_range(f"{YEAR}-01-01", f"{YEAR}-12-31").strftime('%Y-%m-%d')
+    submit_days = np.flatnonzero(~year_days.isin(HOLIDAYS))
+
+    tables = {}
+    for name, df in (("emp_master", emp_master), ("left_employees", left_employees)):
+        writer = TableWriter(data_dir, name, list(df.columns))
+        writer.write(df)
+        writer.close()
+        tables[name] = writer.rows
+
+    concur = line_items = None
+    try:
+        for chunk, first in enumerate(range(0, rows, chunk_rows)):
+            # Each chunk has its own seed, so chunks are reproducible independently of each other
+            chunk_rng = np.random.default_rng([seed, 1, chunk])
+            headers, items = report_chunk(chunk_rng, first, min(chunk_rows, rows - first), ids, names, weights, same_day, submit_days)
+            if concur is None:
+                concur = TableWriter(data_dir, "concur", list(headers.columns))
+                line_items = TableWriter(data_dir, "line_items", list(items.columns))
+            concur.write(headers)
+            line_items.write(items)
+    except Exception:
+        for writer in (concur, line_items):
+            if writer is not None:
+                writer.close(commit=False)
+        raise
+    for name, writer in (("concur", concur), ("line_items", line_items)):
+        writer.close()
+        tables[name] = writer.rows
+
+    manifest = {"reports": rows, "seed": seed, "chunk_rows": chunk_rows, "tables": tables}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Generated {tables}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic Concur input tables.")
+    parser.add_argument("size", help=f"report rows, e.g. 20000, 760k or one of {', '.join(SIZES)}")
+    parser.add_argument("data_dir", help="folder to write the columnar tables into")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_dataset(args.data_dir, parse_size(args.size), seed=args.seed)
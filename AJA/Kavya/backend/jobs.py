@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from main_orchestrator import INSIGHTS, insight_params, resolve_insights, run_selected_insights
+from Modules.sidecar import read_meta
+from Modules.store import ensure_columnar, table_fingerprint, table_rows
+
+# Jobs allowed to run at once. Jobs write into the same Output folder, so by default they queue up.
+JOB_THREADS = int(os.environ.get("INSIGHT_JOB_THREADS", "1"))
+
+# Finished jobs kept around for status polling before the oldest are dropped
+MAX_FINISHED_JOBS = 100
+
+
+class JobManager:
+    """
+    Runs insight generation in the background and keeps per-insight progress
+    for polling. A submission with the same insights, parameters and input
+    files as a queued or running job is attached to that job instead of
+    starting a second run.
+    """
+
+    def __init__(self, data_dir, output_dir, threads=JOB_THREADS):
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="insight-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}  # coalescing key -> job id of a queued/running job
+
+    def job_key(self, insight_ids, params):
+        tables = sorted({name for insight_id in insight_ids for name in INSIGHTS[insight_id]["inputs"]})
+        key = {
+            "insights": sorted(insight_ids),
+            "params": {insight_id: insight_params(insight_id, params) for insight_id in insight_ids},
+            "inputs": {name: table_fingerprint(self.data_dir, name) for name in tables},
+        }
+        return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    def submit(self, selected_insights, params=None):
+        """
+        Queues a generation job and returns (job, coalesced). Raises ValueError
+        when none of the selected insights is known.
+        """
+        insight_ids = resolve_insights(selected_insights)
+        if not insight_ids:
+            raise ValueError("No known insights selected.")
+        key = self.job_key(insight_ids, params)
+
+        with self._lock:
+            job_id = self._active.get(key)
+            if job_id is not None:
+                return self._snapshot(self._jobs[job_id]), True
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": "queued",
+                "selected": list(selected_insights),
+                "params": params or {},
+                "insights": {insight_id: {"state": "queued", "elapsed": None, "rows_in": None,
+                                           "rows_out": None, "cached": False, "error": None}
+                             for insight_id in insight_ids},
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+                "key": key,
+            }
+            self._jobs[job["job_id"]] = job
+            self._active[key] = job["job_id"]
+            self._prune()
+            snapshot = self._snapshot(job)
+
+        self._executor.submit(self._run, job)
+        return snapshot, False
+
+    def _run(self, job):
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = time.time()
+        try:
+            # Input sizes come from the Parquet footers, so every insight shows its row count while still queued
+            for insight_id in job["insights"]:
+                try:
+                    rows = 0
+                    for name in INSIGHTS[insight_id]["inputs"]:
+                        ensure_columnar(self.data_dir, name)
+                        rows += table_rows(self.data_dir, name) or 0
+                except Exception:
+                    # A table that cannot be read fails its insights in the run itself
+                    rows = None
+                with self._lock:
+                    job["insights"][insight_id]["rows_in"] = rows
+
+            run_selected_insights(job["selected"], self.data_dir, self.output_dir, params=job["params"],
+                                  on_update=lambda insight_id, result: self._update(job, insight_id, result))
+            final = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job["error"] = str(e)
+            final = "failed"
+
+        with self._lock:
+            for state in job["insights"].values():
+                if state["state"] in ("queued", "running"):
+                    state["state"] = "failed"
+                    state["error"] = state["error"] or job["error"]
+            job["status"] = final
+            job["finished_at"] = time.time()
+            if self._active.get(job["key"]) == job["job_id"]:
+                del self._active[job["key"]]
+
+    def _update(self, job, insight_id, result):
+        with self._lock:
+            state = job["insights"][insight_id]
+            state["state"] = result["status"]
+            if "elapsed" in result:
+                state["elapsed"] = result["elapsed"]
+            state["cached"] = result.get("cached", False)
+            if result["status"] == "done":
+                state["rows_out"] = self._rows_out(insight_id)
+            if result.get("error"):
+                state["error"] = result["error"]
+
+    def _rows_out(self, insight_id):
+        # Exception rows of the primary sheet of each workbook, as recorded in the meta files
+        rows = 0
+        for name in INSIGHTS[insight_id]["outputs"]:
+            meta = read_meta(os.path.join(self.output_dir, name))
+            if meta is None or not meta["sheets"]:
+                return None
+            rows += meta["sheets"][0]["rows"]
+        return rows
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job["finished_at"] is not None]
+        finished.sort(key=lambda job: job["finished_at"])
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job["job_id"]]
+
+    def _snapshot(self, job):
+        now = time.time()
+        snapshot = {k: v for k, v in job.items() if k not in ("key", "params", "insights")}
+        snapshot["insights"] = {insight_id: dict(state) for insight_id, state in job["insights"].items()}
+        end = job["finished_at"] or now
+        snapshot["elapsed"] = round(end - job["started_at"], 3) if job["started_at"] else 0.0
+        return snapshot
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def progress(self, job_id):
+        """
+        Compact view for polling: counts per state and percent complete
+        alongside the per-insight states.
+        """
+        job = self.status(job_id)
+        if job is None:
+            return None
+        states = [state["state"] for state in job["insights"].values()]
+        counts = {name: states.count(name) for name in ("queued", "running", "done", "failed")}
+        finished = counts["done"] + counts["failed"]
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "elapsed": job["elapsed"],
+            "total": len(states),
+            "counts": counts,
+            "percent": round(100.0 * finished / len(states), 1) if states else 100.0,
+            "insights": job["insights"],
+        }
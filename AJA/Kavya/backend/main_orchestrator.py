@@ -1,4 +1,10 @@
 import os
+import glob
+import json
+import time
+import inspect
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 from Modules.PJPA27 import generate_notice_period_insight_updated
 from Modules.PJPA28 import generate_benfords_law_insight
@@ -13,98 +19,297 @@ from Modules.PJPA36 import generate_pjpa36_missing_days
 from Modules.PJPA38 import generate_odd_travels_insight
 from Modules.PJPA39 import generate_active_with_sep_date_insight
 from Modules.PJPA40 import generate_transaction_date_anomaly_insight
+from Modules.PJPA41 import generate_overlapping_trips_insight
+from Modules.PJPA42 import generate_reconciliation_insight
+from Modules.PJPA43 import generate_near_duplicate_insight
+from Modules.aggregates import ensure_aggregate
+from Modules.dataset import DatasetContext
+from Modules.profiling import METRICS, capture, peak_rss_bytes
+from Modules.risk_rules import DEFAULT_RULES, load_rules
+from Modules.sidecar import sidecar_files
+from Modules.store import ensure_arrow, ensure_columnar
+from result_cache import ResultCache, cache_key
 
-def run_selected_insights(selected_insights):
-    print(f"Initializing Backend for specific modules: {selected_insights}")
-    
-    data_dir = r"Data"
-    output_dir = r"Output"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # We simplified the filenames so Pandas always knows they are Excel files!
-    concur_file = os.path.join(data_dir, "Concur_Header_Data.xlsx")
-    left_emp_file = os.path.join(data_dir, "Left_Employees.xlsx")
-    emp_master_file = os.path.join(data_dir, "Employee_Master.xlsx")
-    line_item_file = os.path.join(data_dir, "Line_Item_Data.xlsx")
-
-    if "PJPA27" in selected_insights:
-        try:
-            out_27 = os.path.join(output_dir, "PJPA27_Generated.xlsx")
-            generate_notice_period_insight_updated(concur_file, left_emp_file, out_27)
-        except Exception as e: print(f"Error PJPA27: {e}")
+# Insight id -> generator, the input tables it takes (in call order), its output files, the shared
+# aggregates it queries (see Modules/aggregates.py) and fixed parameters.
+# Every generator is called as func(*input_tables, *output_paths, **aggregates, **params).
+INSIGHTS = {
+    "PJPA27": {"func": generate_notice_period_insight_updated, "inputs": ["concur", "left_employees"],
+               "outputs": ["PJPA27_Generated.xlsx"]},
+    "PJPA28": {"func": generate_benfords_law_insight, "inputs": ["concur"],
+               "outputs": ["PJPA28_Generated.xlsx"]},
+    "PJPA29": {"func": generate_new_joiner_insight, "inputs": ["concur", "emp_master"],
+               "outputs": ["PJPA29_Generated.xlsx"]},
+    "PJPA30": {"func": generate_short_trip_abuse_insight, "inputs": ["concur"],
+               "outputs": ["PJPA30_Generated.xlsx"]},
+    "PJPA31": {"func": generate_structural_splitting_insight, "inputs": ["concur", "line_items"],
+               "outputs": ["PJPA31_Generated.xlsx"], "aggregates": ["daily_submissions"]},
+    "PJPA32": {"func": generate_holiday_weekend_travel_insight, "inputs": ["line_items"],
+               "outputs": ["PJPA32_Holiday_Generated.xlsx", "PJPA32_Weekend_Generated.xlsx"]},
+    "PJPA33": {"func": generate_bulk_booker_insight, "inputs": ["concur"],
+               "outputs": ["PJPA33_Generated.xlsx"], "aggregates": ["daily_submissions"],
+               "params": {"bulk_threshold": 6}},
+    "PJPA34": {"func": generate_low_value_claims_insight, "inputs": ["concur"],
+               "outputs": ["PJPA34_Generated.xlsx"], "params": {"amount_threshold": 1000, "freq_threshold": 10}},
+    "PJPA35": {"func": generate_duplicate_report_id_insight, "inputs": ["concur"],
+               "outputs": ["PJPA35_Generated.xlsx"]},
+    "PJPA36": {"func": generate_pjpa36_missing_days, "inputs": ["concur"],
+               "outputs": ["PJPA36_Generated.xlsx"]},
+    "PJPA38": {"func": generate_odd_travels_insight, "inputs": ["line_items"],
+               "outputs": ["PJPA38_Generated.xlsx"], "params": {"rare_threshold_pct": 5}},
+    # Notice this one ONLY requires the Employee Master file!
+    "PJPA39": {"func": generate_active_with_sep_date_insight, "inputs": ["emp_master"],
+               "outputs": ["PJPA39_Generated.xlsx"]},
+    "PJPA40": {"func": generate_transaction_date_anomaly_insight, "inputs": ["concur", "line_items"],
+               "outputs": ["PJPA40_Generated.xlsx"]},
+    "PJPA41": {"func": generate_overlapping_trips_insight, "inputs": ["concur"],
+               "outputs": ["PJPA41_Generated.xlsx"], "params": {"min_overlap_days": 1}},
+    "PJPA42": {"func": generate_reconciliation_insight, "inputs": ["concur", "line_items"],
+               "outputs": ["PJPA42_Generated.xlsx"], "params": {"tolerance": 1.0}},
+    "PJPA43": {"func": generate_near_duplicate_insight, "inputs": ["line_items"],
+               "outputs": ["PJPA43_Generated.xlsx"],
+               "params": {"amount_rounding": 1.0, "window_days": 3, "min_score": 70, "max_block_lines": 5,
+                          "same_report": False}},
+}
 
-    if "PJPA28" in selected_insights:
-        try:
-            out_28 = os.path.join(output_dir, "PJPA28_Generated.xlsx")
-            generate_benfords_law_insight(concur_file, out_28)
-        except Exception as e: print(f"Error PJPA28: {e}")
+# UI treats Holiday and Weekend as separate toggles, but they run from the same file
+UI_ALIASES = {"PJPA32_HOL": "PJPA32", "PJPA32_WE": "PJPA32"}
 
-    if "PJPA29" in selected_insights:
-        try:
-            out_29 = os.path.join(output_dir, "PJPA29_Generated.xlsx")
-            generate_new_joiner_insight(concur_file, emp_master_file, out_29)
-        except Exception as e: print(f"Error PJPA29: {e}")
+# Written to the output folder after every run with the per-insight, per-stage timings
+RUN_REPORT = "run_report.json"
 
-    if "PJPA30" in selected_insights:
-        try:
-            out_30 = os.path.join(output_dir, "PJPA30_Generated.xlsx")
-            generate_short_trip_abuse_insight(concur_file, out_30)
-        except Exception as e: print(f"Error PJPA30: {e}")
+# Worker processes used when a run selects several insights; 1 keeps the original in-process behaviour
+DEFAULT_WORKERS = int(os.environ.get("INSIGHT_WORKERS", "1"))
 
-    if "PJPA31" in selected_insights:
-        try:
-            out_31 = os.path.join(output_dir, "PJPA31_Generated.xlsx")
-            generate_structural_splitting_insight(concur_file, line_item_file, out_31)
-        except Exception as e: print(f"Error PJPA31: {e}")
 
-    # UI treats Holiday and Weekend as separate toggles, but they run from the same file
-    if "PJPA32_HOL" in selected_insights or "PJPA32_WE" in selected_insights:
-        try:
-            out_32_hol = os.path.join(output_dir, "PJPA32_Holiday_Generated.xlsx")
-            out_32_week = os.path.join(output_dir, "PJPA32_Weekend_Generated.xlsx")
-            generate_holiday_weekend_travel_insight(line_item_file, out_32_hol, out_32_week)
-        except Exception as e: print(f"Error PJPA32: {e}")
+def resolve_insights(selected_insights):
+    resolved = []
+    for insight_id in selected_insights:
+        insight_id = UI_ALIASES.get(insight_id, insight_id)
+        if insight_id in INSIGHTS and insight_id not in resolved:
+            resolved.append(insight_id)
+    return resolved
 
-    if "PJPA33" in selected_insights:
-        try:
-            out_33 = os.path.join(output_dir, "PJPA33_Generated.xlsx")
-            generate_bulk_booker_insight(concur_file, out_33, bulk_threshold=6)
-        except Exception as e: print(f"Error PJPA33: {e}")
 
-    if "PJPA34" in selected_insights:
-        try:
-            out_34 = os.path.join(output_dir, "PJPA34_Generated.xlsx")
-            generate_low_value_claims_insight(concur_file, out_34, amount_threshold=1000, freq_threshold=10)
-        except Exception as e: print(f"Error PJPA34: {e}")
+def insight_params(insight_id, overrides=None, data_dir=None):
+    """
+    The parameters an insight runs with: registry defaults, then (given the
+    data folder) the engagement's risk rules for insights that have them,
+    then per-run overrides.
+    """
+    params = dict(INSIGHTS[insight_id].get("params", {}))
+    if data_dir is not None and insight_id in DEFAULT_RULES:
+        params["risk_rules"] = load_rules(data_dir, insight_id)
+    params.update((overrides or {}).get(insight_id, {}))
+    return params
 
-    if "PJPA35" in selected_insights:
-        try:
-            out_35 = os.path.join(output_dir, "PJPA35_Generated.xlsx")
-            generate_duplicate_report_id_insight(concur_file, out_35)
-        except Exception as e: print(f"Error PJPA35: {e}")
-    if "PJPA36" in selected_insights:
-        try:
-            out_36 = os.path.join(output_dir, "PJPA36_Generated.xlsx")
-            generate_pjpa36_missing_days(concur_file, out_36)
-        except Exception as e: print(f"Error PJPA36: {e}")
-    
-    if "PJPA38" in selected_insights:
+
+def input_columns(insight_id):
+    """{table: columns the insight reads} as declared by its module (INPUT_COLUMNS); undeclared tables are read whole."""
+    return getattr(inspect.getmodule(INSIGHTS[insight_id]["func"]), "INPUT_COLUMNS", {})
+
+
+def input_filters(insight_id):
+    """{table: [(column, op, value), ...]} from the module's INPUT_FILTERS; rows failing them never reach its output."""
+    return getattr(inspect.getmodule(INSIGHTS[insight_id]["func"]), "INPUT_FILTERS", {})
+
+
+def required_columns(insight_ids):
+    """Per table, the union of the columns the given insights read, or None when one of them reads it whole."""
+    required = {}
+    for insight_id in insight_ids:
+        declared = input_columns(insight_id)
+        for name in INSIGHTS[insight_id]["inputs"]:
+            if declared.get(name) is None:
+                required[name] = None
+            elif required.get(name, ()) is not None:
+                required[name] = set(required.get(name, ())) | set(declared[name])
+    return required
+
+
+def output_paths(insight_id, output_dir):
+    return [os.path.join(output_dir, name) for name in INSIGHTS[insight_id]["outputs"]]
+
+
+def result_files(insight_id, output_dir):
+    # Workbooks plus the columnar tables and meta files written next to them
+    return [path for output in output_paths(insight_id, output_dir) for path in sidecar_files(output)]
+
+
+def insight_cache_key(insight_id, data_dir, params=None):
+    """
+    Cache key of one insight's result, or None when an input table is missing
+    (the run itself then reports the failure). The shared helper modules are
+    part of the key, since they shape every insight's output.
+    """
+    spec = INSIGHTS[insight_id]
+    modules_dir = os.path.dirname(inspect.getsourcefile(spec["func"]))
+    code_files = [inspect.getsourcefile(spec["func"])]
+    code_files += sorted(p for p in glob.glob(os.path.join(modules_dir, "*.py"))
+                         if not os.path.basename(p).startswith("PJPA"))
+    try:
+        input_files = [ensure_columnar(data_dir, name) for name in spec["inputs"]]
+        if not all(os.path.exists(path) for path in input_files):
+            return None
+        return cache_key(code_files, input_files, insight_params(insight_id, params, data_dir))
+    except Exception as e:
+        print(f"Could not fingerprint inputs of {insight_id}: {e}")
+        return None
+
+
+def run_insight(insight_id, data, output_dir, params=None):
+    """
+    Runs one insight against a DatasetContext. Failures are caught and
+    reported here so one broken insight never stops the rest of the run.
+    params: per-insight overrides of the registry parameters, {insight_id: {...}}.
+    """
+    spec = INSIGHTS[insight_id]
+    start = time.time()
+    cpu_start = time.process_time()
+    result = {"insight": insight_id}
+    with capture() as stages:
         try:
-            out_38 = os.path.join(output_dir, "PJPA38_Generated.xlsx")
-            generate_odd_travels_insight(line_item_file, out_38, rare_threshold_pct=5)
-        except Exception as e: print(f"Error PJPA38: {e}")
-        
-    if "PJPA39" in selected_insights:
+            # Each insight only gets the columns and rows it declared
+            columns, filters = input_columns(insight_id), input_filters(insight_id)
+            tables = [data.table(name, columns.get(name), filters.get(name)) for name in spec["inputs"]]
+            aggregates = {name: data.aggregate(name) for name in spec.get("aggregates", [])}
+            outputs = output_paths(insight_id, output_dir)
+            spec["func"](*tables, *outputs, **aggregates, **insight_params(insight_id, params, data.data_dir))
+            result["status"] = "done"
+        except Exception as e:
+            print(f"Error {insight_id}: {e}")
+            result.update(status="failed", error=str(e))
+    result["elapsed"] = round(time.time() - start, 3)
+    result["cpu_seconds"] = round(time.process_time() - cpu_start, 3)
+    result["peak_rss_bytes"] = peak_rss_bytes()
+    result["stages"] = stages
+    return result
+
+
+# Per-process dataset for pool workers, set up once by the pool initializer
+_worker_data = None
+
+
+def _init_worker(data_dir):
+    global _worker_data
+    _worker_data = DatasetContext(data_dir, memory_map=True)
+
+
+def _run_in_worker(insight_id, output_dir, params):
+    return run_insight(insight_id, _worker_data, output_dir, params)
+
+
+def _run_parallel(insight_ids, data_dir, output_dir, workers, params, on_update):
+    # Materialize the memory-mappable copies and shared aggregates up front so workers never race to build them.
+    # A missing table is left for the insights that need it to fail on individually.
+    for name in sorted({name for insight_id in insight_ids for name in INSIGHTS[insight_id]["inputs"]}):
         try:
-            out_39 = os.path.join(output_dir, "PJPA39_Generated.xlsx")
-            # Notice this one ONLY requires the Employee Master file!
-            generate_active_with_sep_date_insight(emp_master_file, out_39)
-        except Exception as e: print(f"Error PJPA39: {e}")
-        
-    if "PJPA40" in selected_insights:
+            ensure_arrow(data_dir, name)
+        except Exception as e:
+            print(f"Could not prepare {name}: {e}")
+    for name in sorted({name for insight_id in insight_ids for name in INSIGHTS[insight_id].get("aggregates", [])}):
         try:
-            out_40 = os.path.join(output_dir, "PJPA40_Generated.xlsx")
-            generate_transaction_date_anomaly_insight(concur_file, line_item_file, out_40)
-        except Exception as e: print(f"Error PJPA40: {e}")
+            ensure_aggregate(data_dir, name)
+        except Exception as e:
+            print(f"Could not prepare {name}: {e}")
+
+    results = {}
+    pending = list(insight_ids)
+    # spawn rather than fork: the Flask server is multi-threaded and forking it is not safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(data_dir,)) as pool:
+        running = {}
+        while pending or running:
+            # Only keep as many insights in flight as there are workers, so 'running' is reported truthfully
+            while pending and len(running) < workers:
+                insight_id = pending.pop(0)
+                running[pool.submit(_run_in_worker, insight_id, output_dir, params)] = insight_id
+                on_update(insight_id, {"insight": insight_id, "status": "running"})
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                insight_id = running.pop(future)
+                try:
+                    results[insight_id] = future.result()
+                except Exception as e:
+                    # The worker process itself died (e.g. out of memory)
+                    print(f"Error {insight_id}: {e}")
+                    results[insight_id] = {"insight": insight_id, "status": "failed", "error": str(e)}
+                on_update(insight_id, results[insight_id])
+    return results
+
+
+def write_run_report(results, output_dir, started, workers):
+    report = {
+        "started_at": started,
+        "finished_at": time.time(),
+        "elapsed": round(time.time() - started, 3),
+        "workers": workers,
+        "insights": results,
+    }
+    path = os.path.join(output_dir, RUN_REPORT)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    os.replace(path + ".tmp", path)
+
+
+def _ignore_update(insight_id, result):
+    pass
+
+
+def run_selected_insights(selected_insights, data_dir=r"Data", output_dir=r"Output", workers=None,
+                          params=None, on_update=None):
+    """
+    Runs the selected insights and returns {insight_id: result}.
+    workers: size of the process pool; defaults to INSIGHT_WORKERS. With more
+    than one worker, independent insights run side by side, so a full run
+    takes about as long as the slowest insight.
+    params: per-insight parameter overrides, e.g. {"PJPA33": {"bulk_threshold": 5}}.
+    on_update: called as on_update(insight_id, result) when an insight starts
+    ('running') and when it finishes ('done' / 'failed').
+    Results already in Output/.cache for the same inputs, code and parameters
+    are restored instead of recomputed (result["cached"] is then True).
+    Every computed result carries its stage timings under result["stages"].
+    """
+    print(f"Initializing Backend for specific modules: {selected_insights}")
+
+    started = time.time()
+    os.makedirs(output_dir, exist_ok=True)
+    on_update = on_update or _ignore_update
+
+    # Results whose inputs, code and parameters are unchanged are copied back from the cache instead of recomputed
+    cache = ResultCache(os.path.join(output_dir, ".cache"))
+    results, keys, insight_ids = {}, {}, []
+    for insight_id in resolve_insights(selected_insights):
+        start = time.time()
+        keys[insight_id] = insight_cache_key(insight_id, data_dir, params) if cache.enabled else None
+        if keys[insight_id] and cache.restore(keys[insight_id], output_dir, INSIGHTS[insight_id]["outputs"]):
+            print(f"{insight_id}: inputs unchanged, restored cached result.")
+            results[insight_id] = {"insight": insight_id, "status": "done", "cached": True,
+                                   "elapsed": round(time.time() - start, 3)}
+            on_update(insight_id, results[insight_id])
+        else:
+            insight_ids.append(insight_id)
+
+    workers = min(workers or DEFAULT_WORKERS, len(insight_ids))
+    if workers > 1:
+        results.update(_run_parallel(insight_ids, data_dir, output_dir, workers, params, on_update))
+    else:
+        # Every table is read at most once per run and shared by all selected modules.
+        # Tables are loaded lazily, so a run that only needs the Employee Master never touches the others.
+        data = DatasetContext(data_dir, columns=required_columns(insight_ids))
+        for insight_id in insight_ids:
+            on_update(insight_id, {"insight": insight_id, "status": "running"})
+            results[insight_id] = run_insight(insight_id, data, output_dir, params)
+            on_update(insight_id, results[insight_id])
+
+    for insight_id in insight_ids:
+        if keys[insight_id] and results[insight_id]["status"] == "done":
+            cache.store(keys[insight_id], result_files(insight_id, output_dir))
+    cache.evict()
+
+    # Per-stage timings go to /api/metrics and to a run report next to the outputs
+    METRICS.record(results)
+    write_run_report(results, output_dir, started, workers)
 
-    print("\nSelected backend processing finished successfully!")
\ No newline at end of file
+    print("\nSelected backend processing finished successfully!")
+    return results
@@ -0,0 +1,91 @@
+import gzip
+import json
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+COLUMNAR_MIME = "application/vnd.jk.columnar+json"
+JSON_MIME = "application/json"
+
+# ?format= values, which take precedence over the Accept header
+FORMATS = {"records": JSON_MIME, "columnar": COLUMNAR_MIME, "arrow": ARROW_MIME}
+
+# Bodies smaller than this are sent uncompressed; compressing them costs more than it saves
+MIN_COMPRESS_BYTES = 1024
+
+# A string column is dictionary-encoded when it has at most this share of distinct values
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def negotiate(accept, format_arg=None):
+    """Picks 'records' (default), 'columnar' or 'arrow' from ?format= or the Accept header."""
+    if format_arg:
+        if format_arg not in FORMATS:
+            raise ValueError(f"Unknown format '{format_arg}'. Use one of: {', '.join(FORMATS)}.")
+        return format_arg
+    accept = (accept or '').lower()
+    if ARROW_MIME in accept:
+        return "arrow"
+    if COLUMNAR_MIME in accept:
+        return "columnar"
+    return "records"
+
+
+def _column_values(column):
+    if pa.types.is_timestamp(column.type):
+        # Whole seconds; Arrow would otherwise print nanosecond fractions
+        return pc.strftime(column.cast(pa.timestamp('s'), safe=False), format="%Y-%m-%dT%H:%M:%S").to_pylist()
+    if pa.types.is_date(column.type):
+        return pc.strftime(column, format="%Y-%m-%d").to_pylist()
+    if pa.types.is_floating(column.type):
+        # NaN is not valid JSON
+        return pc.if_else(pc.is_nan(column), None, column).to_pylist()
+    if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+        return column.to_pylist()
+
+    encoded = pc.dictionary_encode(column.combine_chunks())
+    if len(encoded.dictionary) > DICTIONARY_MAX_RATIO * max(len(column), 1):
+        return column.to_pylist()
+    return {"dictionary": encoded.dictionary.to_pylist(), "indices": encoded.indices.to_pylist()}
+
+
+def columnar(table):
+    """
+    Column-oriented JSON body of an Arrow table: each column is a plain list,
+    or {"dictionary": [...], "indices": [...]} for repetitive strings, so
+    column names and repeated values are sent once. Nulls stay null.
+    """
+    return {
+        "format": "columnar",
+        "num_rows": table.num_rows,
+        "columns": table.column_names,
+        "data": {name: _column_values(table[name]) for name in table.column_names},
+    }
+
+
+def arrow_ipc(table, metadata=None):
+    """Arrow IPC stream of a table; metadata is attached to the schema as JSON values."""
+    if metadata:
+        table = table.replace_schema_metadata({k: json.dumps(v, default=str) for k, v in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def compress(body, accept_encoding):
+    """Returns (body, content_encoding), preferring brotli when the client and server both support it."""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=5), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
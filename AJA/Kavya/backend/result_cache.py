@@ -0,0 +1,112 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+# Upper bound on the total size of cached results; least recently used entries are dropped beyond it.
+# 0 turns the cache off.
+CACHE_MAX_BYTES = int(os.environ.get("INSIGHT_CACHE_BYTES", str(2 * 1024 ** 3)))
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+# path -> (size, mtime_ns, digest); a file is only re-hashed once it changes on disk
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def file_hash(path):
+    stat = os.stat(path)
+    with _hash_lock:
+        memo = _hash_memo.get(path)
+    if memo and memo[:2] == (stat.st_size, stat.st_mtime_ns):
+        return memo[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    with _hash_lock:
+        _hash_memo[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def cache_key(code_files, input_files, params):
+    """
+    Content address of one insight result: the bytes of its input tables,
+    the source of the code that computes it and its parameters. Re-uploading
+    identical data or touching a file therefore still hits the cache.
+    """
+    key = {
+        "code": {os.path.basename(path): file_hash(path) for path in code_files},
+        "inputs": [file_hash(path) for path in input_files],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+class ResultCache:
+    """
+    Generated output files stored under <root>/<key>/, one directory per
+    insight result. Entries are written to a temp directory and renamed into
+    place, so a reader never sees a half-stored result.
+    """
+
+    def __init__(self, root, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def restore(self, key, output_dir, required_names):
+        """
+        Copies every file of a cached result into output_dir. Returns False on
+        a miss, i.e. when the entry lacks any of required_names.
+        """
+        entry = os.path.join(self.root, key)
+        if not self.enabled or not all(os.path.exists(os.path.join(entry, name)) for name in required_names):
+            return False
+        for name in os.listdir(entry):
+            shutil.copyfile(os.path.join(entry, name), os.path.join(output_dir, name))
+        # The entry directory's mtime doubles as its last-used time for eviction
+        os.utime(entry)
+        return True
+
+    def store(self, key, output_paths):
+        if not self.enabled or not all(os.path.exists(p) for p in output_paths):
+            return
+        entry = os.path.join(self.root, key)
+        if os.path.exists(entry):
+            os.utime(entry)
+            return
+        tmp_entry = f"{entry}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.makedirs(tmp_entry)
+            for path in output_paths:
+                shutil.copyfile(path, os.path.join(tmp_entry, os.path.basename(path)))
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # Another run stored the same result first, or the disk is full; neither is worth failing over
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    def evict(self):
+        if not os.path.isdir(self.root):
+            return
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path) and ".tmp-" not in name:
+                entries.append((os.path.getmtime(path), _dir_size(path), path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            print(f"Evicting cached result {os.path.basename(path)} ({size} bytes)")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,136 @@
+import os
+from collections import OrderedDict
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Result tables kept in memory between requests, so paging through a large
+# table reads its Parquet file once instead of on every page
+TABLE_CACHE_SIZE = 8
+
+# filter=<column>:<op>:<value>. 'in' takes values separated by '|'; 'null' and 'notnull' take none.
+COMPARISONS = {"eq": pc.equal, "ne": pc.not_equal, "lt": pc.less, "le": pc.less_equal,
+               "gt": pc.greater, "ge": pc.greater_equal}
+FILTER_OPS = set(COMPARISONS) | {"contains", "in", "null", "notnull"}
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def load_result(path):
+    """Reads a result table, reusing the in-memory copy while the file is unchanged."""
+    key = (path, os.stat(path).st_mtime_ns)
+    with _tables_lock:
+        if key in _tables:
+            _tables.move_to_end(key)
+            return _tables[key]
+    table = pq.read_table(path, memory_map=True)
+    with _tables_lock:
+        _tables[key] = table
+        while len(_tables) > TABLE_CACHE_SIZE:
+            _tables.popitem(last=False)
+    return table
+
+
+def _int_arg(args, name, minimum):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer.")
+    if value < minimum:
+        raise ValueError(f"'{name}' must be at least {minimum}.")
+    return value
+
+
+def parse_query(args):
+    """
+    Reads the table query from request arguments:
+    page/page_size or offset/limit, columns=a,b (projection),
+    sort=a,-b (descending with '-') and repeated filter=<column>:<op>:<value>.
+    Without page or limit arguments the whole table is returned.
+    """
+    page = _int_arg(args, 'page', 1)
+    page_size = _int_arg(args, 'page_size', 1)
+    offset = _int_arg(args, 'offset', 0)
+    limit = _int_arg(args, 'limit', 0)
+    if page is not None or page_size is not None:
+        page_size = page_size or 100
+        offset, limit = ((page or 1) - 1) * page_size, page_size
+
+    columns = [c.strip() for c in args.get('columns', '').split(',') if c.strip()] or None
+
+    sort = []
+    for key in args.get('sort', '').split(','):
+        key = key.strip()
+        if key:
+            sort.append((key[1:], "descending") if key.startswith('-') else (key, "ascending"))
+
+    filters = []
+    for spec in args.getlist('filter'):
+        parts = spec.split(':', 2)
+        if len(parts) < 2 or parts[1] not in FILTER_OPS:
+            raise ValueError(f"Invalid filter '{spec}'. Use <column>:<op>:<value> with op in {sorted(FILTER_OPS)}.")
+        filters.append((parts[0], parts[1], parts[2] if len(parts) > 2 else ''))
+
+    return {"offset": offset or 0, "limit": limit, "columns": columns, "sort": sort, "filters": filters}
+
+
+def _scalar(value, arrow_type):
+    # Query values arrive as text; compare them in the column's own type
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return pa.scalar(pd.Timestamp(value), type=pa.timestamp('ns')).cast(arrow_type)
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        return pa.scalar(float(value)).cast(pa.float64())
+    if pa.types.is_boolean(arrow_type):
+        return pa.scalar(value.lower() in ('1', 'true', 'yes'))
+    return pa.scalar(value)
+
+
+def _mask(column, op, value):
+    if op == "null":
+        return column.is_null()
+    if op == "notnull":
+        return column.is_valid()
+    if op == "contains":
+        return pc.match_substring(column.cast(pa.string()), value, ignore_case=True)
+    if op == "in":
+        values = [_scalar(v, column.type) for v in value.split('|')]
+        return pc.is_in(column, value_set=pa.array([v.as_py() for v in values], type=values[0].type))
+    return COMPARISONS[op](column, _scalar(value, column.type))
+
+
+def query_table(table, query):
+    """
+    Applies a parsed query to an Arrow table. Returns (page, total) where
+    total is the row count after filtering and before paging.
+    """
+    names = set(table.column_names)
+    referenced = [c for c, _, _ in query["filters"]] + [c for c, _ in query["sort"]] + (query["columns"] or [])
+    unknown = [c for c in referenced if c not in names]
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+
+    try:
+        for column, op, value in query["filters"]:
+            table = table.filter(pc.fill_null(_mask(table[column], op, value), False))
+    except (ValueError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Invalid filter value: {e}")
+    total = table.num_rows
+
+    stop = total if query["limit"] is None else min(total, query["offset"] + query["limit"])
+    if query["sort"]:
+        # Nulls sort last; only the rows of the requested page are gathered after sorting
+        indices = pc.sort_indices(table, sort_keys=query["sort"])
+        table = table.take(indices[query["offset"]:stop])
+    else:
+        table = table.slice(query["offset"], max(0, stop - query["offset"]))
+
+    if query["columns"]:
+        table = table.select(query["columns"])
+    return table, total
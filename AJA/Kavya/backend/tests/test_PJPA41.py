@@ -0,0 +1,58 @@
+import pandas as pd
+
+from Modules.PJPA41 import generate_overlapping_trips_insight
+
+
+def _result(path):
+    # Row 5 of the sheet holds the column names, below the insight meta-headers
+    return pd.read_excel(path, skiprows=4)
+
+
+def _trips(rows):
+    df = pd.DataFrame(rows, columns=['Employee ID', 'Employee Name', 'Report Id', 'Report Start Date', 'Report End Date'])
+    df['Report Start Date'] = pd.to_datetime(df['Report Start Date'])
+    df['Report End Date'] = pd.to_datetime(df['Report End Date'])
+    return df
+
+
+def _overlaps(tmp_path, rows, **params):
+    path = str(tmp_path / "PJPA41_Generated.xlsx")
+    generate_overlapping_trips_insight(_trips(rows), path, **params)
+    return _result(path)
+
+
+def test_trips_sharing_one_day_overlap_and_adjacent_trips_do_not(tmp_path):
+    result = _overlaps(tmp_path, [
+        ('E1', 'A', 'R1', '2025-01-01', '2025-01-03'),
+        ('E1', 'A', 'R2', '2025-01-03', '2025-01-05'),
+        ('E1', 'A', 'R3', '2025-01-06', '2025-01-07'),
+    ])
+    assert list(zip(result['Report Id'], result['Report Id (Right)'])) == [('R1', 'R2')]
+    assert result['Overlapping Days'].tolist() == [1]
+
+
+def test_nested_trip_and_minimum_overlap(tmp_path):
+    rows = [('E1', 'A', 'R1', '2025-01-01', '2025-01-10'), ('E1', 'A', 'R2', '2025-01-04', '2025-01-05'),
+            ('E1', 'A', 'R3', '2025-01-10', None)]
+    result = _overlaps(tmp_path, rows)
+    assert sorted(zip(result['Report Id'], result['Report Id (Right)'], result['Overlapping Days'])) == [
+        ('R1', 'R2', 2), ('R1', 'R3', 1)]
+    assert _overlaps(tmp_path, rows, min_overlap_days=2)['Report Id (Right)'].tolist() == ['R2']
+
+
+def test_trips_of_unknown_or_different_employees_never_overlap(tmp_path):
+    result = _overlaps(tmp_path, [
+        (None, 'A', 'R1', '2025-01-01', '2025-01-03'),
+        (None, 'B', 'R2', '2025-01-01', '2025-01-03'),
+        ('E1', 'C', 'R3', '2025-01-01', '2025-01-03'),
+        ('E2', 'D', 'R4', '2025-01-01', '2025-01-03'),
+    ])
+    assert result.empty
+
+
+def test_missing_optional_columns(tmp_path):
+    # No Policy, Report Total, ... in the extract: the pair is still reported, those columns blank
+    result = _overlaps(tmp_path, [('E1', 'A', 'R1', '2025-01-01', '2025-01-02'),
+                                  ('E1', 'A', 'R2', '2025-01-02', '2025-01-02')])
+    assert len(result) == 1
+    assert result['Policy'].isna().all()
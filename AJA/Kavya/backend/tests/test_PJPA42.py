@@ -0,0 +1,85 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import Modules.PJPA42 as PJPA42
+from Modules.dataset import iter_table
+from Modules.store import EMPLOYEE_KEY, NULL_KEY, REPORT_KEY
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    # Two line items per batch, so the fold crosses batch boundaries on a few rows
+    monkeypatch.setattr(PJPA42, 'iter_table', functools.partial(iter_table, batch_rows=2))
+
+
+def _header(rows):
+    # (report key, Report Id, Amount Approved, Report Total)
+    df = pd.DataFrame(rows, columns=[REPORT_KEY, 'Report Id', 'Amount Approved', 'Report Total'])
+    df[REPORT_KEY] = df[REPORT_KEY].astype(np.int32)
+    df[EMPLOYEE_KEY] = np.int32(0)
+    df['Employee ID'] = 'E1'
+    return df
+
+
+def _lines(rows):
+    # (report key, Report ID, Report Name, Approved Amount)
+    df = pd.DataFrame(rows, columns=[REPORT_KEY, 'Report ID', 'Report Name', 'Approved Amount'])
+    df[REPORT_KEY] = df[REPORT_KEY].astype(np.int32)
+    df[EMPLOYEE_KEY] = np.int32(0)
+    df['Employee ID'] = 'E1'
+    return df
+
+
+def _reconcile(tmp_path, header, lines, **params):
+    path = str(tmp_path / "PJPA42_Generated.xlsx")
+    PJPA42.generate_reconciliation_insight(header, lines, path, **params)
+    # Row 5 of every sheet holds the column names, below the insight meta-headers
+    return pd.read_excel(path, sheet_name=None, skiprows=4)
+
+
+def test_totals_grow_with_report_keys_across_batches(tmp_path):
+    # Keys 0-1 in the first batch, 5 in the second, and header key 7 beyond every line
+    header = _header([(0, 'R0', 30.0, 30.0), (1, 'R1', 10.0, 10.0), (5, 'R5', 99.0, 99.0), (7, 'R7', 1.0, 1.0)])
+    lines = _lines([(0, 'R0', 'A', 30.0), (1, 'R1', 'B', 10.0), (5, 'R5', 'C', 40.0), (5, 'R5', 'C', 50.0)])
+    sheets = _reconcile(tmp_path, header, lines)
+    mismatch = sheets['Amount Mismatch']
+    assert mismatch['Report Id'].tolist() == ['R5']
+    assert mismatch['Line Item Count'].tolist() == [2]
+    assert mismatch['Line Item Approved Amount'].tolist() == [90.0]
+    assert mismatch['Difference'].tolist() == [-9.0]
+    assert sheets['Reports Without Lines']['Report Id'].tolist() == ['R7']
+    assert sheets['Orphan Line Items'].empty
+
+
+def test_orphan_spanning_two_batches_keeps_its_first_line(tmp_path):
+    header = _header([(0, 'R0', 5.0, 5.0)])
+    lines = _lines([(0, 'R0', 'Header report', 5.0), (3, 'R3', 'First line', 20.0),
+                    (3, 'R3', 'Second line', 15.0), (3, 'R3', 'Third line', 1.0)])
+    orphans = _reconcile(tmp_path, header, lines)['Orphan Line Items']
+    assert orphans['Report ID'].tolist() == ['R3']
+    assert orphans['Report Name'].tolist() == ['First line']
+    assert orphans['Line Item Count'].tolist() == [3]
+    assert orphans['Line Item Approved Amount'].tolist() == [36.0]
+
+
+def test_lines_without_report_id_are_one_orphan_row(tmp_path):
+    header = _header([(0, 'R0', 5.0, 5.0)])
+    lines = _lines([(0, 'R0', 'A', 5.0), (NULL_KEY, None, 'Loose', 7.0), (NULL_KEY, None, 'Loose', 8.0)])
+    orphans = _reconcile(tmp_path, header, lines)['Orphan Line Items']
+    assert len(orphans) == 1
+    assert orphans['Report ID'].isna().all()
+    assert orphans['Line Item Count'].tolist() == [2]
+    assert orphans['Line Item Approved Amount'].tolist() == [15.0]
+
+
+def test_header_amount_fallback_and_non_numeric_amounts(tmp_path):
+    header = _header([(0, 'R0', None, 12.0), (1, 'R1', 'n/a', 'pending'), (2, 'R2', 11.5, 11.5)])
+    lines = _lines([(0, 'R0', 'A', 12.0), (1, 'R1', 'B', 4.0), (2, 'R2', 'C', 11.0)])
+    mismatch = _reconcile(tmp_path, header, lines)['Amount Mismatch']
+    # R0 reconciles on its Report Total and R2 within the tolerance; R1 has nothing to compare with
+    assert mismatch['Report Id'].tolist() == ['R1']
+    assert mismatch['Difference'].isna().all()
+    assert mismatch['Line Item Approved Amount'].tolist() == [4.0]
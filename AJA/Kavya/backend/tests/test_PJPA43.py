@@ -0,0 +1,74 @@
+import pandas as pd
+
+from Modules.PJPA43 import generate_near_duplicate_insight
+
+
+def _result(path):
+    # Row 5 of the sheet holds the column names, below the insight meta-headers
+    return pd.read_excel(path, skiprows=4)
+
+
+def _lines(rows):
+    df = pd.DataFrame(rows, columns=['Employee ID', 'Report ID', 'Transaction Date', 'Approved Amount', 'Expense Type',
+                                     'City/Location'])
+    df['Transaction Date'] = pd.to_datetime(df['Transaction Date'])
+    return df
+
+
+def _duplicates(tmp_path, rows, **params):
+    path = str(tmp_path / "PJPA43_Generated.xlsx")
+    generate_near_duplicate_insight(_lines(rows), path, **params)
+    return _result(path)
+
+
+def test_amounts_either_side_of_a_bucket_edge_are_paired(tmp_path):
+    result = _duplicates(tmp_path, [('E1', 'R1', '2025-01-01', 100.40, 'Hotel', 'Pune'),
+                                    ('E1', 'R2', '2025-01-01', 100.60, 'Hotel', 'Pune')])
+    assert list(zip(result['Report ID'], result['Report ID (Right)'])) == [('R1', 'R2')]
+    assert result['Amount Difference'].tolist() == [0.2]
+
+
+def test_amounts_further_apart_than_the_rounding_unit_are_not_paired(tmp_path):
+    assert _duplicates(tmp_path, [('E1', 'R1', '2025-01-01', 100.10, 'Hotel', 'Pune'),
+                                  ('E1', 'R2', '2025-01-01', 101.20, 'Hotel', 'Pune')], min_score=0).empty
+
+
+def test_date_window_edge(tmp_path):
+    rows = [('E1', 'R1', '2025-01-01', 80.0, 'Taxi', 'Pune'), ('E1', 'R2', '2025-01-04', 80.0, 'Taxi', 'Pune'),
+            ('E2', 'R3', '2025-01-01', 80.0, 'Taxi', 'Pune'), ('E2', 'R4', '2025-01-05', 80.0, 'Taxi', 'Pune')]
+    result = _duplicates(tmp_path, rows, min_score=0)
+    assert list(zip(result['Report ID'], result['Days Apart'])) == [('R1', 3)]
+
+
+def test_recurring_allowance_is_not_paired(tmp_path):
+    per_diem = [('E1', f'R{i // 3}', str(pd.Timestamp('2025-01-01') + pd.Timedelta(days=i))[:10], 500.0, 'Per Diem', 'Pune')
+                for i in range(30)]
+    taxi = [('E1', 'R1', '2025-01-02', 80.0, 'Taxi', 'Pune'), ('E1', 'R7', '2025-01-02', 80.0, 'Taxi', 'Pune')]
+    result = _duplicates(tmp_path, per_diem + taxi, min_score=0)
+    assert result['Expense Type'].tolist() == ['Taxi']
+
+
+def test_same_report_pairs_only_on_request(tmp_path):
+    rows = [('E1', 'R1', '2025-01-01', 80.0, 'Taxi', 'Pune'), ('E1', 'R1', '2025-01-01', 80.0, 'Taxi', 'Pune')]
+    assert _duplicates(tmp_path, rows).empty
+    result = _duplicates(tmp_path, rows, same_report=True)
+    assert result['Same Report'].tolist() == ['Yes']
+    assert result['Match Score'].tolist() == [100]
+
+
+def test_unknown_employees_are_not_paired(tmp_path):
+    assert _duplicates(tmp_path, [(None, 'R1', '2025-01-01', 80.0, 'Taxi', 'Pune'),
+                                  (None, 'R2', '2025-01-01', 80.0, 'Taxi', 'Pune')]).empty
+
+
+def test_amount_claimed_all_year_still_pairs_its_resubmission(tmp_path):
+    # A monthly taxi fare is not a recurring charge within any window: its resubmission is paired
+    monthly = [('E1', f'R{month}', f'2025-{month:02d}-10', 80.0, 'Taxi', 'Pune') for month in range(1, 13)]
+    result = _duplicates(tmp_path, monthly + [('E1', 'R99', '2025-06-11', 80.0, 'Taxi', 'Pune')])
+    assert list(zip(result['Report ID'], result['Report ID (Right)'])) == [('R6', 'R99')]
+
+
+def test_recurring_charge_cutoff_can_be_turned_off(tmp_path):
+    rows = [('E1', f'R{i}', f'2025-01-{i + 1:02d}', 500.0, 'Per Diem', 'Pune') for i in range(7)]
+    assert _duplicates(tmp_path, rows, min_score=0).empty
+    assert len(_duplicates(tmp_path, rows, min_score=0, max_block_lines=None)) == 15
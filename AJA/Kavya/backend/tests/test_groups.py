@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from Modules.groups import flag_groups, flag_known_groups, flag_windows
+from Modules.store import EMPLOYEE_KEY, NULL_KEY, SUBMIT_DAY
+
+
+def _claims(keys, days):
+    return pd.DataFrame({EMPLOYEE_KEY: np.array(keys, dtype=np.int32), SUBMIT_DAY: pd.to_datetime(days),
+                         'Report Total': np.arange(1.0, len(keys) + 1)})
+
+
+def _daily(claims):
+    return claims.groupby([EMPLOYEE_KEY, SUBMIT_DAY]).agg(**{'Count': ('Report Total', 'size')}).reset_index()
+
+
+def _at_least_two(stats):
+    return stats['Count'] >= 2
+
+
+def test_flag_groups_keeps_qualifying_groups_in_group_order():
+    claims = _claims([2, 1, 2, 3, 1], ['2025-01-01'] * 5)
+    flagged = flag_groups(claims, [EMPLOYEE_KEY], _at_least_two, {'Count': ('Report Total', 'size')})
+    assert flagged[EMPLOYEE_KEY].tolist() == [1, 1, 2, 2]
+    assert flagged['Report Total'].tolist() == [2.0, 5.0, 1.0, 3.0]
+    assert flagged['Count'].tolist() == [2, 2, 2, 2]
+
+
+def test_flag_groups_keeps_null_key_as_a_group_and_skips_missing_keys():
+    # The unknown employees are one group, as their missing IDs were one 'nan' group on the ID strings
+    claims = _claims([NULL_KEY, NULL_KEY, 1], ['2025-01-01'] * 3)
+    claims['Employee ID'] = [None, None, 'E1']
+    by_key = flag_groups(claims, [EMPLOYEE_KEY], _at_least_two, {'Count': ('Report Total', 'size')})
+    by_id = flag_groups(claims, ['Employee ID'], lambda s: s['Count'] >= 1, {'Count': ('Report Total', 'size')})
+    assert by_key[EMPLOYEE_KEY].tolist() == [NULL_KEY, NULL_KEY]
+    assert by_key['Count'].tolist() == [2, 2]
+    assert by_id['Employee ID'].tolist() == ['E1']
+
+
+def test_flag_groups_empty_input():
+    flagged = flag_groups(_claims([], []), [EMPLOYEE_KEY], _at_least_two, {'Count': ('Report Total', 'size')})
+    assert flagged.empty
+    assert 'Count' in flagged.columns
+
+
+def test_flag_known_groups_matches_flag_groups():
+    claims = _claims([1, 1, 2, NULL_KEY, NULL_KEY], ['2025-01-01', '2025-01-01', '2025-01-01', '2025-01-02', '2025-01-02'])
+    by = [EMPLOYEE_KEY, SUBMIT_DAY]
+    known = flag_known_groups(claims, by, _daily(claims), _at_least_two)
+    grouped = flag_groups(claims, by, _at_least_two, {'Count': ('Report Total', 'size')})
+    assert known[EMPLOYEE_KEY].tolist() == [NULL_KEY, NULL_KEY, 1, 1]
+    pd.testing.assert_frame_equal(known, grouped, check_dtype=False)
+
+
+def test_flag_known_groups_ignores_keys_missing_from_stats():
+    claims = _claims([1, 1], ['2025-01-01', '2025-01-01'])
+    stats = _daily(_claims([2, 2], ['2025-01-01', '2025-01-01']))
+    assert flag_known_groups(claims, [EMPLOYEE_KEY, SUBMIT_DAY], stats, _at_least_two).empty
+
+
+def test_flag_windows_merges_overlapping_windows_into_one_run():
+    claims = _claims([1, 1, 1, 1], ['2025-01-01', '2025-01-02', '2025-01-03', '2025-01-10'])
+    flagged = flag_windows(claims, [EMPLOYEE_KEY], SUBMIT_DAY, _daily(claims), 2, _at_least_two)
+    assert flagged['Report Total'].tolist() == [1.0, 2.0, 3.0]
+    assert (flagged['Window Start'] == pd.Timestamp('2025-01-01')).all()
+    assert (flagged['Window End'] == pd.Timestamp('2025-01-03')).all()
+    assert flagged['Count'].tolist() == [3, 3, 3]
+
+
+def test_flag_windows_edge_is_window_days_calendar_days():
+    # Two days apart fall in one 3-day window but not in a 2-day one
+    claims = _claims([1, 1], ['2025-01-01', '2025-01-03'])
+    assert flag_windows(claims, [EMPLOYEE_KEY], SUBMIT_DAY, _daily(claims), 2, _at_least_two).empty
+    assert len(flag_windows(claims, [EMPLOYEE_KEY], SUBMIT_DAY, _daily(claims), 3, _at_least_two)) == 2
+
+
+def test_flag_windows_keeps_keys_apart_and_null_key_together():
+    claims = _claims([1, 2, NULL_KEY, NULL_KEY], ['2025-01-01', '2025-01-01', '2025-01-01', '2025-01-02'])
+    flagged = flag_windows(claims, [EMPLOYEE_KEY], SUBMIT_DAY, _daily(claims), 3, _at_least_two)
+    assert flagged[EMPLOYEE_KEY].tolist() == [NULL_KEY, NULL_KEY]
+    assert flagged['Count'].tolist() == [2, 2]
+
+
+def test_flag_windows_empty_input():
+    claims = _claims([], [])
+    flagged = flag_windows(claims, [EMPLOYEE_KEY], SUBMIT_DAY, _daily(claims), 3, _at_least_two)
+    assert flagged.empty
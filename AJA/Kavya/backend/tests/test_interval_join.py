@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from Modules.interval_join import expand_ranges, interval_join, lex_searchsorted
+from Modules.joins import LEFT_ROW, RIGHT_ROW
+from Modules.store import NULL_KEY
+
+
+def _pairs(result):
+    return list(zip(result[LEFT_ROW], result[RIGHT_ROW]))
+
+
+def _claims(keys, dates):
+    return pd.DataFrame({'key': keys, 'Submit Date': pd.to_datetime(dates)})
+
+
+def _windows(keys, starts, ends=None):
+    df = pd.DataFrame({'key': keys, 'Start': pd.to_datetime(starts)})
+    df['End'] = pd.to_datetime(ends if ends is not None else starts)
+    return df
+
+
+def test_lex_searchsorted_sides():
+    keys, dates = np.array([0, 0, 0, 1]), np.array([1, 5, 5, 2])
+    query_keys, query_dates = np.array([0, 0, 1, 2]), np.array([5, 6, 0, 0])
+    assert lex_searchsorted(keys, dates, query_keys, query_dates, 'left').tolist() == [1, 3, 3, 4]
+    assert lex_searchsorted(keys, dates, query_keys, query_dates, 'right').tolist() == [3, 3, 3, 4]
+
+
+def test_expand_ranges_skips_empty_ranges():
+    owners, positions = expand_ranges(np.array([4, 0, 7]), np.array([2, 0, 1]))
+    assert owners.tolist() == [0, 0, 2]
+    assert positions.tolist() == [4, 5, 7]
+
+
+def test_window_end_inclusive_and_exclusive():
+    windows = _windows([1], ['2025-01-01'], ['2025-01-05'])
+    claims = _claims([1, 1, 1], ['2025-01-01', '2025-01-05', '2025-01-06'])
+    inclusive = interval_join(windows, claims, 'key', date='Submit Date', start='Start', end='End')
+    exclusive = interval_join(windows, claims, 'key', date='Submit Date', start='Start', end='End', end_inclusive=False)
+    assert _pairs(inclusive) == [(0, 0), (0, 1)]
+    assert _pairs(exclusive) == [(0, 0)]
+
+
+def test_window_day_offsets():
+    # Claims in the 2 days after joining, joining day excluded
+    windows = _windows([1], ['2025-01-01'])
+    claims = _claims([1, 1, 1, 1], ['2025-01-01', '2025-01-02', '2025-01-03', '2025-01-04'])
+    result = interval_join(windows, claims, 'key', date='Submit Date', start='Start', end='End',
+                           start_days=1, end_days=2)
+    assert _pairs(result) == [(0, 1), (0, 2)]
+
+
+def test_open_ended_window():
+    windows = _windows([1, 2], ['2025-03-01', '2025-03-01'])
+    claims = _claims([1, 1, 2], ['2025-02-28', '2026-01-01', '2025-03-01'])
+    result = interval_join(windows, claims, 'key', date='Submit Date', start='Start')
+    assert _pairs(result) == [(0, 1), (1, 2)]
+
+
+def test_missing_dates_never_pair():
+    windows = _windows([1, 2], ['2025-01-01', None])
+    claims = _claims([1, 2, 1], ['2025-01-02', '2025-01-02', None])
+    result = interval_join(windows, claims, 'key', date='Submit Date', start='Start')
+    assert _pairs(result) == [(0, 0)]
+
+
+def test_null_keys_pair_like_merge():
+    # Unknown employees all share NULL_KEY, as the missing IDs shared 'nan' in a merge on the ID strings
+    windows = _windows([NULL_KEY, 1], ['2025-01-01', '2025-01-01'])
+    claims = _claims([NULL_KEY, 1, NULL_KEY], ['2025-01-02', '2025-01-02', '2024-12-31'])
+    result = interval_join(windows, claims, 'key', date='Submit Date', start='Start')
+    assert _pairs(result) == [(0, 0), (1, 1)]
+
+
+def test_empty_inputs():
+    result = interval_join(_windows([], []), _claims([], []), 'key', date='Submit Date', start='Start', end='End')
+    assert list(result.columns) == [LEFT_ROW, RIGHT_ROW]
+    assert result.empty
+    result = interval_join(_windows([1], ['2025-01-01']), _claims([], []), 'key', date='Submit Date', start='Start')
+    assert result.empty
+
+
+def test_events_on_the_left_match_merge_then_filter():
+    rng = np.random.default_rng(0)
+    claims = _claims(rng.integers(0, 4, 60), pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 90, 60), unit='D'))
+    windows = _windows(rng.integers(0, 4, 8), pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 90, 8), unit='D'))
+    result = interval_join(claims, windows, 'key', date='Submit Date', start='Start', end='End', end_days=30,
+                           end_inclusive=False, events='left')
+
+    left, right = claims.assign(**{LEFT_ROW: range(60)}), windows.assign(**{RIGHT_ROW: range(8)})
+    merged = left.merge(right, on='key')
+    merged = merged[(merged['Submit Date'] >= merged['Start'])
+                    & (merged['Submit Date'] < merged['End'] + pd.Timedelta(days=30))]
+    assert _pairs(result) == list(zip(merged[LEFT_ROW], merged[RIGHT_ROW]))
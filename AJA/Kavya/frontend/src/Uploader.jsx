@@ -18,6 +18,9 @@ const INSIGHT_OPTIONS = [
   { id: "PJPA38", label: "PJPA38 - Odd Travels (Anomaly Detection)", req: ["lineItemFile"] },
   { id: "PJPA39", label: "PJPA39 - Active Employees with Separation Date", req: ["empMasterFile"] },
   { id: "PJPA40", label: "PJPA40 - Transaction Date Out of Bounds", req: ["concurFile", "lineItemFile"] },
+  { id: "PJPA41", label: "PJPA41 - Overlapping Trips", req: ["concurFile"] },
+  { id: "PJPA42", label: "PJPA42 - Header vs Line Item Reconciliation", req: ["concurFile", "lineItemFile"] },
+  { id: "PJPA43", label: "PJPA43 - Near-Duplicate Claims", req: ["lineItemFile"] },
 ];
 
 const FILE_TYPES = [
@@ -27,6 +30,30 @@ const FILE_TYPES = [
   { key: "leftEmpFile", label: "Left Employees", sub: "Required for Notice Period Analysis", sample: "/src/assets/Sampledata/LeftEmployee.csv" },
 ];
 
+// Generation runs as a background job on the backend: submit it, then poll until every insight has finished.
+// Resolves to { insightId: state } so callers can tell which insights failed.
+const runInsights = async (insights) => {
+  const genRes = await fetch("http://localhost:5000/api/generate", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ insights })
+  });
+  if (!genRes.ok) throw new Error("Backend failed to generate insights");
+  const { job_id } = await genRes.json();
+
+  while (true) {
+    const progressRes = await fetch(`http://localhost:5000/api/jobs/${job_id}/progress`);
+    if (!progressRes.ok) throw new Error("Lost track of the generation job");
+    const progress = await progressRes.json();
+    if (progress.status === "failed") throw new Error("Backend failed to generate insights");
+    if (progress.status === "done") {
+      // The backend reports PJPA32_HOL / PJPA32_WE under their shared module id
+      return Object.fromEntries(insights.map(id => [id, progress.insights[id] || progress.insights[id.split("_")[0]]]));
+    }
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+};
+
 const Uploader = ({ logo, handleLogout }) => {
   const [view, setView] = useState("upload");
   const [previousView, setPreviousView] = useState("upload");
@@ -138,13 +165,7 @@ const Uploader = ({ logo, handleLogout }) => {
     // 2. Process the valid ones
     if (toRun.length > 0) {
       try {
-        const generateResponse = await fetch("http://localhost:5000/api/generate", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ insights: toRun })
-        });
-
-        if (!generateResponse.ok) throw new Error("Backend failed to generate insights");
+        const states = await runInsights(toRun);
 
         const fetchPromises = toRun.map(id =>
           fetch(`http://localhost:5000/api/insight/${id}/data`).then(res => ({ id, res }))
@@ -155,6 +176,7 @@ const Uploader = ({ logo, handleLogout }) => {
         for (const resultObj of results) {
           const insightDef = INSIGHT_OPTIONS.find(o => o.id === resultObj.id);
           try {
+            if (states[resultObj.id]?.state !== "done") throw new Error(states[resultObj.id]?.error);
             const dataJson = await resultObj.res.json();
             const extractedData = Array.isArray(dataJson) ? dataJson : (dataJson.data || []);
             currentReports.push({
@@ -227,12 +249,8 @@ const Uploader = ({ logo, handleLogout }) => {
       }
 
       // 2. Generate
-      const genRes = await fetch("http://localhost:5000/api/generate", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ insights: [reportItem.moduleId] })
-      });
-      if (!genRes.ok) throw new Error("Backend generation failed");
+      const states = await runInsights([reportItem.moduleId]);
+      if (states[reportItem.moduleId]?.state !== "done") throw new Error("Backend generation failed");
 
       // 3. Fetch Data
       const dataRes = await fetch(`http://localhost:5000/api/insight/${reportItem.moduleId}/data`);
@@ -277,12 +295,8 @@ const Uploader = ({ logo, handleLogout }) => {
     successfulItems.forEach(async (reportItem) => {
       try {
         // Re-generate
-        const genRes = await fetch("http://localhost:5000/api/generate", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ insights: [reportItem.moduleId] })
-        });
-        if (!genRes.ok) throw new Error();
+        const states = await runInsights([reportItem.moduleId]);
+        if (states[reportItem.moduleId]?.state !== "done") throw new Error();
 
         // Re-fetch data
         const res = await fetch(`http://localhost:5000/api/insight/${reportItem.moduleId}/data`);